@@ -1,20 +1,146 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import (
+    Flask, Response, render_template, request, redirect, url_for, flash, jsonify, make_response,
+    stream_with_context
+)
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from model import db, bcrypt
-from model.user import User, create_user, get_user_by_username, get_user_by_id
-from model.log import Log, create_log
+from model.user import (
+    User, create_user, get_user_by_username, get_user_by_id,
+    enable_identity_cache, invalidate_identity, load_identity
+)
+from model.log import (
+    Log, create_log, log_writer, log_rows_query, merge_summaries, paginate_logs, summarize_logs
+)
 from model.analyzer import SecurityAnalyzer
 from model.validator import InputValidator
 from model.password_validator import PasswordValidator
+from model.storage import init_storage, read_session
+from model.search import filter_logs, matching_types
+from model.rollup import CHARTS, data_version, log_charts, merge_charts, rollup_charts, rollup_summary
+from model.partitions import log_partitions, partitions_for_range
+from model.cold_archive import ColdQuery, cold_archiver
+from model.export import FORMATS as EXPORT_FORMATS, export_logs, iter_log_rows
+from model.ingest import IngestError, log_ingestor
+from model.maintenance import log_maintenance
+from model.migrations import upgrade
+from model.detector import detector
+from model.broadcaster import broadcaster
+from model.hashing import HashingOverloaded, hashing_pool
+from model.rate_limit import login_limiter
+from model.username_filter import username_filter
+from model.breached_passwords import breached_passwords
+from datetime import datetime, timedelta
+from functools import wraps
+import hashlib
+import json
+import math
 import os
 
 app = Flask(__name__)
 app.secret_key = 'a1b2c3d4e5f6789012345678901234567890abcdef1234567890abcdef12345678'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Profilo SQLite (WAL, synchronous=NORMAL, busy_timeout, mmap, cache) e pool di sola lettura
+app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'wal')
+app.config['SQLITE_READONLY_POOL'] = os.getenv('SQLITE_READONLY_POOL', '1') == '1'
+app.config['SQLITE_READONLY_POOL_SIZE'] = int(os.getenv('SQLITE_READONLY_POOL_SIZE', '5'))
+# Cache LRU dei verdetti del validator (0 = disattivata)
+app.config['VALIDATOR_CACHE_SIZE'] = int(os.getenv('VALIDATOR_CACHE_SIZE', '0'))
+app.config['VALIDATOR_CACHE_MAX_INPUT'] = int(os.getenv('VALIDATOR_CACHE_MAX_INPUT', '1024'))
+# Scrittura dei log in background, a blocchi (500 eventi o 50 ms)
+app.config['LOG_WRITER_ASYNC'] = os.getenv('LOG_WRITER_ASYNC', '1') == '1'
+app.config['LOG_WRITER_BATCH_SIZE'] = int(os.getenv('LOG_WRITER_BATCH_SIZE', '500'))
+app.config['LOG_WRITER_FLUSH_MS'] = int(os.getenv('LOG_WRITER_FLUSH_MS', '50'))
+app.config['LOG_WRITER_MAX_QUEUE'] = int(os.getenv('LOG_WRITER_MAX_QUEUE', '10000'))
+app.config['LOG_WRITER_OVERFLOW'] = os.getenv('LOG_WRITER_OVERFLOW', 'block')  # block | drop_oldest | sample
+# Alert calcolati in tempo reale da contatori in memoria (per processo)
+app.config['ALERTS_IN_MEMORY'] = os.getenv('ALERTS_IN_MEMORY', '1') == '1'
+# Righe per pagina nella tabella di /logs
+app.config['LOGS_PAGE_SIZE'] = int(os.getenv('LOGS_PAGE_SIZE', '200'))
+# Intervallo di aggiornamento di statistiche e grafici via API (0 = disattivato)
+app.config['LOGS_POLL_SECONDS'] = int(os.getenv('LOGS_POLL_SECONDS', '30'))
+# Live tail SSE: eventi tenuti per client lento e intervallo dei keep-alive
+app.config['SSE_CLIENT_BUFFER'] = int(os.getenv('SSE_CLIENT_BUFFER', '500'))
+app.config['SSE_HEARTBEAT_SECONDS'] = int(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+# Export CSV/NDJSON: righe lette dal database e scritte nella risposta per volta
+app.config['EXPORT_CHUNK_ROWS'] = int(os.getenv('EXPORT_CHUNK_ROWS', '5000'))
+# Ingestion di eventi esterni in NDJSON: token Bearer accettati (separati da
+# virgola, '' = disattivata), righe massime per blocco e tolleranza sull'orologio
+app.config['INGEST_TOKENS'] = os.getenv('INGEST_TOKENS', '')
+app.config['INGEST_MAX_BATCH'] = int(os.getenv('INGEST_MAX_BATCH', '10000'))
+app.config['INGEST_MAX_SKEW_SECONDS'] = int(os.getenv('INGEST_MAX_SKEW_SECONDS', '300'))
+# Cache per processo delle identità caricate da Flask-Login (0 = disattivata)
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', '60'))
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', '10000'))
+# Limite tentativi di login (GCRA) per IP e per username; storage 'memory' o
+# 'sqlite:///percorso' condiviso tra più worker
+app.config['LOGIN_RATE_LIMIT'] = os.getenv('LOGIN_RATE_LIMIT', '1') == '1'
+app.config['LOGIN_RATE_LIMIT_IP'] = os.getenv('LOGIN_RATE_LIMIT_IP', '20/minute')
+app.config['LOGIN_RATE_LIMIT_USERNAME'] = os.getenv('LOGIN_RATE_LIMIT_USERNAME', '5/minute')
+app.config['RATE_LIMIT_STORAGE'] = os.getenv('RATE_LIMIT_STORAGE', 'memory')
+# Filtro di Bloom sugli username: gli username sicuramente inesistenti non
+# arrivano al database (login con credenziali a caso, controllo duplicati)
+app.config['USERNAME_FILTER'] = os.getenv('USERNAME_FILTER', '1') == '1'
+app.config['USERNAME_FILTER_CAPACITY'] = int(os.getenv('USERNAME_FILTER_CAPACITY', '100000'))
+app.config['USERNAME_FILTER_ERROR_RATE'] = float(os.getenv('USERNAME_FILTER_ERROR_RATE', '0.01'))
+# Indice delle password compromesse (creato con build_password_index.py, '' = nessuno)
+app.config['PASSWORD_BREACH_INDEX'] = os.getenv(
+    'PASSWORD_BREACH_INDEX', os.path.join(app.instance_path, 'breached_passwords.idx')
+)
+# Partizioni dei log: logs tiene gli ultimi LOG_HOT_PERIODS periodi, i più vecchi
+# passano in tabelle per giorno/mese eliminate intere oltre LOG_RETENTION_PERIODS (0 = mai)
+app.config['LOG_PARTITION_PERIOD'] = os.getenv('LOG_PARTITION_PERIOD', 'month')
+app.config['LOG_HOT_PERIODS'] = int(os.getenv('LOG_HOT_PERIODS', '2'))
+app.config['LOG_RETENTION_PERIODS'] = int(os.getenv('LOG_RETENTION_PERIODS', '0'))
+# Partizioni terminate da più di LOG_COLD_AFTER_DAYS giorni (0 = mai) passano
+# su file colonnari compressi in LOG_ARCHIVE_DIR, sempre consultabili da /logs
+app.config['LOG_COLD_AFTER_DAYS'] = int(os.getenv('LOG_COLD_AFTER_DAYS', '0'))
+app.config['LOG_ARCHIVE_DIR'] = os.getenv('LOG_ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+# Rotazione, retention e archivio su file rieseguiti ogni N secondi a server avviato
+# con python app.py (0 = solo all'avvio); gli script che importano app non la avviano
+app.config['LOG_MAINTENANCE_INTERVAL_SECONDS'] = int(os.getenv('LOG_MAINTENANCE_INTERVAL_SECONDS', '3600'))
+# Costo bcrypt dei nuovi hash (calibrare con calibrate_bcrypt.py); gli hash con
+# costo diverso vengono ricalcolati al primo login riuscito
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+# Pool bcrypt: hash in parallelo, coda massima e attesa massima in coda
+app.config['HASH_WORKERS'] = int(os.getenv('HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+app.config['HASH_MAX_PENDING'] = int(os.getenv('HASH_MAX_PENDING', '32'))
+app.config['HASH_QUEUE_TIMEOUT_MS'] = int(os.getenv('HASH_QUEUE_TIMEOUT_MS', '500'))
 
 db.init_app(app)
+init_storage(app)
 bcrypt.init_app(app)
+hashing_pool.init_app(app)
+login_limiter.init_app(app)
+username_filter.init_app(app)
+breached_passwords.init_app(app)
+log_partitions.init_app(app)
+cold_archiver.init_app(app)
+log_maintenance.init_app(app)
+log_ingestor.init_app(app)
+
+if app.config['VALIDATOR_CACHE_SIZE'] > 0:
+    InputValidator.enable_cache(
+        max_entries=app.config['VALIDATOR_CACHE_SIZE'],
+        max_input_length=app.config['VALIDATOR_CACHE_MAX_INPUT']
+    )
+
+if app.config['USER_CACHE_TTL'] > 0:
+    enable_identity_cache(
+        ttl=app.config['USER_CACHE_TTL'],
+        max_entries=app.config['USER_CACHE_SIZE']
+    )
+
+if app.config['LOG_WRITER_ASYNC']:
+    log_writer.init_app(app)
+    log_writer.start()
+
+if app.config['ALERTS_IN_MEMORY']:
+    detector.init_app(app)
+
+# Nuovi log (da create_log / LogWriter) e alert del detector arrivano ai client SSE
+broadcaster.configure(app.config['SSE_CLIENT_BUFFER'])
+detector.subscribe(lambda alert: broadcaster.publish('alert', alert))
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -24,7 +150,8 @@ login_manager.login_message = 'Devi effettuare il login per accedere a questa pa
 
 @login_manager.user_loader
 def load_user(user_id):
-    return get_user_by_id(user_id)
+    # Identità leggera (id, username, is_admin) servita dalla cache quando possibile
+    return load_identity(user_id)
 
 
 def ensure_admin_user():
@@ -57,6 +184,21 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+
+        # Prima di validazione, query e bcrypt: un attacco oltre il limite costa solo questo
+        retry_after, report = login_limiter.check_attempt(request.remote_addr, username)
+        if retry_after:
+            if report:
+                create_log(
+                    ip=request.remote_addr,
+                    log_type="LOGIN_RATE_LIMITED",
+                    user=None,
+                    is_error=True
+                )
+            flash(f'Troppi tentativi di login. Riprova tra {math.ceil(retry_after)} secondi.', 'error')
+            response = make_response(render_template('login.html'), 429)
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
         
         validation_username = InputValidator.validate_sql_only(username, 'username')
         
@@ -73,6 +215,7 @@ def login():
         user = get_user_by_username(username)
 
         if user and user.check_password(password):
+            login_limiter.record_success(username)
             login_user(user)
             
             create_log(
@@ -181,6 +324,117 @@ def logout():
     return redirect(url_for('login'))
 
 
+def _date_range(filters):
+    """Limiti [inizio, fine) del filtro per data, (None, None) se assente o non valido"""
+    if filters['date']:
+        try:
+            target_date = datetime.strptime(filters['date'], '%Y-%m-%d')
+            return target_date, target_date + timedelta(days=1)
+        except ValueError:
+            pass
+    return None, None
+
+
+def _filter_log_rows(query, session, filters, table=None):
+    """Filtri di /logs su logs o, con 'table', su una partizione d'archivio"""
+    columns = (table if table is not None else Log.__table__).c
+
+    # LIKE '%...%' risolti con indice trigram / lista dei tipi / tabella users
+    query = filter_logs(query, session, filters['type'], filters['ip'], filters['user'], table=table)
+
+    if filters['error'] == 'true':
+        query = query.filter(columns.is_error == True)
+    elif filters['error'] == 'false':
+        query = query.filter(columns.is_error == False)
+
+    since, until = _date_range(filters)
+    if since:
+        query = query.filter(columns.timestamp >= since, columns.timestamp < until)
+    return query
+
+
+def apply_log_filters(args):
+    """
+    Applica i filtri di /logs (type, ip, user, error, date) presi da 'args'
+
+    Returns:
+        tuple: (session, query sulle righe di log filtrate, filtri per le
+        tabelle di rollup o None se non bastano, valori dei filtri, coppie
+        (query, partizione) sulle partizioni d'archivio e (ColdQuery, archivio)
+        sui file d'archivio nel periodo filtrato)
+    """
+    filters = {name: args.get(name, '') for name in ('type', 'ip', 'user', 'error', 'date')}
+
+    # Righe con lo username già unito: niente Log.user caricato riga per riga
+    session = read_session()
+    query = _filter_log_rows(log_rows_query(session), session, filters)
+
+    # Solo le partizioni che si sovrappongono al filtro per data
+    since, until = _date_range(filters)
+    cold = cold_archiver.archives(since, until)
+    # Una partizione che ha già il suo file (archiviazione interrotta prima del
+    # DROP TABLE) si legge solo dal file: le sue righe sono tutte lì
+    on_file = {archive.name for archive in cold}
+    archives = [
+        (_filter_log_rows(log_rows_query(session, partition.table), session, filters, partition.table), partition)
+        for partition in partitions_for_range(session, since, until) if partition.name not in on_file
+    ]
+    is_error = {'true': True, 'false': False}.get(filters['error'])
+    archives += [
+        (ColdQuery(session, archive, filters['type'], filters['ip'], filters['user'], is_error, since, until), archive)
+        for archive in cold
+    ]
+    archives.sort(key=lambda pair: pair[1].start, reverse=True)
+
+    # Stessi filtri espressi sulle tabelle di rollup (tutti tranne l'username)
+    rollup_filters = {}
+    if filters['type']:
+        rollup_filters['types'] = matching_types(session, filters['type'])
+    if filters['ip']:
+        rollup_filters['ip_like'] = f"%{filters['ip']}%"
+    if filters['error'] in ('true', 'false'):
+        rollup_filters['is_error'] = filters['error'] == 'true'
+    if since:
+        rollup_filters['since'] = since
+        rollup_filters['until'] = until
+
+    return session, query, (None if filters['user'] else rollup_filters), filters, archives
+
+
+def log_summary(session, query, rollup_filters, archives=()):
+    """Totali sui log filtrati: dai conteggi orari se possibile, altrimenti dai log"""
+    if rollup_filters is None:
+        return merge_summaries([summarize_logs(query)] + [
+            archive_query.summarize() if isinstance(archive_query, ColdQuery)
+            else summarize_logs(archive_query, partition.table)
+            for archive_query, partition in archives
+        ])
+    return rollup_summary(session, **rollup_filters)
+
+
+def log_chart_data(session, query, rollup_filters, charts=CHARTS, archives=()):
+    """Dati dei grafici sui log filtrati, stessa scelta della fonte di log_summary"""
+    if rollup_filters is None:
+        if not archives:
+            return log_charts(query, charts)
+        # Gruppi completi per tabella, poi somma e classifica
+        return merge_charts([log_charts(query, charts, None, None)] + [
+            archive_query.charts(charts) if isinstance(archive_query, ColdQuery)
+            else log_charts(archive_query, charts, None, None, table=partition.table)
+            for archive_query, partition in archives
+        ])
+    return rollup_charts(session, charts, **rollup_filters)
+
+
+def summary_stats(summary):
+    return {
+        'total': summary['total'],
+        'errors': summary['errors'],
+        'login_success': summary['by_type'].get('LOGIN_SUCCESS', 0),
+        'login_failed': summary['by_type'].get('LOGIN_FAILED', 0)
+    }
+
+
 @app.route('/logs')
 @login_required
 def logs():
@@ -197,90 +451,274 @@ def logs():
             is_error=False
         )
 
-    filter_type = request.args.get('type', '')
-    filter_ip = request.args.get('ip', '')
-    filter_user = request.args.get('user', '')
-    filter_error = request.args.get('error', '')
-    filter_date = request.args.get('date', '')
-    
-    query = Log.query
+    session, query, rollup_filters, filters, archives = apply_log_filters(request.args)
 
-    if filter_type:
-        query = query.filter(Log.type.like(f'%{filter_type}%'))
-    
-    if filter_ip:
-        query = query.filter(Log.ip.like(f'%{filter_ip}%'))
-    
-    if filter_user:
-        query = query.join(User).filter(User.username.like(f'%{filter_user}%'))
-    
-    if filter_error == 'true':
-        query = query.filter(Log.is_error == True)
-    elif filter_error == 'false':
-        query = query.filter(Log.is_error == False)
-    
-    if filter_date:
-        from datetime import datetime, timedelta
-        try:
-            target_date = datetime.strptime(filter_date, '%Y-%m-%d')
-            next_day = target_date + timedelta(days=1)
-            query = query.filter(Log.timestamp >= target_date, Log.timestamp < next_day)
-        except ValueError:
-            pass 
-
-    all_logs = query.order_by(Log.timestamp.desc()).limit(200).all()
+    # Pagina corrente via cursore (timestamp, id): nessun OFFSET anche in profondità,
+    # e le partizioni d'archivio vengono lette solo quando la pagina le raggiunge
+    all_logs, older_cursor, newer_cursor = paginate_logs(
+        query,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=app.config['LOGS_PAGE_SIZE'],
+        archives=archives
+    )
 
     alerts = SecurityAnalyzer.get_all_alerts()
 
-    total_logs = len(all_logs)
-    error_count = sum(1 for log in all_logs if log.is_error)
-    login_success = sum(1 for log in all_logs if log.type == "LOGIN_SUCCESS")
-    login_failed = sum(1 for log in all_logs if log.type == "LOGIN_FAILED")
-    
-    stats = {
-        'total': total_logs,
-        'errors': error_count,
-        'login_success': login_success,
-        'login_failed': login_failed
-    }
+    # Statistiche e grafici su tutti i log filtrati, non solo sulla pagina
+    summary = log_summary(session, query, rollup_filters, archives)
+    charts = log_chart_data(session, query, rollup_filters, archives=archives)
+    stats = summary_stats(summary)
 
-    all_log_types = db.session.query(Log.type).distinct().all()
+    all_log_types = session.query(Log.type).distinct().all()
     log_types = sorted([t[0] for t in all_log_types])
 
-    all_ips = db.session.query(Log.ip).distinct().limit(50).all()
+    all_ips = session.query(Log.ip).distinct().limit(50).all()
     unique_ips = sorted([ip[0] for ip in all_ips])
     
-    # Converti i log in dizionari JSON-serializzabili per i grafici
-    logs_json = []
-    for log in all_logs:
-        logs_json.append({
-            'id': log.id,
-            'timestamp': log.timestamp.isoformat(),
-            'type': log.type,
-            'ip': log.ip,
-            'is_error': log.is_error,
-            'user': log.user.username if log.user else None
-        })
-    
-    # Calcola conteggio per tipo di log per la legenda
-    from collections import Counter
-    log_type_counts = Counter(log.type for log in all_logs)
-    
+    # Conteggio per tipo di log per la legenda
+    log_type_counts = summary['by_type']
+
     return render_template('logs.html', 
                          logs=all_logs,
-                         logs_json=logs_json,
+                         charts=charts,
                          log_type_counts=log_type_counts,
                          stats=stats, 
                          alerts=alerts,
                          log_types=log_types,
                          unique_ips=unique_ips,
-                         filters={
-                             'type': filter_type,
-                             'ip': filter_ip,
-                             'user': filter_user,
-                             'error': filter_error,
-                             'date': filter_date
-                         })
+                         older_cursor=older_cursor,
+                         newer_cursor=newer_cursor,
+                         poll_seconds=app.config['LOGS_POLL_SECONDS'],
+                         filters=filters)
+
+
+# -------------------------------
+# API JSON della dashboard
+# -------------------------------
+
+def _json_value(value):
+    """Rende serializzabili datetime e log (oggetti Log o eventi del detector)"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, Log):
+        return {
+            'id': value.id,
+            'ip': value.ip,
+            'type': value.type,
+            'timestamp': value.timestamp.isoformat(),
+            'is_error': value.is_error
+        }
+    return value
+
+
+def cached_json(build, *key):
+    """
+    Risposta JSON con ETag e supporto a If-None-Match
+
+    L'ETag deriva da 'key', dai parametri della richiesta e dalla versione dei
+    log: se il client ha già quella versione risponde 304 senza calcolare nulla.
+    Senza versione (tabelle di rollup assenti) l'ETag è l'hash del contenuto.
+
+    Args:
+        build: funzione che restituisce i dati da serializzare
+        key: parti aggiuntive dell'ETag (es. il minuto corrente per gli alert)
+    """
+    version = data_version(read_session())
+    if version is not None:
+        etag = hashlib.blake2b(
+            repr((request.path, sorted(request.args.items()), version, key)).encode(),
+            digest_size=16
+        ).hexdigest()
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+    response = jsonify(_json_value(build()))
+    if version is not None:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    # Il browser deve rivalidare a ogni richiesta (If-None-Match) invece di usare la copia
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def admin_api(view):
+    """Come login_required + controllo admin, ma con risposte JSON"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Login richiesto'}), 401
+        if not getattr(current_user, 'is_admin', False):
+            return jsonify({'error': 'Accesso riservato agli amministratori'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/logs/stats')
+@admin_api
+def api_logs_stats():
+    def build():
+        session, query, rollup_filters, _, archives = apply_log_filters(request.args)
+        summary = log_summary(session, query, rollup_filters, archives)
+        return {'stats': summary_stats(summary), 'by_type': summary['by_type']}
+    return cached_json(build)
+
+
+@app.route('/api/logs/types')
+@admin_api
+def api_logs_types():
+    def build():
+        session, query, rollup_filters, _, archives = apply_log_filters(request.args)
+        return log_chart_data(session, query, rollup_filters, ('types',), archives)
+    return cached_json(build)
+
+
+@app.route('/api/logs/top-ips')
+@admin_api
+def api_logs_top_ips():
+    def build():
+        session, query, rollup_filters, _, archives = apply_log_filters(request.args)
+        return log_chart_data(session, query, rollup_filters, ('top_ips',), archives)
+    return cached_json(build)
+
+
+@app.route('/api/logs/hourly')
+@admin_api
+def api_logs_hourly():
+    def build():
+        session, query, rollup_filters, _, archives = apply_log_filters(request.args)
+        return log_chart_data(session, query, rollup_filters, ('by_hour',), archives)
+    return cached_json(build)
+
+
+@app.route('/api/logs/stream')
+@admin_api
+def api_logs_stream():
+    """
+    Live tail in Server-Sent Events: eventi 'log' (righe appena scritte),
+    'alert' (soglie superate dal detector) e 'overflow' (eventi persi perché
+    il client era troppo lento; conviene ricaricare le statistiche)
+    """
+    heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+    subscription = broadcaster.subscribe()
+
+    def stream():
+        dropped = 0
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                events = subscription.get(timeout=heartbeat)
+                if not events:
+                    # Commento SSE: tiene aperta la connessione e rileva i client chiusi
+                    yield ': keep-alive\n\n'
+                    continue
+                if subscription.dropped != dropped:
+                    yield f'event: overflow\ndata: {json.dumps({"dropped": subscription.dropped - dropped})}\n\n'
+                    dropped = subscription.dropped
+                for event_id, event_type, data in events:
+                    yield f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(_json_value(data))}\n\n'
+        finally:
+            subscription.close()
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # niente buffering nei reverse proxy (nginx)
+    })
+
+
+@app.route('/api/logs/export')
+@admin_api
+def api_logs_export():
+    """
+    Log con i filtri di /logs in CSV o NDJSON (?format=csv|ndjson, ?gzip=1),
+    generati in streaming a blocchi di EXPORT_CHUNK_ROWS righe
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Formato non supportato: usare {' o '.join(EXPORT_FORMATS)}"}), 400
+    compress = request.args.get('gzip') == '1'
+    chunk_size = app.config['EXPORT_CHUNK_ROWS']
+
+    create_log(
+        ip=request.remote_addr,
+        log_type="LOGS_EXPORT",
+        user=current_user,
+        is_error=False
+    )
+    _, query, _, _, archives = apply_log_filters(request.args)
+    body = export_logs(iter_log_rows(query, archives, chunk_size), fmt, compress, chunk_size)
+
+    filename = f"logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}" + ('.gz' if compress else '')
+    # stream_with_context: la sessione del database resta aperta fino all'ultima riga
+    return Response(stream_with_context(body),
+                    mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+                    headers={
+                        'Content-Disposition': f'attachment; filename="{filename}"',
+                        'X-Accel-Buffering': 'no'
+                    })
+
+
+@app.route('/api/logs/ingest', methods=['POST'])
+def api_logs_ingest():
+    """
+    Blocco NDJSON di eventi da sorgenti esterne (vedi model.ingest), con
+    'Authorization: Bearer <token>' tra quelli di INGEST_TOKENS
+    """
+    if not log_ingestor.tokens:
+        return jsonify({'error': 'Ingestion non configurata'}), 404
+
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not log_ingestor.authorized(token.strip()):
+        create_log(
+            ip=request.remote_addr,
+            log_type="INGEST_UNAUTHORIZED",
+            is_error=True
+        )
+        return jsonify({'error': 'Token non valido'}), 401
+
+    try:
+        result = log_ingestor.ingest(request.get_data().splitlines())
+    except IngestError as e:
+        return jsonify({'error': str(e)}), 413
+    # Tutto scartato: probabilmente è il client a mandare un formato sbagliato
+    status = 400 if result['rejected'] and not result['accepted'] else 200
+    return jsonify(result), status
+
+
+@app.route('/api/admin/username-filter')
+@admin_api
+def api_username_filter():
+    """Dimensione del filtro e tasso di falsi positivi atteso e osservato"""
+    return jsonify(username_filter.stats())
+
+
+@app.route('/api/admin/username-filter/rebuild', methods=['POST'])
+@admin_api
+def api_username_filter_rebuild():
+    """Ricostruisce il filtro dalla tabella users (azzera gli username eliminati)"""
+    stats = username_filter.rebuild()
+    create_log(
+        ip=request.remote_addr,
+        log_type="USERNAME_FILTER_REBUILD",
+        user=current_user,
+        is_error=False
+    )
+    return jsonify(stats)
+
+
+@app.route('/api/logs/alerts')
+@admin_api
+def api_logs_alerts():
+    # Le finestre degli alert scorrono col tempo: l'ETag cambia almeno ogni minuto
+    minute = datetime.now().strftime('%Y-%m-%d %H:%M')
+    return cached_json(SecurityAnalyzer.get_all_alerts, minute)
 
 
 @app.route('/account')
@@ -289,6 +727,17 @@ def account():
     return render_template('account.html')
 
 
+def _account_gone(user_id):
+    """
+    L'identità in cache sopravvive fino al TTL a un utente eliminato altrove:
+    chiude la sessione invece di lavorare su un utente che non esiste più
+    """
+    invalidate_identity(user_id)
+    logout_user()
+    flash('Account non più esistente. Effettua di nuovo il login.', 'error')
+    return redirect(url_for('login'))
+
+
 @app.route('/change_password', methods=['POST'])
 @login_required
 def change_password():
@@ -300,7 +749,12 @@ def change_password():
         flash('Tutti i campi sono obbligatori.', 'error')
         return redirect(url_for('account'))
 
-    if not current_user.check_password(current_password):
+    # current_user è un'identità in cache: password e modifiche passano dal modello
+    user = get_user_by_id(current_user.id)
+    if user is None:
+        return _account_gone(current_user.id)
+
+    if not user.check_password(current_password):
         create_log(
             ip=request.remote_addr,
             log_type="PASSWORD_CHANGE_FAILED",
@@ -314,7 +768,7 @@ def change_password():
         flash('Le nuove password non corrispondono.', 'error')
         return redirect(url_for('account'))
 
-    if current_user.check_password(new_password):
+    if user.check_password(new_password):
         flash('La nuova password deve essere diversa da quella attuale.', 'error')
         return redirect(url_for('account'))
 
@@ -324,10 +778,11 @@ def change_password():
             flash(error, 'error')
         return redirect(url_for('account'))
 
+    hashed_password = hashing_pool.generate(new_password)
     try:
-        hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
-        current_user.password = hashed_password
+        user.password = hashed_password
         db.session.commit()
+        invalidate_identity(user.id)
 
         create_log(
             ip=request.remote_addr,
@@ -352,8 +807,11 @@ def delete_account():
         return redirect(url_for('account'))
     
     password = request.form.get('password')
+    user = get_user_by_id(current_user.id)
+    if user is None:
+        return _account_gone(current_user.id)
 
-    if not password or not current_user.check_password(password):
+    if not password or not user.check_password(password):
         create_log(
             ip=request.remote_addr,
             log_type="ACCOUNT_DELETE_FAILED",
@@ -381,6 +839,8 @@ def delete_account():
         if user_to_delete:
             db.session.delete(user_to_delete)
             db.session.commit()
+            username_filter.discard(username)
+        invalidate_identity(user_id)
         
         flash(f'Account "{username}" eliminato con successo.', 'success')
         return redirect(url_for('login'))
@@ -479,6 +939,26 @@ def page_not_found(e):
     return render_template('404.html'), 404
 
 
+@app.errorhandler(HashingOverloaded)
+def hashing_overloaded(e):
+    """Pool bcrypt saturo: risposta immediata invece di occupare un thread in attesa"""
+    create_log(
+        ip=request.remote_addr,
+        log_type="HASHING_OVERLOADED",
+        user=current_user if current_user.is_authenticated else None,
+        is_error=True
+    )
+    flash('Server momentaneamente sovraccarico, riprova tra qualche secondo.', 'error')
+
+    form_templates = {'login': 'login.html', 'register': 'register.html'}
+    if request.endpoint in form_templates:
+        response = make_response(render_template(form_templates[request.endpoint]), 503)
+    else:
+        response = redirect(url_for('account'))
+    response.headers['Retry-After'] = '1'
+    return response
+
+
 @app.errorhandler(500)
 def internal_server_error(e):
     """Gestisce errori 500 - Errore interno del server"""
@@ -495,5 +975,11 @@ if __name__ == '__main__':
 
     with app.app_context():
         db.create_all()
+        upgrade(app)
         ensure_admin_user()
+    # Con il reloader di debug questo blocco gira anche nel processo che
+    # sorveglia i file: la manutenzione parte solo in quello che serve le richieste
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        log_maintenance.report(log_maintenance.run())
+        log_maintenance.start()
     app.run(debug=True)
\ No newline at end of file
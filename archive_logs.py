@@ -0,0 +1,114 @@
+"""
+Archivio freddo dei log: creazione dei file colonnari e ricerca
+
+Le partizioni d'archivio terminate da più di --days giorni (default
+LOG_COLD_AFTER_DAYS) vengono riscritte in LOG_ARCHIVE_DIR e le tabelle
+eliminate. La ricerca usa gli stessi filtri di /logs e legge solo i blocchi
+e le colonne che servono.
+
+Uso:
+    python archive_logs.py archive [--days 90]
+    python archive_logs.py list
+    python archive_logs.py query --type LOGIN --ip 10.0. --since 2026-01-01 --until 2026-02-01
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from app import app, db
+from model.cold_archive import ColdQuery, cold_archiver
+from model.partitions import log_partitions
+
+
+def archive(days):
+    if days:
+        cold_archiver.after_days = days
+    if not cold_archiver.after_days:
+        print("❌ Specificare --days o impostare LOG_COLD_AFTER_DAYS")
+        return 1
+    with app.app_context():
+        start = time.perf_counter()
+        with cold_archiver.transaction(db.engine) as connection:
+            moved, _ = log_partitions.maintain(connection)
+            archived, expired = cold_archiver.maintain(connection)
+    for name, count in moved.items():
+        print(f"📦 {count} log spostati in {name}")
+    for name, count in archived.items():
+        print(f"🧊 {name} archiviata su file ({count} log)")
+    for name in expired:
+        print(f"🗑️  Archivio {name} eliminato (retention)")
+    print(f"✅ Fatto in {time.perf_counter() - start:.1f}s, archivi in {cold_archiver.directory}")
+    return 0
+
+
+def show_archives():
+    archives = cold_archiver.archives()
+    print("\n" + "="*70)
+    for archive in archives:
+        size_kb = os.path.getsize(archive.path) / 1024
+        blocks = len(archive.footer['blocks'])
+        print(f"{archive.name:16} | {len(archive):>10,} log | {blocks:>4} blocchi | {size_kb:>10,.1f} KB")
+    print("="*70)
+    print(f"Totale: {sum(len(archive) for archive in archives):,} log in {len(archives)} archivi\n")
+    return 0
+
+
+def query(args):
+    since = datetime.fromisoformat(args.since) if args.since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    is_error = {'true': True, 'false': False}.get(args.error)
+    with app.app_context():
+        start = time.perf_counter()
+        found = 0
+        key = None
+        for archive in cold_archiver.archives(since, until):
+            cold_query = ColdQuery(db.session, archive, args.type, args.ip, args.user, is_error, since, until)
+            # A pagine come /logs: gli username vengono uniti una pagina alla volta
+            while found < args.limit:
+                rows = cold_query.page_rows(key, False, min(200, args.limit - found))
+                if not rows:
+                    break
+                for log in rows:
+                    error_flag = "⚠️" if log.is_error else "✓"
+                    print(f"{error_flag} [{log.timestamp.strftime('%d/%m/%Y %H:%M:%S')}] {log.type:20} "
+                          f"| IP: {log.ip:15} | User: {log.username or 'N/A'}")
+                found += len(rows)
+                key = (rows[-1].timestamp, rows[-1].id)
+            if found >= args.limit:
+                break
+        elapsed = (time.perf_counter() - start) * 1000
+    print(f"\n✅ {found} log trovati in {elapsed:.0f} ms")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    archive_parser = commands.add_parser('archive', help='porta su file le partizioni vecchie')
+    archive_parser.add_argument('--days', type=int, default=0,
+                                help='età minima in giorni (default LOG_COLD_AFTER_DAYS)')
+
+    commands.add_parser('list', help='elenca i file d\'archivio')
+
+    query_parser = commands.add_parser('query', help='cerca nei file d\'archivio')
+    query_parser.add_argument('--type', default='', help='tipo di evento (sottostringa)')
+    query_parser.add_argument('--ip', default='', help='indirizzo IP (sottostringa)')
+    query_parser.add_argument('--user', default='', help='username (sottostringa)')
+    query_parser.add_argument('--error', choices=('true', 'false'), help='solo errori o solo non errori')
+    query_parser.add_argument('--since', help='da questa data (AAAA-MM-GG[ HH:MM])')
+    query_parser.add_argument('--until', help='fino a questa data esclusa')
+    query_parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == 'archive':
+        return archive(args.days)
+    if args.command == 'list':
+        return show_archives()
+    return query(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Micro-benchmark del validator: motore compilato vs controllo sequenziale storico"""
+import random
+import re
+import sys
+import time
+
+from model.validator import InputValidator
+
+SIZES = [('100 B', 100), ('10 KB', 10 * 1024), ('1 MB', 1024 * 1024)]
+
+CLEAN_TEXT = "Buongiorno, vorrei informazioni sull'ordine numero 4521 effettuato ieri. "
+MALICIOUS_TAIL = "<script>alert(document.cookie)</script>"
+
+# Frammenti per il corpus fuzz: pezzi di attacco, quasi-attacchi e testo
+# normale (anche non ASCII) mescolati a caso
+FUZZ_FRAGMENTS = [
+    "UNION select", "union  SELECT", " or 1=1", " AND '2'= 2", "' or '", "'OR'", "--", "; drop",
+    "drop table", "insert into", "delete from", "update utenti set", "admin'--", "1' = '1", "';--",
+    "<ScRiPt src=x>", "</script>", "JavaScript:", "onload =", "onmouseover=", "<iframe>", "<embed x>",
+    "<object>", "<img src=x onerror", "<svg/onload", "alert (1)", "eval(", "document.cookie",
+    "window.location", "; rm -rf /", ";cat /x", "| cat x", "&& del", "`id`", "$(ls)", "> /dev/null",
+    "; curl x", ";wget y", "| nc h", "; bash", "; sh x", "../", "..\\", "%2E%2e%2F", "%2e%2e/",
+    "..%2f", "/etc/passwd", "/ETC/shadow", "C:\\Windows\\System32", "c:/windows/system32",
+    "ſelect", "UNİON SELECT", "straße", "perché", "l'ordine ", "a=b ", "ciao ", "lavoro ", "e-mail ",
+    "(nota)", "prezzo: 10$ ", "\n", "\t", " ",
+]
+
+
+def fuzz_corpus(samples=50000, seed=42):
+    """Genera input casuali riproducibili (stesso seed, stesso corpus)"""
+    rng = random.Random(seed)
+    for _ in range(samples):
+        parts = []
+        for _ in range(rng.randint(0, 12)):
+            if rng.random() < 0.6:
+                parts.append(rng.choice(FUZZ_FRAGMENTS))
+            else:
+                parts.append(chr(rng.randint(32, 0x17f)))
+        yield ''.join(parts)
+
+
+def verify_against_legacy(samples=50000, seed=42):
+    """
+    Confronta i verdetti del motore compilato con l'implementazione storica
+    
+    Returns:
+        list: input per cui i verdetti differiscono (vuota se tutto ok)
+    """
+    mismatches = []
+    for text in fuzz_corpus(samples, seed):
+        if InputValidator.validate(text, 'fuzz') != legacy_validate(text, 'fuzz'):
+            mismatches.append(text)
+        if InputValidator.validate_sql_only(text, 'fuzz') != legacy_validate_sql_only(text, 'fuzz'):
+            mismatches.append(text)
+    return mismatches
+
+
+def legacy_validate(input_string, field_name="input"):
+    """Implementazione originale: re.search su ogni pattern, famiglia per famiglia"""
+    if not input_string or not isinstance(input_string, str):
+        return {'is_safe': True, 'attack_type': None, 'pattern_matched': None, 'field': field_name}
+
+    input_upper = input_string.upper()
+    families = [
+        ('SQL_INJECTION', InputValidator.SQL_PATTERNS, input_upper),
+        ('XSS', InputValidator.XSS_PATTERNS, input_string),
+        ('COMMAND_INJECTION', InputValidator.COMMAND_PATTERNS, input_string),
+        ('PATH_TRAVERSAL', InputValidator.PATH_PATTERNS, input_string),
+    ]
+    for attack_type, patterns, text in families:
+        for pattern in patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                return {
+                    'is_safe': False,
+                    'attack_type': attack_type,
+                    'pattern_matched': pattern,
+                    'field': field_name,
+                    'input_sample': input_string[:100]
+                }
+
+    return {'is_safe': True, 'attack_type': None, 'pattern_matched': None, 'field': field_name}
+
+
+def legacy_validate_sql_only(input_string, field_name="input"):
+    """Implementazione originale di validate_sql_only"""
+    result = legacy_validate(input_string, field_name)
+    if result['is_safe'] or result['attack_type'] == 'SQL_INJECTION':
+        return result
+    # Un input che fallisce su un'altra famiglia è comunque pulito per SQL
+    return {'is_safe': True, 'attack_type': None, 'pattern_matched': None, 'field': field_name}
+
+
+def make_input(size, malicious):
+    """Testo di lunghezza 'size'; se malevolo il payload sta in fondo (caso peggiore)"""
+    if malicious:
+        body = (CLEAN_TEXT * (size // len(CLEAN_TEXT) + 1))[:max(size - len(MALICIOUS_TAIL), 0)]
+        return body + MALICIOUS_TAIL
+    return (CLEAN_TEXT * (size // len(CLEAN_TEXT) + 1))[:size]
+
+
+def per_call(func, text, min_time=0.5):
+    """Latenza media per chiamata in microsecondi"""
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func(text, 'messaggio')
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / calls * 1e6
+
+
+def run():
+    mismatches = verify_against_legacy()
+    if mismatches:
+        print(f"❌ {len(mismatches)} verdetti diversi dal controllo storico, es: {mismatches[0]!r}")
+        return 1
+    print("✅ Corpus fuzz: verdetti identici al controllo storico")
+
+    print("\n" + "=" * 72)
+    print("BENCHMARK INPUT VALIDATOR (latenza per chiamata)")
+    print("=" * 72)
+    print(f"{'Input':18} {'Sequenziale':>15} {'Compilato':>15} {'Speedup':>10}")
+    print("-" * 72)
+    for label, size in SIZES:
+        for malicious in (False, True):
+            text = make_input(size, malicious)
+            if legacy_validate(text) != InputValidator.validate(text, 'input'):
+                print(f"❌ Verdetto diverso per input {label}")
+                return 1
+            legacy = per_call(legacy_validate, text)
+            compiled = per_call(InputValidator.validate, text)
+            kind = 'malevolo' if malicious else 'pulito'
+            print(f"{label + ' ' + kind:18} {legacy:>12.1f} µs {compiled:>12.1f} µs {legacy / compiled:>9.1f}x")
+    print("=" * 72 + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
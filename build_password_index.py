@@ -0,0 +1,151 @@
+"""
+Costruisce l'indice delle password compromesse usato da PasswordValidator
+
+Accetta uno o più file di testo con una voce per riga, nel formato indicato
+da --format (uguale per tutti i file, mai dedotto riga per riga: una password
+in chiaro di 40 caratteri esadecimali verrebbe presa per un hash):
+- plain: password in chiaro (es. rockyou.txt)
+- sha1: SHA-1 esadecimale, opzionalmente seguito da ':conteggio' (elenchi HIBP)
+
+Le voci vengono distribuite in 256 file temporanei secondo il primo byte
+dell'hash, poi ogni gruppo viene ordinato e deduplicato in memoria: il picco
+di RAM è quello di un solo gruppo anche con decine di milioni di password.
+
+Uso:
+    python build_password_index.py --format plain elenco.txt [altri file...] [-o instance/breached_passwords.idx]
+    python build_password_index.py --format sha1 pwned-passwords-sha1.txt --min-count 10
+
+Poi impostare PASSWORD_BREACH_INDEX con il percorso del file creato.
+"""
+import argparse
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+from model.breached_passwords import (
+    ENTRY_SIZE, FANOUT_BITS, FANOUT_ENTRIES, HEADER, MAGIC, password_key
+)
+
+DEFAULT_OUTPUT = os.path.join('instance', 'breached_passwords.idx')
+SHA1_LINE = re.compile(r'^([0-9A-Fa-f]{40})(?::(\d+))?$')
+FORMATS = ('plain', 'sha1')
+
+
+def parse_line(line, input_format, min_count):
+    """
+    Returns:
+        bytes | None: chiave di 8 byte della voce, None se va scartata
+
+    Raises:
+        ValueError: riga che non è uno SHA-1[:conteggio] con input_format 'sha1'
+    """
+    line = line.rstrip('\r\n')
+    if not line:
+        return None
+    if input_format == 'plain':
+        return password_key(line)
+    match = SHA1_LINE.match(line)
+    if not match:
+        raise ValueError(line)
+    count = match.group(2)
+    if count is not None and int(count) < min_count:
+        return None
+    return bytes.fromhex(match.group(1))[:ENTRY_SIZE]
+
+
+def partition(paths, workdir, input_format, min_count):
+    """
+    Scrive le chiavi in 256 file secondo il primo byte
+
+    Returns:
+        tuple: (voci lette, righe scartate perché non nel formato indicato)
+    """
+    buckets = [open(os.path.join(workdir, f'{i:02x}'), 'wb') for i in range(256)]
+    read = invalid = 0
+    try:
+        for path in paths:
+            with open(path, encoding='utf-8', errors='surrogateescape') as f:
+                for line in f:
+                    try:
+                        key = parse_line(line, input_format, min_count)
+                    except UnicodeEncodeError:
+                        # Byte non UTF-8 nel file in chiaro: la voce non è confrontabile
+                        continue
+                    except ValueError:
+                        invalid += 1
+                        continue
+                    if key is not None:
+                        buckets[key[0]].write(key)
+                        read += 1
+    finally:
+        for bucket in buckets:
+            bucket.close()
+    return read, invalid
+
+
+def write_index(workdir, output):
+    """Ordina ogni gruppo e scrive header, fanout e chiavi; restituisce le voci uniche"""
+    fanout = [0] * FANOUT_ENTRIES
+    partial = output + '.tmp'
+    count = 0
+    with open(partial, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, 0))
+        out.write(bytes(FANOUT_ENTRIES * 8))
+        for i in range(256):
+            with open(os.path.join(workdir, f'{i:02x}'), 'rb') as f:
+                data = f.read()
+            keys = sorted({data[j:j + ENTRY_SIZE] for j in range(0, len(data), ENTRY_SIZE)})
+            for key in keys:
+                fanout[(int.from_bytes(key[:2], 'big')) + 1] += 1
+            out.write(b''.join(keys))
+            count += len(keys)
+
+        # Fanout cumulativo: fanout[b] = prima voce con prefisso >= b
+        for b in range(1, FANOUT_ENTRIES):
+            fanout[b] += fanout[b - 1]
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, count))
+        out.write(struct.pack(f'<{FANOUT_ENTRIES}Q', *fanout))
+    os.replace(partial, output)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='file con una voce per riga')
+    parser.add_argument('--format', choices=FORMATS, required=True,
+                        help='plain = password in chiaro, sha1 = SHA-1 esadecimale[:conteggio]')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--min-count', type=int, default=1,
+                        help='negli elenchi HIBP, scarta gli hash visti meno volte (default 1)')
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            parser.error(f'file non trovato: {path}')
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    start = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix='pwindex-')
+    try:
+        print(f"📥 Lettura di {len(args.inputs)} file...")
+        read, invalid = partition(args.inputs, workdir, args.format, args.min_count)
+        if invalid:
+            print(f"⚠️  {invalid:,} righe scartate: non sono SHA-1 esadecimali[:conteggio]")
+        print(f"🔃 Ordinamento di {read:,} voci in 256 gruppi (fanout a {FANOUT_BITS} bit)...")
+        count = write_index(workdir, args.output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    size_mb = os.path.getsize(args.output) / 1024 / 1024
+    print(f"✅ {count:,} password uniche in {args.output} ({size_mb:.1f} MB, {time.perf_counter() - start:.1f}s)")
+    print(f"   Impostare PASSWORD_BREACH_INDEX={args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Calibrazione del costo bcrypt (BCRYPT_LOG_ROUNDS) per l'hardware corrente
+
+Misura il tempo di un hash bcrypt per ogni costo tra --min-rounds e
+--max-rounds e sceglie il costo più alto che resta entro --target-ms.
+Per ogni costo mostra anche quanti login al secondo regge il pool di hashing
+con --workers thread (HASH_WORKERS).
+
+Gli utenti esistenti non devono cambiare password: al primo login riuscito
+User.check_password ricalcola gli hash che hanno un costo diverso.
+
+Uso:
+    python calibrate_bcrypt.py [--target-ms 250] [--workers 4]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import bcrypt
+
+PASSWORD = b'Calibrazione-Bcrypt-123!'
+
+
+def measure(rounds, samples):
+    """
+    Returns:
+        float: tempo mediano in millisecondi di un hash con costo 'rounds'
+    """
+    timings = []
+    for _ in range(samples):
+        salt = bcrypt.gensalt(rounds)
+        start = time.perf_counter()
+        bcrypt.hashpw(PASSWORD, salt)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms, min_rounds, max_rounds, samples):
+    """
+    Returns:
+        tuple: (costo scelto, lista di (costo, ms)) - il costo minimo se nessuno rientra nel target
+    """
+    results = []
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        elapsed = measure(rounds, samples)
+        results.append((rounds, elapsed))
+        if elapsed <= target_ms:
+            chosen = rounds
+        else:
+            # Ogni punto di costo raddoppia il tempo: i successivi sono tutti fuori target
+            break
+    return chosen, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target-ms', type=float, default=250, help='latenza massima di un hash (default 250)')
+    parser.add_argument('--min-rounds', type=int, default=10)
+    parser.add_argument('--max-rounds', type=int, default=16)
+    parser.add_argument('--samples', type=int, default=3, help='misure per costo (si usa la mediana)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('HASH_WORKERS', min(4, os.cpu_count() or 1))))
+    args = parser.parse_args()
+
+    if not 4 <= args.min_rounds <= args.max_rounds <= 31:
+        parser.error('i costi bcrypt devono stare tra 4 e 31 (min <= max)')
+
+    print(f"🔐 Calibrazione bcrypt: target {args.target_ms:.0f} ms, {args.workers} worker\n")
+    chosen, results = calibrate(args.target_ms, args.min_rounds, args.max_rounds, args.samples)
+
+    print(f"{'costo':>6} {'ms/hash':>10} {'login/s':>10}")
+    for rounds, elapsed in results:
+        marker = '  ⬅' if rounds == chosen else ''
+        print(f"{rounds:>6} {elapsed:>10.1f} {args.workers * 1000 / elapsed:>10.1f}{marker}")
+
+    chosen_ms = dict(results)[chosen]
+    if chosen_ms > args.target_ms:
+        print(f"\n⚠️  Anche il costo minimo ({chosen}) supera il target")
+    print(f"\n✅ Costo consigliato: BCRYPT_LOG_ROUNDS={chosen}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
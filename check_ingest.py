@@ -0,0 +1,125 @@
+"""
+Verifica l'ingestion a blocchi accanto alle partizioni d'archivio
+
+Crea un database SQLite temporaneo con log distribuiti su più mesi, li
+ruota nelle partizioni e invia un blocco a /api/logs/ingest con un evento
+datato prima della partizione calda. Controlla che:
+- l'evento arretrato sia rifiutato con il numero di riga e gli altri scritti
+- logs contenga solo log più recenti di ogni partizione
+- /logs scorra tutti i log, in avanti e a ritroso, nell'ordine di
+  (timestamp, id) senza duplicati né buchi al confine tra logs e partizioni
+- i LOGIN_FAILED ricevuti arrivino agli alert in memoria
+
+Uso:
+    python check_ingest.py
+"""
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'ingest.db')
+TOKEN = 'check-ingest-token'
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['INGEST_TOKENS'] = TOKEN
+os.environ.setdefault('LOG_WRITER_ASYNC', '0')
+
+ROWS = 3000
+DAYS = 150
+PAGE_SIZE = 50
+
+
+def check(failures, ok, message):
+    print(f"{'✅' if ok else '❌'} {message}")
+    return failures + (not ok)
+
+
+def walk(app, paginate_logs, apply_log_filters):
+    """Id di tutte le pagine di /logs, dalla più recente e poi a ritroso dall'ultima"""
+    with app.test_request_context('/logs'):
+        _, query, _, _, archives = apply_log_filters({'type': '', 'ip': '', 'user': '', 'error': '', 'date': ''})
+        forward, cursor = [], None
+        while True:
+            logs, older, newer = paginate_logs(query, after=cursor, per_page=PAGE_SIZE, archives=archives)
+            forward += [log.id for log in logs]
+            if not older:
+                break
+            cursor = older
+        backward, cursor = [log.id for log in logs], newer
+        while cursor:
+            logs, _, cursor = paginate_logs(query, before=cursor, per_page=PAGE_SIZE, archives=archives)
+            backward = [log.id for log in logs] + backward
+    return forward, backward
+
+
+def main():
+    from app import app, apply_log_filters, db, paginate_logs
+    from model.analyzer import SecurityAnalyzer
+    from model.migrations import upgrade
+    from model.partitions import list_partitions, log_partitions
+
+    now = datetime.now()
+    hot_start = log_partitions.hot_start(now)
+    print(f"\n⏳ Database con {ROWS} log su {DAYS} giorni in {DB_PATH} (partizione calda da {hot_start:%Y-%m-%d})...")
+    with app.app_context():
+        db.create_all()
+        upgrade(app)
+        rows = [
+            (f'10.0.0.{i % 50}', 'PAGE_ACCESS', (now - timedelta(days=DAYS * i / ROWS)).strftime('%Y-%m-%d %H:%M:%S.%f'), 0)
+            for i in range(1, ROWS + 1)
+        ]
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('INSERT INTO logs (ip, type, timestamp, is_error) VALUES (?, ?, ?, ?)', rows)
+            moved, _ = log_partitions.maintain(connection)
+    print(f"   {sum(moved.values())} log in {len(moved)} partizioni")
+
+    events = [{'ip': '198.51.100.1', 'type': 'PAGE_ACCESS', 'timestamp': (hot_start - timedelta(days=1)).isoformat()}]
+    events.append({'ip': '198.51.100.2', 'type': 'PAGE_ACCESS', 'timestamp': (hot_start + timedelta(minutes=1)).isoformat()})
+    events += [
+        {'ip': '203.0.113.9', 'type': 'LOGIN_FAILED', 'is_error': True, 'timestamp': (now - timedelta(seconds=s)).isoformat()}
+        for s in range(10)
+    ]
+    client = app.test_client()
+    response = client.post('/api/logs/ingest', data='\n'.join(json.dumps(event) for event in events),
+                           headers={'Authorization': f'Bearer {TOKEN}'})
+    result = response.get_json()
+
+    print("\n" + "=" * 60)
+    print("INGESTION E PAGINAZIONE")
+    print("=" * 60)
+    failures = 0
+    failures = check(failures, response.status_code == 200 and result['accepted'] == len(events) - 1,
+                     f"{result['accepted']} eventi scritti su {len(events)}")
+    failures = check(failures, result['rejected'] == 1 and result['errors'][0]['line'] == 1,
+                     f"evento arretrato rifiutato: {result['errors'][0]['error'] if result['errors'] else '-'}")
+
+    with app.app_context():
+        oldest_hot = db.session.execute(db.text('SELECT min(timestamp) FROM logs')).scalar()
+        newest_archived = max(
+            db.session.execute(db.text(f'SELECT max(timestamp) FROM {partition.name}')).scalar()
+            for partition in list_partitions(db.session)
+        )
+        expected = [row[0] for row in db.session.execute(db.text(
+            ' UNION ALL '.join(['SELECT id, timestamp FROM logs'] + [
+                f'SELECT id, timestamp FROM {partition.name}' for partition in list_partitions(db.session)
+            ]) + ' ORDER BY timestamp DESC, id DESC'
+        ))]
+        alerts = SecurityAnalyzer.get_all_alerts()
+
+    failures = check(failures, oldest_hot > newest_archived,
+                     f"logs più recente di ogni partizione ({oldest_hot[:10]} > {newest_archived[:10]})")
+    forward, backward = walk(app, paginate_logs, apply_log_filters)
+    failures = check(failures, forward == expected,
+                     f"/logs in avanti: {len(forward)} log su {len(expected)}, ordine di (timestamp, id)")
+    failures = check(failures, backward == expected, f"/logs a ritroso: {len(backward)} log")
+    failures = check(failures, any(alert['ip'] == '203.0.113.9' for alert in alerts['brute_force']),
+                     "alert brute force dai LOGIN_FAILED ricevuti")
+    print("=" * 60 + "\n")
+
+    os.remove(DB_PATH)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
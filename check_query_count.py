@@ -0,0 +1,109 @@
+"""
+Verifica che /logs e db_utils.show_logs non facciano una query per ogni riga
+
+Crea un database SQLite temporaneo con log associati a più utenti, conta le
+SELECT eseguite con pagine da 10 e da 200 righe e controlla che siano uguali
+(nessun caricamento di Log.user riga per riga).
+
+Uso:
+    python check_query_count.py
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from explain_queries import build_database
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'query_count.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ.setdefault('LOG_WRITER_ASYNC', '0')
+
+ROWS = 20_000
+USERS = 5
+PAGE_SIZES = (10, 200)
+
+
+class QueryCounter:
+    """Conta le SELECT eseguite da tutti gli engine (principale e sola lettura)"""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            self.count += 1
+
+    @contextlib.contextmanager
+    def measure(self):
+        start = self.count
+        result = {}
+        yield result
+        result['queries'] = self.count - start
+
+
+def main():
+    print(f"\n⏳ Creazione database con {ROWS} log in {DB_PATH}...")
+    build_database(DB_PATH, ROWS, days=1).dispose()
+
+    from app import app, db, ensure_admin_user
+    from model.user import create_user
+    import db_utils
+
+    with app.app_context():
+        for i in range(USERS):
+            create_user(f'utente{i}', 'Password123!')
+        ensure_admin_user()
+        # Un log su USERS + 1 resta anonimo, gli altri vanno ai vari utenti
+        db.session.execute(db.text(
+            f'UPDATE logs SET user_id = NULLIF(id % {USERS + 1}, 0)'
+        ))
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': os.getenv('ADMIN_PASSWORD', 'Admin123!')})
+    client.get('/logs')  # primo accesso: carica lo storico del detector
+
+    counter = QueryCounter()
+    failures = 0
+
+    print("\n" + "=" * 60)
+    print("QUERY PER RICHIESTA")
+    print("=" * 60)
+
+    counts = []
+    for page_size in PAGE_SIZES:
+        app.config['LOGS_PAGE_SIZE'] = page_size
+        with counter.measure() as result:
+            response = client.get('/logs')
+        counts.append(result['queries'])
+        ok = response.status_code == 200 and b'utente' in response.data
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} /logs, {page_size} righe: {result['queries']} SELECT")
+
+    counts_logs = counts
+    counts = []
+    with app.app_context():
+        for limit in PAGE_SIZES:
+            with counter.measure() as result, contextlib.redirect_stdout(io.StringIO()):
+                db_utils.show_logs(limit)
+            counts.append(result['queries'])
+            print(f"   show_logs({limit}): {result['queries']} SELECT")
+
+    for name, values in (('/logs', counts_logs), ('show_logs', counts)):
+        ok = len(set(values)) == 1
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: numero di query indipendente dalle righe")
+    print("=" * 60 + "\n")
+
+    os.remove(DB_PATH)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,10 @@ Utility per gestione database - Query rapide
 """
 from app import app, db
 from model.user import User
-from model.log import Log
+from model.log import Log, get_recent_log_rows
+from model.rollup import prune_minute_counts, rollup_summary
+from model.partitions import list_partitions, log_partitions
+from model.cold_archive import cold_archiver
 from datetime import datetime
 
 def show_users():
@@ -21,13 +24,13 @@ def show_users():
 def show_logs(limit=20):
     """Mostra gli ultimi log"""
     with app.app_context():
-        logs = Log.query.order_by(Log.timestamp.desc()).limit(limit).all()
+        logs = get_recent_log_rows(limit)
         print("\n" + "="*80)
         print(f"ULTIMI {limit} LOG")
         print("="*80)
         for log in logs:
             error_flag = "⚠️" if log.is_error else "✓"
-            username = log.user.username if log.user else "N/A"
+            username = log.username or "N/A"
             print(f"{error_flag} [{log.timestamp.strftime('%d/%m %H:%M:%S')}] {log.type:20} | IP: {log.ip:15} | User: {username}")
         print("="*80)
         print(f"Totale log nel DB: {Log.query.count()}\n")
@@ -35,13 +38,16 @@ def show_logs(limit=20):
 def show_stats():
     """Mostra statistiche dettagliate"""
     with app.app_context():
-        total_logs = Log.query.count()
-        login_success = Log.query.filter_by(type="LOGIN_SUCCESS").count()
-        login_failed = Log.query.filter_by(type="LOGIN_FAILED").count()
-        register = Log.query.filter_by(type="REGISTER_SUCCESS").count()
-        logout = Log.query.filter_by(type="LOGOUT").count()
-        page_access = Log.query.filter(Log.type.like("PAGE_ACCESS%")).count()
-        errors = Log.query.filter_by(is_error=True).count()
+        # Una sola query sui conteggi orari invece di un COUNT per voce
+        summary = rollup_summary(db.session)
+        by_type = summary['by_type']
+        total_logs = summary['total']
+        login_success = by_type.get("LOGIN_SUCCESS", 0)
+        login_failed = by_type.get("LOGIN_FAILED", 0)
+        register = by_type.get("REGISTER_SUCCESS", 0)
+        logout = by_type.get("LOGOUT", 0)
+        page_access = sum(count for log_type, count in by_type.items() if log_type.startswith("PAGE_ACCESS"))
+        errors = summary['errors']
         
         print("\n" + "="*60)
         print("STATISTICHE DETTAGLIATE")
@@ -59,14 +65,44 @@ def clear_logs():
     """Cancella tutti i log (ATTENZIONE!)"""
     with app.app_context():
         count = Log.query.count()
-        confirm = input(f"⚠️  Vuoi eliminare {count} log? (si/no): ")
+        partitions = list_partitions(db.session)
+        archives = cold_archiver.archives()
+        confirm = input(f"⚠️  Vuoi eliminare {count} log, {len(partitions)} partizioni d'archivio "
+                        f"e {len(archives)} file d'archivio? (si/no): ")
         if confirm.lower() == 'si':
-            Log.query.delete()
-            db.session.commit()
+            # Una sola transazione: tabelle, indice di ricerca, conteggi e file
+            # (rimossi dopo il commit) spariscono insieme o restano tutti
+            with cold_archiver.transaction(db.engine) as connection:
+                for archive in archives:
+                    cold_archiver.drop(connection, archive)
+                log_partitions.clear(connection)
             print(f"✅ {count} log eliminati\n")
         else:
             print("❌ Operazione annullata\n")
 
+def compact_rollups():
+    """Elimina i conteggi per minuto più vecchi del periodo di dettaglio"""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            removed = prune_minute_counts(connection)
+        print(f"✅ {removed} righe per minuto compattate (restano i conteggi orari)\n")
+
+def rotate_partitions():
+    """Sposta in archivio i periodi vecchi, porta su file i più vecchi e applica la retention"""
+    with app.app_context():
+        with cold_archiver.transaction(db.engine) as connection:
+            moved, dropped = log_partitions.maintain(connection)
+            archived, expired = cold_archiver.maintain(connection)
+            partitions = list_partitions(connection)
+        for name, count in moved.items():
+            print(f"📦 {count} log spostati in {name}")
+        for name, count in archived.items():
+            print(f"🧊 {name} archiviata su file ({count} log)")
+        for name in dropped + expired:
+            print(f"🗑️  Partizione {name} eliminata")
+        print(f"✅ {len(partitions)} partizioni d'archivio, {len(cold_archiver.archives())} file d'archivio, "
+              f"{Log.query.count()} log nella partizione calda\n")
+
 def menu():
     """Menu interattivo"""
     print("\n" + "="*60)
@@ -77,6 +113,8 @@ def menu():
     print("3. Mostra ultimi 50 log")
     print("4. Mostra statistiche")
     print("5. Cancella tutti i log")
+    print("6. Compatta rollup per minuto")
+    print("7. Ruota partizioni dei log, archivia su file e applica retention")
     print("0. Esci")
     print("="*60)
     
@@ -92,6 +130,10 @@ def menu():
         show_stats()
     elif choice == '5':
         clear_logs()
+    elif choice == '6':
+        compact_rollups()
+    elif choice == '7':
+        rotate_partitions()
     elif choice == '0':
         print("👋 Arrivederci!\n")
         return False
@@ -0,0 +1,163 @@
+"""
+Verifica con EXPLAIN QUERY PLAN che le query di analyzer e dashboard usino un indice
+
+Crea un database SQLite sintetico (5M log di default), applica le migrazioni
+e controlla che nessuna query faccia una scansione completa della tabella logs.
+
+Uso:
+    python explain_queries.py [--rows N] [--db percorso]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, tuple_
+from sqlalchemy.schema import CreateTable
+
+from model import db
+from model.analyzer import SecurityAnalyzer
+from model.log import Log
+from model.migrations import ensure_log_indexes
+from model.rollup import ensure_rollups
+from model.search import DISTINCT_TYPES, ensure_search_index, logs_search
+
+LOG_TYPES = [
+    ('PAGE_ACCESS', False, 50), ('LOGIN_SUCCESS', False, 15), ('LOGIN_FAILED', True, 12),
+    ('LOGOUT', False, 8), ('REGISTER_SUCCESS', False, 3), ('CONTACT_FORM_SUCCESS', False, 4),
+    ('PAGE_NOT_FOUND', True, 4), ('MALICIOUS_INPUT_SQL_INJECTION', True, 2),
+    ('MALICIOUS_INPUT_XSS', True, 1), ('MALICIOUS_INPUT_COMMAND_INJECTION', True, 1),
+]
+
+
+def build_database(path, rows, days=30, seed=42):
+    """Crea le tabelle e inserisce 'rows' log sintetici distribuiti su 'days' giorni"""
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        db.metadata.tables['users'].create(connection, checkfirst=True)
+        # Tabella senza indici: caricare prima e indicizzare dopo è molto più veloce
+        connection.execute(CreateTable(Log.__table__, include_foreign_key_constraints=[]))
+
+    rng = random.Random(seed)
+    types = [t for t, _, _ in LOG_TYPES]
+    errors = {t: e for t, e, _ in LOG_TYPES}
+    weights = [w for _, _, w in LOG_TYPES]
+    ips = [f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}' for _ in range(5000)]
+    start = datetime.now() - timedelta(days=days)
+    step = days * 86400 / rows
+
+    def generate():
+        for i in range(rows):
+            log_type = rng.choices(types, weights)[0]
+            timestamp = start + timedelta(seconds=i * step)
+            yield (rng.choice(ips), log_type, timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                   int(errors[log_type]), None)
+
+    raw = sqlite3.connect(path)
+    raw.execute('PRAGMA journal_mode=OFF')
+    raw.execute('PRAGMA synchronous=OFF')
+    raw.executemany('INSERT INTO logs (ip, type, timestamp, is_error, user_id) VALUES (?, ?, ?, ?, ?)', generate())
+    raw.commit()
+    raw.close()
+
+    with engine.begin() as connection:
+        ensure_log_indexes(connection)
+        ensure_search_index(connection)
+        ensure_rollups(connection)
+        connection.exec_driver_sql('ANALYZE')
+    return engine
+
+
+def analyzer_queries():
+    """Query eseguite da SecurityAnalyzer e dalla dashboard /logs"""
+    now = datetime.now()
+    five_minutes = now - timedelta(minutes=5)
+    one_day = now - timedelta(hours=24)
+    return {
+        'detect_brute_force': select(Log.ip, func.count(Log.id), func.max(Log.timestamp))
+            .where(Log.type == 'LOGIN_FAILED', Log.timestamp >= five_minutes)
+            .group_by(Log.ip),
+        'detect_suspicious_ips': select(Log.ip, func.count(Log.id))
+            .where(Log.is_error == True, Log.timestamp >= one_day)
+            .group_by(Log.ip),
+        'detect_malicious_inputs': select(Log)
+            .where(Log.type == 'MALICIOUS_INPUT_XSS', Log.timestamp >= one_day),
+        'get_all_alerts': SecurityAnalyzer.alert_counts_statement(five_minutes, one_day, one_day),
+        '/logs': select(Log).order_by(Log.timestamp.desc(), Log.id.desc()).limit(201),
+        '/logs?after=': select(Log)
+            .where(tuple_(Log.timestamp, Log.id) < (one_day, 1))
+            .order_by(Log.timestamp.desc(), Log.id.desc()).limit(201),
+        '/logs?ip=': select(Log)
+            .where(Log.id.in_(select(logs_search.c.rowid).where(logs_search.c.ip.like('%.123.45%'))))
+            .order_by(Log.timestamp.desc(), Log.id.desc()).limit(201),
+        '/logs?type= (tipi distinti)': DISTINCT_TYPES,
+    }
+
+
+def explain(connection, statement):
+    """
+    Returns:
+        tuple: (righe del piano, tempo di esecuzione in ms)
+    """
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(
+        str(value) if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params)]
+    start = time.perf_counter()
+    connection.exec_driver_sql(str(compiled), params).fetchall()
+    return plan, (time.perf_counter() - start) * 1000
+
+
+def uses_index(plan):
+    """Vero se nessun passo del piano legge logs senza indice o scorre tutti i conteggi"""
+    for step in plan:
+        if step.startswith('SCAN log_counts'):
+            return False
+        if 'logs' in step and ('SCAN' in step or 'SEARCH' in step) and 'INDEX' not in step \
+                and 'PRIMARY KEY' not in step:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--db', help='file SQLite da usare (default: file temporaneo)')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'explain.db')
+    if os.path.exists(path):
+        os.remove(path)
+
+    print(f"\n⏳ Creazione database sintetico con {args.rows} log in {path}...")
+    start = time.perf_counter()
+    engine = build_database(path, args.rows)
+    print(f"   fatto in {time.perf_counter() - start:.1f}s")
+
+    failures = 0
+    print("\n" + "=" * 80)
+    print("EXPLAIN QUERY PLAN")
+    print("=" * 80)
+    with engine.connect() as connection:
+        for name, statement in analyzer_queries().items():
+            plan, elapsed = explain(connection, statement)
+            ok = uses_index(plan)
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name} ({elapsed:.1f} ms)")
+            for step in plan:
+                print(f"     {step}")
+    print("=" * 80 + "\n")
+
+    if not args.db:
+        os.remove(path)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
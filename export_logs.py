@@ -0,0 +1,67 @@
+"""
+Export dei log in CSV o NDJSON con gli stessi filtri di /logs
+
+Le righe vengono lette e scritte a blocchi: la memoria resta costante anche
+con decine di milioni di log. Partizioni e archivi su file sono inclusi.
+
+Uso:
+    python export_logs.py -o logs.csv
+    python export_logs.py --type LOGIN_FAILED --date 2026-01-15 --format ndjson --gzip -o failed.ndjson.gz
+    python export_logs.py --error true | head
+"""
+import argparse
+import os
+import sys
+import time
+
+from app import app, apply_log_filters
+from model.export import FORMATS, export_logs, iter_log_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--type', default='', help='tipo di evento (sottostringa)')
+    parser.add_argument('--ip', default='', help='indirizzo IP (sottostringa)')
+    parser.add_argument('--user', default='', help='username (sottostringa)')
+    parser.add_argument('--error', choices=('true', 'false'), default='', help='solo errori o solo non errori')
+    parser.add_argument('--date', default='', help='solo il giorno AAAA-MM-GG')
+    parser.add_argument('--format', choices=tuple(FORMATS), default='csv')
+    parser.add_argument('--gzip', action='store_true', help='comprime l\'output in gzip')
+    parser.add_argument('-o', '--output', help='file di destinazione (default: stdout)')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help='righe lette e scritte per volta (default EXPORT_CHUNK_ROWS)')
+    args = parser.parse_args()
+
+    filters = {'type': args.type, 'ip': args.ip, 'user': args.user, 'error': args.error, 'date': args.date}
+    chunk_size = args.chunk_rows or app.config['EXPORT_CHUNK_ROWS']
+    exported = 0
+
+    def counted(rows):
+        nonlocal exported
+        for row in rows:
+            exported += 1
+            yield row
+
+    start = time.perf_counter()
+    with app.app_context():
+        _, query, _, _, archives = apply_log_filters(filters)
+        chunks = export_logs(counted(iter_log_rows(query, archives, chunk_size)), args.format, args.gzip, chunk_size)
+        out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        except BrokenPipeError:
+            # Output chiuso prima della fine (es. | head): niente errore all'uscita
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        finally:
+            if args.output:
+                out.close()
+
+    # I messaggi vanno su stderr per non finire nell'export scritto su stdout
+    print(f"✅ {exported:,} log esportati in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
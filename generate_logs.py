@@ -0,0 +1,421 @@
+"""
+Generatore di dati sintetici per il database del SIEM
+
+Riempie users e logs con distribuzioni realistiche e riproducibili (stesso
+--seed, stessi dati rispetto all'ora di generazione):
+- traffico diurno e settimanale (picchi in orario d'ufficio, notti e weekend
+  più calmi) con utenti più o meno attivi e i loro IP abituali
+- tempeste di login (inizio giornata, ripartenza dopo un'ondata di
+  INTERNAL_SERVER_ERROR)
+- brute force a raffica da un IP o da una botnet, con LOGIN_RATE_LIMITED e
+  qualche login riuscito alla fine
+- campagne MALICIOUS_INPUT_* da pochi IP per alcune ore, con scansioni 404
+
+I log sono scritti in ordine cronologico con executemany su una tabella
+senza indici; indici, indice di ricerca e rollup vengono creati alla fine
+dalle migrazioni, come in explain_queries.py. 10M di log richiedono circa
+4 minuti e 4 GB su disco, indici e indice di ricerca compresi.
+
+Uso:
+    python generate_logs.py --rows 1000000
+    python generate_logs.py --rows 10000000 --days 180 --users 5000 --db /tmp/siem.db --force
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+
+from model import db
+from model.alerts import ATTACK_TYPES, MALICIOUS_PREFIX
+from model.hashing import hashing_pool
+from model.log import Log
+from model.migrations import MIGRATIONS
+from model.user import User
+
+HOUR = 3600 * 10**6  # microsecondi
+
+# Peso relativo del traffico per ora del giorno (0-23) e per giorno della settimana
+HOURLY_TRAFFIC = [
+    0.15, 0.10, 0.08, 0.07, 0.07, 0.10, 0.25, 0.55, 0.95, 1.00, 1.00, 0.95,
+    0.80, 0.85, 0.95, 1.00, 0.95, 0.85, 0.70, 0.55, 0.45, 0.38, 0.30, 0.22,
+]
+WEEKDAY_TRAFFIC = [1.0, 1.0, 1.0, 1.0, 0.9, 0.45, 0.35]
+
+# Traffico ordinario: (tipo, is_error, peso, chi lo genera)
+# 'user' = utente loggato dal suo IP, 'login' = utente non ancora loggato,
+# 'admin' = amministratore, 'visitor' = IP qualsiasi senza utente
+BASELINE_TYPES = [
+    ('PAGE_ACCESS', False, 550, 'user'), ('LOGIN_SUCCESS', False, 120, 'user'),
+    ('LOGOUT', False, 90, 'user'), ('LOGIN_FAILED', True, 35, 'login'),
+    ('PAGE_NOT_FOUND', True, 60, 'visitor'), ('CONTACT_FORM_SUCCESS', False, 20, 'user'),
+    ('PAGE_ACCESS_LOGS', False, 12, 'admin'), ('LOGS_EXPORT', False, 1, 'admin'),
+    ('PASSWORD_CHANGE_SUCCESS', False, 3, 'user'), ('PASSWORD_CHANGE_FAILED', True, 1, 'user'),
+    ('ACCOUNT_DELETED', False, 0.2, 'user'), ('INTERNAL_SERVER_ERROR', True, 0.5, 'visitor'),
+    (MALICIOUS_PREFIX + 'SQL_INJECTION', True, 1, 'visitor'), (MALICIOUS_PREFIX + 'XSS', True, 0.5, 'visitor'),
+]
+
+# Probabilità di ciascun tipo di incidente e di ciascun attacco nelle campagne
+INCIDENT_KINDS = [('brute_force', 0.45), ('campaign', 0.35), ('login_storm', 0.20)]
+ATTACK_WEIGHTS = {'SQL_INJECTION': 0.45, 'XSS': 0.30, 'PATH_TRAVERSAL': 0.15, 'COMMAND_INJECTION': 0.10}
+
+FIRST_NAMES = [
+    'mario', 'luca', 'giulia', 'francesca', 'marco', 'sara', 'andrea', 'chiara', 'matteo', 'elena',
+    'paolo', 'laura', 'davide', 'anna', 'simone', 'martina', 'alessandro', 'valentina', 'federico',
+    'silvia', 'giorgio', 'alice', 'stefano', 'elisa', 'roberto', 'marta', 'fabio', 'irene', 'nicola',
+    'sofia', 'lorenzo', 'giada', 'riccardo', 'beatrice', 'tommaso', 'camilla', 'emma', 'pietro',
+]
+LAST_NAMES = [
+    'rossi', 'russo', 'ferrari', 'esposito', 'bianchi', 'romano', 'colombo', 'ricci', 'marino',
+    'greco', 'bruno', 'gallo', 'conti', 'deluca', 'mancini', 'costa', 'giordano', 'rizzo', 'lombardi',
+    'moretti', 'barbieri', 'fontana', 'santoro', 'mariani', 'rinaldi', 'caruso', 'ferrara', 'galli',
+]
+
+
+def random_ip(rng, public=True, ipv6_share=0.05):
+    """IPv4 pubblico plausibile (o privato con public=False), a volte IPv6"""
+    if public and rng.random() < ipv6_share:
+        groups = [rng.randint(0, 0xffff) for _ in range(4)]
+        return '2a0{}:{:x}:{:x}:{:x}::{:x}'.format(rng.randint(0, 9), *groups)
+    if not public:
+        return f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}'
+    while True:
+        first = rng.randint(1, 223)
+        if first not in (10, 100, 127, 169, 172, 192):
+            return f'{first}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}'
+
+
+class SyntheticSIEM:
+    """
+    Utenti, IP e log sintetici per una finestra di 'days' giorni che termina ora
+
+    I log escono ora per ora in ordine di timestamp: il traffico ordinario è
+    distribuito secondo HOURLY_TRAFFIC e WEEKDAY_TRAFFIC, gli incidenti
+    occupano circa 'incident_share' delle righe.
+    """
+
+    def __init__(self, rows, days=30, users=1000, seed=42, incident_share=0.05):
+        self.rng = random.Random(seed)
+        self.rows = rows
+        self.end = datetime.now().replace(minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=days)
+        self.hours = days * 24
+
+        self._make_users(users)
+        self.visitors = [random_ip(self.rng) for _ in range(max(1000, users * 5))]
+
+        # Eventi degli incidenti per ora: {ora: [(offset µs, ip, tipo, is_error, user_id), ...]}
+        self.incidents = {}
+        self.incident_counts = dict.fromkeys((kind for kind, _ in INCIDENT_KINDS), 0)
+        self.incident_rows = 0
+        self._add_registrations()
+        self.registrations = self.incident_rows
+        self._make_incidents(int(rows * incident_share))
+        self.baseline_counts = self._hour_counts(rows - self.incident_rows)
+
+    # --- Utenti -----------------------------------------------------------
+
+    def _make_users(self, count):
+        """Utenti ordinati per data di registrazione: id = posizione + 1"""
+        rng = self.rng
+        names = {'admin'}
+        while len(names) < count:
+            name = f'{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}'
+            names.add(name if name not in names else f'{name}{rng.randint(2, 999)}')
+        names.discard('admin')
+
+        window = (self.end - self.start).total_seconds()
+        # Il 70% esisteva già prima della finestra, gli altri si registrano durante
+        created = sorted(
+            self.start - timedelta(seconds=rng.uniform(0, 365 * 86400)) if rng.random() < 0.7
+            else self.start + timedelta(seconds=rng.uniform(0, window))
+            for _ in range(count - 1)
+        )
+        names = sorted(names)
+        rng.shuffle(names)
+        self.users = [('admin', self.start - timedelta(days=400), True)]
+        self.users += [(name, when, False) for name, when in zip(names, created)]
+        self.created = [when for _, when, _ in self.users]
+        admins = max(1, count // 500)
+        self.admin_ids = [1] + rng.sample(range(2, count + 1), min(admins - 1, count - 1))
+
+        # IP abituali: ufficio (rete privata) o casa, qualcuno anche dal telefono
+        self.user_ips = [
+            [random_ip(rng, public=rng.random() < 0.6)] + ([random_ip(rng)] if rng.random() < 0.3 else [])
+            for _ in self.users
+        ]
+        # Attività per utente con coda lunga: pochi utenti fanno gran parte del traffico
+        self.user_activity = list(itertools.accumulate(rng.paretovariate(1.2) for _ in self.users))
+
+    def user_rows(self):
+        """Utenti come (username, created_at, is_admin), nell'ordine degli id"""
+        return self.users
+
+    def _active_user(self, moment):
+        """Utente registrato prima di 'moment', scelto in base all'attività"""
+        active = bisect.bisect_right(self.created, moment) or 1
+        user = bisect.bisect_left(self.user_activity, self.rng.random() * self.user_activity[active - 1])
+        return user + 1
+
+    # --- Incidenti --------------------------------------------------------
+
+    def _add(self, micros, ip, log_type, is_error, user_id=None):
+        if 0 <= micros < self.hours * HOUR:
+            hour, offset = divmod(int(micros), HOUR)
+            self.incidents.setdefault(hour, []).append((offset, ip, log_type, is_error, user_id))
+            self.incident_rows += 1
+
+    def _micros(self, moment):
+        return (moment - self.start) / timedelta(microseconds=1)
+
+    def _add_registrations(self):
+        for user_id, created in enumerate(self.created, 1):
+            if created >= self.start:
+                self._add(self._micros(created), self.user_ips[user_id - 1][0], 'REGISTER_SUCCESS', False, user_id)
+
+    def _make_incidents(self, budget):
+        """
+        Genera incidenti finché non esauriscono 'budget' righe
+
+        Il primo di ogni tipo cade nelle ultime 24 ore, così gli alert della
+        dashboard non sono vuoti appena generato il database.
+        """
+        rng = self.rng
+        kinds = [kind for kind, _ in INCIDENT_KINDS]
+        weights = [weight for _, weight in INCIDENT_KINDS]
+        total = self.hours * HOUR
+        pending = list(kinds)
+        # Le registrazioni degli utenti non consumano il budget
+        budget += self.registrations
+        while self.incident_rows < budget:
+            kind = pending.pop(0) if pending else rng.choices(kinds, weights)[0]
+            at = total - rng.uniform(1, 23) * HOUR if self.incident_counts[kind] == 0 else rng.uniform(0, total)
+            getattr(self, f'_{kind}')(at, budget - self.incident_rows)
+            self.incident_counts[kind] += 1
+
+    def _brute_force(self, at, budget):
+        """Raffica di LOGIN_FAILED da un IP (o da una botnet) in pochi minuti"""
+        rng = self.rng
+        attempts = min(budget, int(rng.paretovariate(1.3) * 40))
+        duration = rng.uniform(1, 15) * 60 * 10**6
+        botnet = rng.random() < 0.2
+        ips = [random_ip(rng) for _ in range(rng.randint(20, 200) if botnet else 1)]
+        last = at
+        for _ in range(attempts):
+            moment = at + rng.random() * duration
+            self._add(moment, rng.choice(ips), 'LOGIN_FAILED', True)
+            last = max(last, moment)
+        if not botnet:
+            # Il limiter blocca l'IP e registra un evento per ogni blocco
+            for minute in range(int(duration // (60 * 10**6))):
+                self._add(at + (minute + 1) * 60 * 10**6, ips[0], 'LOGIN_RATE_LIMITED', True)
+        if rng.random() < 0.05:
+            # Password indovinata: l'attaccante entra e naviga
+            victim = self._active_user(self.start + timedelta(microseconds=at))
+            self._add(last + 2 * 10**6, ips[-1], 'LOGIN_SUCCESS', False, victim)
+            for second in range(rng.randint(1, 20)):
+                self._add(last + (second + 3) * 10**6, ips[-1], 'PAGE_ACCESS', False, victim)
+
+    def _campaign(self, at, budget):
+        """Campagna MALICIOUS_INPUT_* da pochi IP per alcune ore, con scansioni 404"""
+        rng = self.rng
+        events = min(budget, int(rng.paretovariate(1.2) * 80))
+        duration = rng.uniform(0.5, 12) * HOUR
+        ips = [random_ip(rng) for _ in range(rng.randint(1, 6))]
+        attacks = rng.sample(ATTACK_TYPES, rng.randint(1, 2))
+        attack_weights = [ATTACK_WEIGHTS.get(attack, 0.1) for attack in attacks]
+        for _ in range(events):
+            moment = at + rng.random() * duration
+            if rng.random() < 0.3:
+                self._add(moment, rng.choice(ips), 'PAGE_NOT_FOUND', True)
+            else:
+                attack = rng.choices(attacks, attack_weights)[0]
+                self._add(moment, rng.choice(ips), MALICIOUS_PREFIX + attack, True)
+
+    def _login_storm(self, at, budget):
+        """Molti utenti che entrano insieme: inizio giornata o ripartenza dopo un guasto"""
+        rng = self.rng
+        moment = self.start + timedelta(microseconds=at)
+        if rng.random() < 0.5:
+            # Ondata di errori 500 nei minuti prima della ripartenza
+            for _ in range(min(budget // 4, rng.randint(20, 300))):
+                self._add(at - rng.random() * 10 * 60 * 10**6, rng.choice(self.visitors), 'INTERNAL_SERVER_ERROR', True)
+        else:
+            # Lunedì-venerdì alle 8-9
+            day = moment.replace(hour=8, minute=0, second=0, microsecond=0)
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+            at = self._micros(day) + rng.uniform(0, 1) * HOUR
+        logins = min(max(budget // 3, 1), rng.randint(100, 2000))
+        window = rng.uniform(5, 20) * 60 * 10**6
+        for _ in range(logins):
+            when = at + rng.random() * window
+            user_id = self._active_user(self.start + timedelta(microseconds=when))
+            ip = rng.choice(self.user_ips[user_id - 1])
+            if rng.random() < 0.08:
+                self._add(when, ip, 'LOGIN_FAILED', True)
+                when += rng.uniform(5, 30) * 10**6
+            self._add(when, ip, 'LOGIN_SUCCESS', False, user_id)
+            self._add(when + rng.uniform(1, 10) * 10**6, ip, 'PAGE_ACCESS', False, user_id)
+
+    # --- Traffico ordinario -----------------------------------------------
+
+    def _hour_counts(self, rows):
+        """Ripartisce 'rows' sulle ore secondo il profilo diurno/settimanale, con rumore"""
+        rng = self.rng
+        weights = []
+        for hour in range(self.hours):
+            moment = self.start + timedelta(hours=hour)
+            weight = HOURLY_TRAFFIC[moment.hour] * WEEKDAY_TRAFFIC[moment.weekday()]
+            weights.append(weight * max(0.2, rng.gauss(1, 0.15)))
+        # Arrotondamento cumulativo: la somma è esattamente 'rows'
+        scale = max(rows, 0) / sum(weights)
+        bounds = [round(total * scale) for total in itertools.accumulate(weights)]
+        return [high - low for low, high in zip([0] + bounds, bounds)]
+
+    def hour_logs(self, hour):
+        """Log di un'ora, ordinati: (ip, type, timestamp, is_error, user_id)"""
+        rng = self.rng
+        moment = self.start + timedelta(hours=hour)
+        prefix = moment.strftime('%Y-%m-%d %H:')
+        visitors = self.visitors
+        admin_ids = self.admin_ids
+        user_ips = self.user_ips
+        # Utenti attivi nell'ora: il traffico di un utente arriva in sessioni
+        session_users = [self._active_user(moment) for _ in range(max(1, self.baseline_counts[hour] // 8))]
+
+        # random() e indici invece di rng.choice: il ciclo gira per ogni log
+        random = rng.random
+        users = len(session_users)
+        events = []
+        types = rng.choices(BASELINE_CHOICES, cum_weights=BASELINE_CUM_WEIGHTS, k=self.baseline_counts[hour])
+        for log_type, is_error, actor in types:
+            if actor == 'user':
+                user_id = session_users[int(random() * users)]
+                ips = user_ips[user_id - 1]
+                ip = ips[int(random() * len(ips))]
+            elif actor == 'login':
+                user_id = None
+                ip = user_ips[session_users[int(random() * users)] - 1][0]
+            elif actor == 'admin':
+                user_id = admin_ids[int(random() * len(admin_ids))]
+                ip = user_ips[user_id - 1][0]
+            else:
+                user_id = None
+                # Pochi visitatori fanno gran parte delle richieste
+                ip = visitors[int(len(visitors) * random() ** 3)]
+            events.append((int(random() * HOUR), ip, log_type, is_error, user_id))
+        events.extend(self.incidents.pop(hour, ()))
+        events.sort(key=lambda event: event[0])
+
+        return [
+            (ip, log_type, f'{prefix}{MINUTE_SECOND[offset // 1000000]}.{offset % 1000000:06d}', int(is_error), user_id)
+            for offset, ip, log_type, is_error, user_id in events
+        ]
+
+    def logs(self):
+        """Tutti i log in ordine cronologico, un'ora alla volta"""
+        for hour in range(self.hours):
+            yield self.hour_logs(hour)
+
+
+BASELINE_CHOICES = [(log_type, is_error, actor) for log_type, is_error, _, actor in BASELINE_TYPES]
+BASELINE_CUM_WEIGHTS = list(itertools.accumulate(weight for _, _, weight, _ in BASELINE_TYPES))
+# 'MM:SS' per ogni secondo dell'ora: il timestamp è prefisso dell'ora + questo + microsecondi
+MINUTE_SECOND = [f'{second // 60:02d}:{second % 60:02d}' for second in range(3600)]
+
+
+def build_database(path, generator, password):
+    """
+    Crea il database in 'path' e lo riempie con i dati di 'generator'
+
+    Returns:
+        int: log scritti
+    """
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        User.__table__.create(connection)
+        # Tabella senza indici: caricare prima e indicizzare dopo è molto più veloce
+        connection.execute(CreateTable(Log.__table__, include_foreign_key_constraints=[]))
+
+    raw = sqlite3.connect(path)
+    raw.execute('PRAGMA journal_mode=OFF')
+    raw.execute('PRAGMA synchronous=OFF')
+    raw.execute('PRAGMA cache_size=-200000')
+
+    hashed = hashing_pool.generate(password)
+    raw.executemany(
+        'INSERT INTO users (id, username, password, created_at, is_admin) VALUES (?, ?, ?, ?, ?)',
+        ((user_id, name, hashed, created.strftime('%Y-%m-%d %H:%M:%S.%f'), int(is_admin))
+         for user_id, (name, created, is_admin) in enumerate(generator.user_rows(), 1))
+    )
+
+    written = 0
+    start = time.perf_counter()
+    for hour, rows in enumerate(generator.logs(), 1):
+        raw.executemany('INSERT INTO logs (ip, type, timestamp, is_error, user_id) VALUES (?, ?, ?, ?, ?)', rows)
+        written += len(rows)
+        if hour % 24 == 0 or hour == generator.hours:
+            rate = written / max(time.perf_counter() - start, 1e-9)
+            print(f"\r   {written:,} log, giorno {hour // 24}/{generator.hours // 24} ({rate:,.0f} log/s)",
+                  end='', flush=True)
+    raw.commit()
+    raw.close()
+    print()
+
+    print("⏳ Indici, indice di ricerca e rollup...")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for migration in MIGRATIONS:
+            migration(connection)
+        connection.exec_driver_sql('ANALYZE')
+    engine.dispose()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='log da generare (circa)')
+    parser.add_argument('--days', type=int, default=30, help='giorni coperti, fino all\'ora corrente')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--incident-share', type=float, default=0.05,
+                        help='quota di log che appartiene agli incidenti (default 0.05)')
+    parser.add_argument('--password', default='Synthetic-2026!', help='password di tutti gli utenti generati')
+    parser.add_argument('--db', default='instance/users.db', help='file SQLite da creare')
+    parser.add_argument('--force', action='store_true', help='sovrascrive un database esistente')
+    args = parser.parse_args()
+
+    if args.rows < 0 or args.days < 1 or args.users < 1 or not 0 <= args.incident_share < 1:
+        parser.error('valori non validi per --rows, --days, --users o --incident-share')
+    if os.path.exists(args.db):
+        if not args.force:
+            print(f"❌ {args.db} esiste già: usa --force per sostituirlo")
+            return 1
+        os.remove(args.db)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    start = time.perf_counter()
+    print(f"\n⏳ Generazione di {args.rows:,} log su {args.days} giorni per {args.users:,} utenti (seed {args.seed})...")
+    generator = SyntheticSIEM(args.rows, args.days, args.users, args.seed, args.incident_share)
+    written = build_database(args.db, generator, args.password)
+
+    size_mb = os.path.getsize(args.db) / 1024 / 1024
+    print(f"\n✅ {written:,} log e {len(generator.users):,} utenti in {args.db} "
+          f"({size_mb:,.0f} MB, {time.perf_counter() - start:.1f}s)")
+    print(f"   {generator.incident_rows - generator.registrations:,} log da incidenti: " + ', '.join(
+        f"{count} {kind}" for kind, count in generator.incident_counts.items()))
+    print(f"   Utenti: 'admin' e gli altri con password {args.password!r}")
+    print("   I log oltre LOG_HOT_PERIODS passano nelle partizioni al prossimo avvio dell'app")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
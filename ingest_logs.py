@@ -0,0 +1,136 @@
+"""
+Ingestion di eventi di sicurezza esterni da file NDJSON
+
+Una riga per evento: {"ip", "type", "timestamp", "is_error", "username"}
+(vedi model.ingest). Le righe vengono inviate a blocchi di --batch-size al
+server in esecuzione tramite /api/logs/ingest, così passano anche dal suo
+detector: brute force e input malevoli compaiono subito negli alert.
+
+Con --direct i blocchi vengono scritti direttamente nel database, ad esempio
+per caricare uno storico a server fermo. Gli alert in memoria di un server
+già avviato non vedono questi eventi fino al suo riavvio.
+
+Uso:
+    python ingest_logs.py eventi.ndjson [altri file...] --token $INGEST_TOKEN
+    tail -F proxy-events.ndjson | INGEST_TOKEN=... python ingest_logs.py - --url https://siem.example.com
+    python ingest_logs.py storico.ndjson --direct
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from itertools import islice
+
+from flask import Flask
+
+from model import db
+from model.ingest import IngestError, log_ingestor
+from model.partitions import log_partitions
+from model.storage import init_storage
+
+DEFAULT_URL = 'http://127.0.0.1:5000'
+
+
+def direct_app():
+    """
+    App minima per --direct: database, profilo SQLite e limiti dell'ingestion
+    letti dalle stesse variabili d'ambiente di app.py, senza i thread in
+    background (log writer, manutenzione) che l'import di app.py avvierebbe
+    """
+    app = Flask('app', root_path=os.path.dirname(os.path.abspath(__file__)))
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///users.db')
+    app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'wal')
+    app.config['INGEST_MAX_BATCH'] = int(os.getenv('INGEST_MAX_BATCH', '10000'))
+    app.config['INGEST_MAX_SKEW_SECONDS'] = int(os.getenv('INGEST_MAX_SKEW_SECONDS', '300'))
+    app.config['LOG_PARTITION_PERIOD'] = os.getenv('LOG_PARTITION_PERIOD', 'month')
+    app.config['LOG_HOT_PERIODS'] = int(os.getenv('LOG_HOT_PERIODS', '2'))
+    db.init_app(app)
+    init_storage(app)
+    log_partitions.init_app(app)
+    log_ingestor.init_app(app)
+    return app
+
+
+def read_lines(paths):
+    for path in paths:
+        if path == '-':
+            yield from sys.stdin.buffer
+            continue
+        with open(path, 'rb') as f:
+            yield from f
+
+
+def post_batch(url, token, lines):
+    request = urllib.request.Request(
+        url.rstrip('/') + '/api/logs/ingest',
+        data=b''.join(line if line.endswith(b'\n') else line + b'\n' for line in lines),
+        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/x-ndjson'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code == 400:
+            # Blocco interamente scartato: il corpo ha comunque il dettaglio delle righe
+            return json.load(e)
+        raise IngestError(f'{e.code} {e.read().decode("utf-8", "replace")}') from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='file NDJSON, - per stdin')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='eventi per blocco (default e massimo INGEST_MAX_BATCH)')
+    parser.add_argument('--url', default=os.getenv('INGEST_URL', DEFAULT_URL),
+                        help=f'server a cui inviare i blocchi (default INGEST_URL o {DEFAULT_URL})')
+    parser.add_argument('--token', default=os.getenv('INGEST_TOKEN'),
+                        help='token Bearer, uno di INGEST_TOKENS del server (default INGEST_TOKEN)')
+    parser.add_argument('--direct', action='store_true',
+                        help='scrive direttamente nel database invece di passare dal server')
+    args = parser.parse_args()
+    if not args.direct and not args.token:
+        parser.error('serve --token (o INGEST_TOKEN), oppure --direct')
+
+    app = direct_app() if args.direct else None
+    if args.direct:
+        print("⚠️  Scrittura diretta: gli alert in memoria del server in esecuzione non vedranno "
+              "questi eventi fino al suo riavvio", file=sys.stderr)
+    max_batch = int(os.getenv('INGEST_MAX_BATCH', '10000'))
+    batch_size = min(args.batch_size or max_batch, max_batch)
+    totals = {'accepted': 0, 'rejected': 0, 'unknown_users': 0}
+    lines = read_lines(args.inputs)
+    start = time.perf_counter()
+    offset = 0
+
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            break
+        try:
+            if args.direct:
+                with app.app_context():
+                    result = log_ingestor.ingest(batch)
+            else:
+                result = post_batch(args.url, args.token, batch)
+        except (IngestError, urllib.error.URLError) as e:
+            print(f"❌ Blocco alle righe {offset + 1}-{offset + len(batch)} rifiutato: {e}", file=sys.stderr)
+            return 1
+        for name in totals:
+            totals[name] += result[name]
+        for error in result['errors']:
+            print(f"⚠️  Riga {offset + error['line']}: {error['error']}", file=sys.stderr)
+        offset += len(batch)
+
+    elapsed = time.perf_counter() - start
+    rate = totals['accepted'] / elapsed if elapsed else 0
+    print(f"✅ {totals['accepted']:,} eventi scritti, {totals['rejected']:,} scartati, "
+          f"{totals['unknown_users']:,} con username sconosciuto ({elapsed:.1f}s, {rate:,.0f} eventi/s)")
+    return 0 if not totals['rejected'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Alert - Formato comune degli alert di sicurezza (analyzer e detector in memoria)
+"""
+
+# Tipi di attacchi registrati come MALICIOUS_INPUT_<tipo>
+ATTACK_TYPES = ['SQL_INJECTION', 'XSS', 'COMMAND_INJECTION', 'PATH_TRAVERSAL']
+MALICIOUS_PREFIX = 'MALICIOUS_INPUT_'
+
+
+def brute_force_alert(ip, attempts, last_attempt, minutes):
+    return {
+        'type': 'BRUTE_FORCE',
+        'severity': 'CRITICAL',
+        'ip': ip,
+        'attempts': attempts,
+        'last_attempt': last_attempt,
+        'time_window': f'{minutes} minuti',
+        'message': f'🚨 {attempts} tentativi di login falliti da {ip}'
+    }
+
+
+def suspicious_ip_alert(ip, error_count, hours):
+    return {
+        'type': 'SUSPICIOUS_IP',
+        'severity': 'WARNING',
+        'ip': ip,
+        'error_count': error_count,
+        'time_window': f'{hours} ore',
+        'message': f'⚠️ {error_count} errori da {ip} nelle ultime {hours} ore'
+    }
+
+
+def malicious_input_alert(ip, attack_type, attempts, hours):
+    return {
+        'type': 'MALICIOUS_INPUT',
+        'severity': 'CRITICAL',
+        'ip': ip,
+        'attack_type': attack_type,
+        'attempts': attempts,
+        'time_window': f'{hours} ore',
+        'message': f'🛑 Input malevolo {attack_type} da {ip}'
+    }
+
+
+def malicious_summary(ip_counts_by_type, recent_by_type):
+    """
+    Costruisce il dizionario restituito da detect_malicious_inputs
+
+    Args:
+        ip_counts_by_type: {attack_type: {ip: tentativi}}
+        recent_by_type: {attack_type: [log più recenti]}
+    """
+    results = {}
+    for attack_type in ATTACK_TYPES:
+        ip_counts = ip_counts_by_type.get(attack_type, {})
+        results[attack_type.lower()] = {
+            'count': sum(ip_counts.values()),
+            'ips': [
+                {'ip': ip, 'attempts': count}
+                for ip, count in sorted(ip_counts.items(), key=lambda x: x[1], reverse=True)
+            ][:5],  # Top 5 IP
+            'recent': recent_by_type.get(attack_type, [])  # Ultimi 10 attacchi
+        }
+    return results
+
+
+def combine_alerts(rows, load_recent, brute_minutes, brute_threshold, error_hours, error_threshold):
+    """
+    Trasforma i conteggi per IP nel dizionario di get_all_alerts
+
+    Args:
+        rows: tuple (ip, tentativi falliti, ultimo tentativo, errori, *conteggi per ATTACK_TYPES)
+        load_recent: funzione che restituisce {attack_type: [log più recenti]},
+            chiamata solo se c'è almeno un input malevolo
+    """
+    brute_force = []
+    suspicious_ips = []
+    ip_counts_by_type = {}
+    for ip, brute_attempts, brute_last, errors, *attack_counts in rows:
+        if brute_attempts >= brute_threshold:
+            brute_force.append(brute_force_alert(ip, brute_attempts, brute_last, brute_minutes))
+        if errors >= error_threshold:
+            suspicious_ips.append(suspicious_ip_alert(ip, errors, error_hours))
+        for attack_type, count in zip(ATTACK_TYPES, attack_counts):
+            if count:
+                ip_counts_by_type.setdefault(attack_type, {})[ip] = count
+
+    recent_by_type = load_recent() if ip_counts_by_type else {}
+    malicious_inputs = malicious_summary(ip_counts_by_type, recent_by_type)
+    return {
+        'brute_force': brute_force,
+        'suspicious_ips': suspicious_ips,
+        'malicious_inputs': malicious_inputs,
+        'total_alerts': len(brute_force) + len(suspicious_ips) + len(malicious_inputs)
+    }
@@ -2,152 +2,219 @@
 Security Analyzer - Rilevamento pattern sospetti nei log
 """
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from . import db
+from sqlalchemy import and_, case, func, or_, select
+from .alerts import (ATTACK_TYPES, MALICIOUS_PREFIX, brute_force_alert, combine_alerts,
+                     malicious_summary, suspicious_ip_alert)
+from .detector import detector
 from .log import Log
+from .storage import read_session
 
 
 class SecurityAnalyzer:
-    """Analizza i log per rilevare attività sospette"""
-    
+    """
+    Analizza i log per rilevare attività sospette
+
+    Se il detector in memoria è attivo e le finestre richieste coincidono con
+    le sue, gli alert escono dai contatori in memoria senza toccare il database.
+    """
+
+    # Tipi di attacchi registrati come MALICIOUS_INPUT_<tipo>
+    ATTACK_TYPES = ATTACK_TYPES
+
+    @staticmethod
+    def _recent_malicious(time_threshold, limit=10):
+        """
+        Ultimi 'limit' log per tipo di attacco, con una sola query (ROW_NUMBER)
+
+        Returns:
+            dict: {attack_type: [Log, ...]} dal più recente
+        """
+        log_types = [MALICIOUS_PREFIX + attack_type for attack_type in ATTACK_TYPES]
+        session = read_session()
+
+        ranked = session.query(
+            Log.id,
+            func.row_number().over(
+                partition_by=Log.type,
+                order_by=(Log.timestamp.desc(), Log.id.desc())
+            ).label('position')
+        ).filter(
+            Log.type.in_(log_types),
+            Log.timestamp >= time_threshold
+        ).subquery()
+
+        logs = session.query(Log).join(
+            ranked, Log.id == ranked.c.id
+        ).filter(
+            ranked.c.position <= limit
+        ).order_by(Log.timestamp.desc(), Log.id.desc()).all()
+
+        recent = {}
+        for log in logs:
+            recent.setdefault(log.type[len(MALICIOUS_PREFIX):], []).append(log)
+        return recent
+
     @staticmethod
     def detect_brute_force(minutes=5, threshold=5):
         """
         Rileva tentativi di brute force
-        
+
         Args:
             minutes: Finestra temporale in minuti (default: 5)
             threshold: Numero minimo di tentativi falliti (default: 5)
-        
+
         Returns:
             Lista di alert con IP sospetti
         """
-        time_threshold = datetime.now() - timedelta(minutes=minutes)
-        
-        # Raggruppa login falliti per IP negli ultimi N minuti
-        results = db.session.query(
-            Log.ip,
-            func.count(Log.id).label('attempts'),
-            func.max(Log.timestamp).label('last_attempt')
-        ).filter(
-            Log.type == 'LOGIN_FAILED',
-            Log.timestamp >= time_threshold
-        ).group_by(Log.ip).all()
-        
-        alerts = []
-        for ip, attempts, last_attempt in results:
-            if attempts >= threshold:
-                alerts.append({
-                    'type': 'BRUTE_FORCE',
-                    'severity': 'CRITICAL',
-                    'ip': ip,
-                    'attempts': attempts,
-                    'last_attempt': last_attempt,
-                    'time_window': f'{minutes} minuti',
-                    'message': f'🚨 {attempts} tentativi di login falliti da {ip}'
-                })
-        
-        return alerts
-    
+        if detector.enabled and detector.brute_minutes == minutes:
+            results = [(ip, attempts, last) for ip, attempts, last, *_ in detector.counts() if attempts]
+        else:
+            time_threshold = datetime.now() - timedelta(minutes=minutes)
+
+            # Raggruppa login falliti per IP negli ultimi N minuti
+            results = read_session().query(
+                Log.ip,
+                func.count(Log.id).label('attempts'),
+                func.max(Log.timestamp).label('last_attempt')
+            ).filter(
+                Log.type == 'LOGIN_FAILED',
+                Log.timestamp >= time_threshold
+            ).group_by(Log.ip).all()
+
+        return [
+            brute_force_alert(ip, attempts, last_attempt, minutes)
+            for ip, attempts, last_attempt in results
+            if attempts >= threshold
+        ]
+
     @staticmethod
     def detect_suspicious_ips(hours=24, threshold=10):
         """
         Rileva IP con attività sospetta (troppi errori)
-        
+
         Args:
             hours: Finestra temporale in ore (default: 24)
             threshold: Numero minimo di errori (default: 10)
-        
+
         Returns:
             Lista di IP sospetti
         """
-        time_threshold = datetime.now() - timedelta(hours=hours)
-        
-        results = db.session.query(
+        if detector.enabled and detector.error_hours == hours:
+            results = [(ip, errors) for ip, _, _, errors, *_ in detector.counts() if errors]
+        else:
+            time_threshold = datetime.now() - timedelta(hours=hours)
+
+            results = read_session().query(
+                Log.ip,
+                func.count(Log.id).label('error_count')
+            ).filter(
+                Log.is_error == True,
+                Log.timestamp >= time_threshold
+            ).group_by(Log.ip).all()
+
+        return [
+            suspicious_ip_alert(ip, error_count, hours)
+            for ip, error_count in results
+            if error_count >= threshold
+        ]
+
+    @staticmethod
+    def alert_counts_statement(brute_since, error_since, malicious_since):
+        """
+        Query aggregata per IP usata da get_all_alerts
+
+        Colonne: ip, tentativi falliti e ultimo tentativo (finestra brute force),
+        errori (finestra IP sospetti), un conteggio per ogni tipo in ATTACK_TYPES.
+        """
+        window_start = min(brute_since, error_since, malicious_since)
+        malicious_types = [MALICIOUS_PREFIX + attack_type for attack_type in ATTACK_TYPES]
+        login_failed = and_(Log.type == 'LOGIN_FAILED', Log.timestamp >= brute_since)
+
+        columns = [
             Log.ip,
-            func.count(Log.id).label('error_count')
-        ).filter(
-            Log.is_error == True,
-            Log.timestamp >= time_threshold
-        ).group_by(Log.ip).all()
-        
-        suspicious = []
-        for ip, error_count in results:
-            if error_count >= threshold:
-                suspicious.append({
-                    'type': 'SUSPICIOUS_IP',
-                    'severity': 'WARNING',
-                    'ip': ip,
-                    'error_count': error_count,
-                    'time_window': f'{hours} ore',
-                    'message': f'⚠️ {error_count} errori da {ip} nelle ultime {hours} ore'
-                })
-        
-        return suspicious
-    
+            func.sum(case((login_failed, 1), else_=0)).label('brute_attempts'),
+            func.max(case((login_failed, Log.timestamp))).label('brute_last'),
+            func.sum(case((and_(Log.is_error == True, Log.timestamp >= error_since), 1), else_=0)).label('errors'),
+        ]
+        for log_type in malicious_types:
+            columns.append(func.sum(case(
+                (and_(Log.type == log_type, Log.timestamp >= malicious_since), 1), else_=0
+            )))
+
+        # Finestra ripetuta in ogni ramo dell'OR: SQLite può così servire
+        # ciascun ramo col proprio indice (MULTI-INDEX OR)
+        return select(*columns).where(or_(
+            and_(Log.is_error == True, Log.timestamp >= window_start),
+            and_(Log.type.in_(['LOGIN_FAILED'] + malicious_types), Log.timestamp >= window_start)
+        )).group_by(Log.ip)
+
     @staticmethod
-    def get_all_alerts():
+    def get_all_alerts(brute_minutes=5, brute_threshold=5, error_hours=24, error_threshold=10,
+                       malicious_hours=24):
         """
         Ottiene tutti gli alert combinati
-        
+
+        Dal detector in memoria se attivo, altrimenti da un'unica GROUP BY per
+        IP con aggregazioni condizionali sulla finestra più ampia, più una query
+        per gli ultimi attacchi: 2 query invece di 14 e nessun log caricato per contare.
+
         Returns:
             Dizionario con tutti i tipi di alert
         """
-        return {
-            'brute_force': SecurityAnalyzer.detect_brute_force(),
-            'suspicious_ips': SecurityAnalyzer.detect_suspicious_ips(),
-            'malicious_inputs': SecurityAnalyzer.detect_malicious_inputs(),
-            'total_alerts': len(SecurityAnalyzer.detect_brute_force()) + 
-                          len(SecurityAnalyzer.detect_suspicious_ips()) +
-                          len(SecurityAnalyzer.detect_malicious_inputs())
-        }
-    
+        if detector.enabled and detector.matches(brute_minutes, error_hours, malicious_hours):
+            return combine_alerts(
+                detector.counts(), detector.recent_malicious,
+                brute_minutes, brute_threshold, error_hours, error_threshold
+            )
+
+        now = datetime.now()
+        brute_since = now - timedelta(minutes=brute_minutes)
+        error_since = now - timedelta(hours=error_hours)
+        malicious_since = now - timedelta(hours=malicious_hours)
+        statement = SecurityAnalyzer.alert_counts_statement(brute_since, error_since, malicious_since)
+        rows = read_session().execute(statement).all()
+
+        return combine_alerts(
+            rows, lambda: SecurityAnalyzer._recent_malicious(malicious_since),
+            brute_minutes, brute_threshold, error_hours, error_threshold
+        )
+
     @staticmethod
     def detect_malicious_inputs(hours=24):
         """
         Rileva tentativi di input malevoli (SQL Injection, XSS, ecc.)
-        
+
         Args:
             hours: Finestra temporale in ore (default: 24)
-        
+
         Returns:
             Dizionario con statistiche per tipo di attacco
         """
+        ip_counts_by_type = {}
+
+        if detector.enabled and detector.malicious_hours == hours:
+            for ip, _, _, _, *attack_counts in detector.counts():
+                for attack_type, count in zip(ATTACK_TYPES, attack_counts):
+                    if count:
+                        ip_counts_by_type.setdefault(attack_type, {})[ip] = count
+            recent_by_type = detector.recent_malicious() if ip_counts_by_type else {}
+            return malicious_summary(ip_counts_by_type, recent_by_type)
+
         time_threshold = datetime.now() - timedelta(hours=hours)
-        
-        # Tipi di attacchi da cercare
-        attack_types = ['SQL_INJECTION', 'XSS', 'COMMAND_INJECTION', 'PATH_TRAVERSAL']
-        
-        results = {
-            'sql_injection': {'count': 0, 'ips': [], 'recent': []},
-            'xss': {'count': 0, 'ips': [], 'recent': []},
-            'command_injection': {'count': 0, 'ips': [], 'recent': []},
-            'path_traversal': {'count': 0, 'ips': [], 'recent': []}
-        }
-        
-        for attack_type in attack_types:
-            log_type = f'MALICIOUS_INPUT_{attack_type}'
-            
-            # Conta attacchi per tipo
-            logs = Log.query.filter(
-                Log.type == log_type,
-                Log.timestamp >= time_threshold
-            ).all()
-            
-            # Raggruppa per IP
-            ip_counts = {}
-            for log in logs:
-                if log.ip not in ip_counts:
-                    ip_counts[log.ip] = 0
-                ip_counts[log.ip] += 1
-            
-            # Organizza risultati
-            key = attack_type.lower()
-            results[key]['count'] = len(logs)
-            results[key]['ips'] = [
-                {'ip': ip, 'attempts': count} 
-                for ip, count in sorted(ip_counts.items(), key=lambda x: x[1], reverse=True)
-            ][:5]  # Top 5 IP
-            results[key]['recent'] = logs[:10]  # Ultimi 10 attacchi
-        
-        return results
+        log_types = [MALICIOUS_PREFIX + attack_type for attack_type in ATTACK_TYPES]
+
+        # Conta attacchi per tipo e IP direttamente nel database
+        results = read_session().query(
+            Log.type,
+            Log.ip,
+            func.count(Log.id)
+        ).filter(
+            Log.type.in_(log_types),
+            Log.timestamp >= time_threshold
+        ).group_by(Log.type, Log.ip).all()
+
+        for log_type, ip, count in results:
+            ip_counts_by_type.setdefault(log_type[len(MALICIOUS_PREFIX):], {})[ip] = count
+
+        recent_by_type = SecurityAnalyzer._recent_malicious(time_threshold) if ip_counts_by_type else {}
+        return malicious_summary(ip_counts_by_type, recent_by_type)
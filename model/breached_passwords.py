@@ -0,0 +1,153 @@
+"""
+Breached Passwords - Ricerca di password compromesse in un indice locale mappato in memoria
+
+Il file (creato offline da build_password_index.py) contiene i primi 8 byte
+dello SHA-1 di ogni password, ordinati, preceduti da una tabella di fanout
+sui primi 2 byte come negli indici dei pack di git:
+
+    magic 'PWHASH01' | count (uint64) | fanout 65537 x uint64 | count x 8 byte
+
+La tabella dice subito in quale intervallo cercare (poche centinaia di voci
+anche con decine di milioni di password), poi basta una ricerca binaria.
+Il file è aperto con mmap: in memoria restano solo le pagine lette, e le
+ricerche costano pochi microsecondi. Con 8 byte per voce la probabilità di
+un falso positivo è circa count / 2^64, trascurabile.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b'PWHASH01'
+ENTRY_SIZE = 8
+FANOUT_BITS = 16
+FANOUT_ENTRIES = (1 << FANOUT_BITS) + 1
+HEADER = struct.Struct('<8sQ')
+FANOUT_RANGE = struct.Struct('<QQ')
+FANOUT_OFFSET = HEADER.size
+ENTRIES_OFFSET = FANOUT_OFFSET + FANOUT_ENTRIES * 8
+
+
+def password_key(password):
+    """Primi 8 byte dello SHA-1 (UTF-8) della password, lo stesso hash degli elenchi HIBP"""
+    return hashlib.sha1(password.encode('utf-8')).digest()[:ENTRY_SIZE]
+
+
+class BreachedPasswordIndex:
+    """
+    Indice verificato all'avvio (init_app) o alla prima verifica se il file
+    arriva dopo; senza file configurato, o con un file troncato o corrotto,
+    ogni password risulta pulita e il problema viene segnalato una volta sola
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.error = None
+        self._mm = None
+        self._count = 0
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.hits = 0
+
+    def init_app(self, app):
+        """
+        Config:
+            PASSWORD_BREACH_INDEX (str): percorso del file creato da build_password_index.py
+        """
+        with self._lock:
+            self.close()
+            self.path = app.config.get('PASSWORD_BREACH_INDEX') or None
+            self.error = None
+        self._open()
+
+    @property
+    def available(self):
+        return bool(self.path) and self.error is None and os.path.exists(self.path)
+
+    def _open(self):
+        with self._lock:
+            if self._mm is not None:
+                return True
+            if not self.available:
+                return False
+            try:
+                self._mm, self._count = self._load(self.path)
+            except (OSError, ValueError, struct.error) as e:
+                # Niente errore a ogni /register: il controllo resta spento fino al riavvio
+                self.error = str(e)
+                print(f"⚠️  Indice password compromesse non utilizzabile, controllo disattivato: {e}")
+                return False
+            return True
+
+    @staticmethod
+    def _load(path):
+        """
+        Returns:
+            tuple: (mmap del file, numero di voci)
+
+        Raises:
+            ValueError: file vuoto, troncato o con header e fanout incoerenti
+        """
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(mm) < ENTRIES_OFFSET:
+                raise ValueError(f'Indice password troncato: {path}')
+            magic, count = HEADER.unpack_from(mm, 0)
+            _, total = FANOUT_RANGE.unpack_from(mm, FANOUT_OFFSET + (FANOUT_ENTRIES - 2) * 8)
+            if magic != MAGIC or len(mm) != ENTRIES_OFFSET + count * ENTRY_SIZE or total != count:
+                raise ValueError(f'Indice password non valido: {path}')
+        except BaseException:
+            mm.close()
+            raise
+        return mm, count
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count if self._open() else 0
+
+    def contains(self, password):
+        """
+        Returns:
+            bool: True se la password compare nell'indice
+        """
+        if not password or (self._mm is None and not self._open()):
+            return False
+        self.checks += 1
+
+        key = password_key(password)
+        bucket = int.from_bytes(key[:2], 'big')
+        mm = self._mm
+        low, high = FANOUT_RANGE.unpack_from(mm, FANOUT_OFFSET + bucket * 8)
+        while low < high:
+            middle = (low + high) // 2
+            offset = ENTRIES_OFFSET + middle * ENTRY_SIZE
+            entry = mm[offset:offset + ENTRY_SIZE]
+            if entry < key:
+                low = middle + 1
+            elif entry > key:
+                high = middle
+            else:
+                self.hits += 1
+                return True
+        return False
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'loaded': self._mm is not None,
+            'error': self.error,
+            'entries': self._count,
+            'checks': self.checks,
+            'hits': self.hits
+        }
+
+
+# Istanza usata da PasswordValidator.validate_strength
+breached_passwords = BreachedPasswordIndex()
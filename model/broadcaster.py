@@ -0,0 +1,106 @@
+"""
+Broadcaster - Distribuzione in-process di eventi (nuovi log, alert) ai client SSE
+"""
+import itertools
+import threading
+from collections import deque
+
+
+class Subscription:
+    """
+    Coda di un singolo client.
+
+    Buffer limitato a max_buffer eventi: un client lento perde gli eventi più
+    vecchi (contati in 'dropped') invece di far crescere la memoria o
+    rallentare chi pubblica.
+    """
+
+    def __init__(self, broadcaster, max_buffer):
+        self._broadcaster = broadcaster
+        self._events = deque(maxlen=max_buffer)
+        self._ready = threading.Event()
+        self.dropped = 0
+
+    def _push(self, event):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+        if not self._ready.is_set():
+            # set() prende un lock: lo si evita finché il client non ha letto
+            self._ready.set()
+
+    def get(self, timeout=None):
+        """
+        Attende al massimo 'timeout' secondi e restituisce gli eventi arrivati
+
+        Returns:
+            list: eventi (id, tipo, dati) in ordine, vuota se scade il timeout
+        """
+        if not self._ready.wait(timeout):
+            return []
+        self._ready.clear()
+        events = []
+        while True:
+            try:
+                events.append(self._events.popleft())
+            except IndexError:
+                return events
+
+    def close(self):
+        self._broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """
+    Fan-out dei nuovi eventi a tutti i client collegati.
+
+    publish costa O(client) e non tocca il database: i client ricevono gli
+    eventi già pronti invece di interrogare ognuno la tabella logs.
+    """
+
+    def __init__(self, max_buffer=500):
+        self.max_buffer = max_buffer
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+
+    def configure(self, max_buffer):
+        self.max_buffer = max_buffer
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        subscription = Subscription(self, self.max_buffer)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type, data):
+        """Consegna (tipo, dati) a tutti i client collegati"""
+        with self._lock:
+            if not self._subscribers:
+                return
+            event = (next(self._ids), event_type, data)
+            self.published += 1
+            for subscription in self._subscribers:
+                subscription._push(event)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'published': self.published,
+            'dropped': sum(subscription.dropped for subscription in subscribers)
+        }
+
+
+# Istanza condivisa: alimentata da create_log / LogWriter e dal detector
+broadcaster = Broadcaster()
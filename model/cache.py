@@ -0,0 +1,113 @@
+"""
+Cache in memoria condivise dai moduli del model
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache con numero massimo di elementi ed eviction LRU.
+
+    Thread-safe: tutte le operazioni passano da un unico lock, quindi può essere
+    condivisa tra i thread dei worker WSGI.
+    """
+
+    def __init__(self, max_entries=10000):
+        if max_entries <= 0:
+            raise ValueError('max_entries deve essere positivo')
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Restituisce il valore e lo marca come usato di recente"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Inserisce o aggiorna un valore, eliminando il meno recente se piena"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = value
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Rimuove una chiave se presente"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Svuota la cache (i contatori restano)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: dimensione attuale e contatori hit/miss/eviction
+        """
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class TTLCache(LRUCache):
+    """
+    LRUCache in cui ogni elemento scade 'ttl' secondi dopo l'inserimento.
+
+    Utile per dati che possono cambiare in un altro processo: la TTL limita per
+    quanto tempo un valore non invalidato localmente può restare vecchio.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        if ttl <= 0:
+            raise ValueError('ttl deve essere positivo')
+        super().__init__(max_entries)
+        self.ttl = ttl
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Restituisce il valore se presente e non scaduto"""
+        with self._lock:
+            try:
+                value, expires_at = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Inserisce o aggiorna un valore facendo ripartire la sua TTL"""
+        super().set(key, (value, time.monotonic() + self.ttl))
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(ttl=self.ttl, expirations=self.expirations)
+        return stats
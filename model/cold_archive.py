@@ -0,0 +1,682 @@
+"""
+Cold Archive - Log freddi in file colonnari compressi, interrogabili con predicate pushdown
+
+Le partizioni d'archivio più vecchie di LOG_COLD_AFTER_DAYS (vedi
+model.partitions) vengono riscritte in un file per partizione e la tabella
+viene eliminata. I conteggi di rollup restano: cambia solo dove stanno le righe.
+
+Formato del file (righe in ordine di (timestamp, id), a blocchi di BLOCK_ROWS):
+
+    MAGIC | colonne compresse dei blocchi | footer JSON | lunghezza footer (uint32) | MAGIC
+
+Per ogni blocco ogni colonna è compressa a parte con zlib:
+- id, timestamp: delta dal valore precedente (int64, microsecondi per il tempo)
+- type: codici (uint16) nel dizionario dei tipi del file
+- ip: dizionario del blocco con gli indirizzi impacchettati (4 o 16 byte) e
+  le loro posizioni, più un codice per riga
+- is_error: un byte per riga; user_id: int64, -1 per gli eventi anonimi
+
+Il footer contiene per blocco min/max di timestamp, i codici di tipo presenti,
+il numero di errori e la posizione di ogni colonna. La lettura salta i blocchi
+che i filtri escludono già dal footer, poi decomprime prima le colonne dei
+filtri e le altre solo se nel blocco resta qualche riga.
+
+Archiviazione ed eliminazione girano dentro ColdArchiver.transaction: il file
+nuovo viene scritto con un nome temporaneo e pubblicato, o quello vecchio
+rimosso, solo dopo il commit di DROP TABLE o dei conteggi di rollup. Una
+transazione annullata non lascia quindi una partizione anche su file, né un
+archivio senza file; un crash tra commit e rinomina viene recuperato al
+passaggio successivo (recover_staged).
+"""
+import heapq
+import ipaddress
+import json
+import os
+import socket
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from sqlalchemy import select
+
+from .partitions import list_partitions, log_partitions, parse_partition
+from .rollup import delete_rollup_range
+from .search import _like_regex
+from .user import User
+
+MAGIC = b'SIEMCOL1'
+EXTENSION = '.col'
+STAGED = '.tmp'
+BLOCK_ROWS = 65536
+COMPRESSION_LEVEL = 6
+_FOOTER_LENGTH = struct.Struct('<I')
+_EPOCH = datetime(1970, 1, 1)
+_IP_TEXT, _IP_V4, _IP_V6 = 0, 4, 6
+# Operazioni sui file in attesa del commit, in connection.info
+_PENDING = 'cold_archive_pending'
+
+# Stesse colonne delle righe di log_rows_query
+LogRow = namedtuple('LogRow', 'id ip type timestamp is_error user_id username')
+
+
+def _to_micros(moment):
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(micros):
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def _deltas(values):
+    previous = 0
+    result = array('q')
+    for value in values:
+        result.append(value - previous)
+        previous = value
+    return result
+
+
+def _pack_ip(ip):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        address = None
+    if address is not None:
+        packed = bytes((_IP_V4 if address.version == 4 else _IP_V6,)) + address.packed
+        # Solo se la rilettura restituisce esattamente il testo originale
+        if _unpack_ip(packed) == ip:
+            return packed
+    return bytes((_IP_TEXT,)) + ip.encode('utf-8')
+
+
+def _unpack_ip(entry):
+    kind = entry[0]
+    if kind == _IP_V4:
+        return socket.inet_ntop(socket.AF_INET, entry[1:])
+    if kind == _IP_V6:
+        return socket.inet_ntop(socket.AF_INET6, entry[1:])
+    return entry[1:].decode('utf-8')
+
+
+class _IpDictionary:
+    """Dizionario degli IP di un blocco, decodificato solo per i codici richiesti"""
+
+    def __init__(self, offsets, data):
+        self._offsets = array('I', offsets)
+        self._data = data
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code):
+        ip = self._decoded.get(code)
+        if ip is None:
+            ip = self._decoded[code] = _unpack_ip(self._data[self._offsets[code]:self._offsets[code + 1]])
+        return ip
+
+    def matching(self, regex):
+        """Codici degli IP che soddisfano 'regex'"""
+        return {code for code in range(len(self)) if regex.fullmatch(self[code])}
+
+
+# -------------------------------
+# Scrittura
+# -------------------------------
+
+def write_archive(path, rows):
+    """
+    Scrive un file d'archivio
+
+    Args:
+        path (str): file di destinazione, da pubblicare a parte (vedi archive_partition)
+        rows: tuple (id, ip, type, timestamp, is_error, user_id) in ordine di (timestamp, id)
+
+    Returns:
+        int: righe scritte
+    """
+    types = {}
+    blocks = []
+    total = 0
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) == BLOCK_ROWS:
+                blocks.append(_write_block(f, block, types))
+                total += len(block)
+                block = []
+        if block:
+            blocks.append(_write_block(f, block, types))
+            total += len(block)
+
+        footer = json.dumps({
+            'version': 1,
+            'rows': total,
+            'min_ts': blocks[0]['min_ts'] if blocks else None,
+            'max_ts': blocks[-1]['max_ts'] if blocks else None,
+            'types': sorted(types, key=types.get),
+            'blocks': blocks
+        }, separators=(',', ':')).encode('utf-8')
+        f.write(footer)
+        f.write(_FOOTER_LENGTH.pack(len(footer)))
+        f.write(MAGIC)
+    return total
+
+
+def _write_block(f, rows, types):
+    ids, ips, log_types, timestamps, errors, user_ids = zip(*rows)
+    micros = [_to_micros(moment) for moment in timestamps]
+    type_codes = array('H', (types.setdefault(log_type, len(types)) for log_type in log_types))
+
+    ip_codes_by_value = {}
+    ip_codes = array('I', (ip_codes_by_value.setdefault(ip, len(ip_codes_by_value)) for ip in ips))
+    ip_entries = [_pack_ip(ip) for ip in ip_codes_by_value]
+    ip_offsets = array('I', accumulate((len(entry) for entry in ip_entries), initial=0))
+
+    columns = {
+        'id': _deltas(ids).tobytes(),
+        'timestamp': _deltas(micros).tobytes(),
+        'type': type_codes.tobytes(),
+        'ip_offsets': ip_offsets.tobytes(),
+        'ip_dict': b''.join(ip_entries),
+        'ip': ip_codes.tobytes(),
+        'is_error': bytes(1 if error else 0 for error in errors),
+        'user_id': array('q', (-1 if user_id is None else user_id for user_id in user_ids)).tobytes(),
+    }
+    positions = {}
+    for name, data in columns.items():
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        positions[name] = [f.tell(), len(compressed)]
+        f.write(compressed)
+
+    return {
+        'rows': len(rows),
+        'min_ts': min(micros),
+        'max_ts': max(micros),
+        'types': sorted(set(type_codes)),
+        'errors': sum(1 for error in errors if error),
+        'columns': positions
+    }
+
+
+# -------------------------------
+# Lettura
+# -------------------------------
+
+class ColdFilter(namedtuple('ColdFilter', 'type_like ip_like user_ids is_error since until')):
+    """Filtri di /logs: type_like/ip_like con la semantica di LIKE, user_ids già risolti"""
+
+    def __new__(cls, type_like=None, ip_like=None, user_ids=None, is_error=None, since=None, until=None):
+        return super().__new__(cls, type_like, ip_like, user_ids, is_error, since, until)
+
+
+class ColdArchive:
+    """Un file d'archivio: footer letto una volta, colonne lette su richiesta"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)[:-len(EXTENSION)]
+        self.partition = parse_partition(self.name)
+        self._footer = None
+        self.blocks_read = 0
+        self.blocks_skipped = 0
+
+    @property
+    def start(self):
+        return self.partition.start
+
+    @property
+    def end(self):
+        return self.partition.end
+
+    @property
+    def footer(self):
+        if self._footer is None:
+            with open(self.path, 'rb') as f:
+                f.seek(-len(MAGIC) - _FOOTER_LENGTH.size, os.SEEK_END)
+                (length,) = _FOOTER_LENGTH.unpack(f.read(_FOOTER_LENGTH.size))
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f'Archivio non valido: {self.path}')
+                f.seek(-len(MAGIC) - _FOOTER_LENGTH.size - length, os.SEEK_END)
+                self._footer = json.loads(f.read(length))
+        return self._footer
+
+    def __len__(self):
+        return self.footer['rows']
+
+    def _type_codes(self, type_like):
+        regex = _like_regex(type_like)
+        return {code for code, log_type in enumerate(self.footer['types']) if regex.fullmatch(log_type)}
+
+    def _skip_block(self, block, flt, type_codes, key, newer):
+        if flt.since is not None and block['max_ts'] < _to_micros(flt.since):
+            return True
+        if flt.until is not None and block['min_ts'] >= _to_micros(flt.until):
+            return True
+        if type_codes is not None and not type_codes.intersection(block['types']):
+            return True
+        if flt.is_error is True and not block['errors']:
+            return True
+        if flt.is_error is False and block['errors'] == block['rows']:
+            return True
+        if key is not None:
+            key_micros = _to_micros(key[0])
+            if newer and block['max_ts'] < key_micros:
+                return True
+            if not newer and block['min_ts'] > key_micros:
+                return True
+        return False
+
+    def _read(self, f, block, name):
+        offset, length = block['columns'][name]
+        f.seek(offset)
+        return zlib.decompress(f.read(length))
+
+    def _ip_dictionary(self, f, block):
+        return _IpDictionary(self._read(f, block, 'ip_offsets'), self._read(f, block, 'ip_dict'))
+
+    def _row_range(self, micros, ids, flt, key, newer):
+        """Righe del blocco in [since, until) e oltre il cursore: sono ordinate, basta bisect"""
+        low, high = 0, len(micros)
+        if flt.since is not None:
+            low = bisect_left(micros, _to_micros(flt.since))
+        if flt.until is not None:
+            high = bisect_left(micros, _to_micros(flt.until))
+        if key is not None:
+            key_micros, key_id = _to_micros(key[0]), key[1]
+            position = bisect_left(micros, key_micros)
+            while position < len(micros) and micros[position] == key_micros and ids[position] < key_id:
+                position += 1
+            if newer:
+                if position < len(micros) and micros[position] == key_micros and ids[position] == key_id:
+                    position += 1
+                low = max(low, position)
+            else:
+                high = min(high, position)
+        return range(low, high)
+
+    def scan(self, flt=None, key=None, newer=False, limit=None):
+        """
+        Righe che soddisfano 'flt', in ordine (timestamp, id) discendente o ascendente se 'newer'
+
+        Args:
+            flt (ColdFilter): filtri da applicare
+            key (tuple): cursore (timestamp, id): solo righe più vecchie (o più recenti se 'newer')
+            limit (int): numero massimo di righe
+
+        Yields:
+            LogRow con username None (vedi ColdQuery per lo username)
+        """
+        flt = flt or ColdFilter()
+        type_codes = self._type_codes(flt.type_like) if flt.type_like else None
+        ip_regex = _like_regex(flt.ip_like) if flt.ip_like else None
+        types = self.footer['types']
+        blocks = self.footer['blocks'] if newer else self.footer['blocks'][::-1]
+        produced = 0
+
+        with open(self.path, 'rb') as f:
+            for block in blocks:
+                if self._skip_block(block, flt, type_codes, key, newer):
+                    self.blocks_skipped += 1
+                    continue
+                self.blocks_read += 1
+
+                # Data e cursore sono intervalli di righe; poi le colonne dei
+                # filtri, ognuna solo se restano righe candidate
+                micros = list(accumulate(array('q', self._read(f, block, 'timestamp'))))
+                ids = list(accumulate(array('q', self._read(f, block, 'id'))))
+                selected = self._row_range(micros, ids, flt, key, newer)
+                codes = errors = user_ids = ips = ip_codes = None
+                if selected and type_codes is not None:
+                    codes = array('H', self._read(f, block, 'type'))
+                    selected = [i for i in selected if codes[i] in type_codes]
+                if selected and flt.is_error is not None:
+                    errors = self._read(f, block, 'is_error')
+                    wanted = 1 if flt.is_error else 0
+                    selected = [i for i in selected if errors[i] == wanted]
+                if selected and flt.user_ids is not None:
+                    user_ids = array('q', self._read(f, block, 'user_id'))
+                    selected = [i for i in selected if user_ids[i] in flt.user_ids]
+                if selected and ip_regex is not None:
+                    # Il LIKE gira sul dizionario del blocco, non su ogni riga
+                    ips = self._ip_dictionary(f, block)
+                    matching = ips.matching(ip_regex)
+                    ip_codes = array('I', self._read(f, block, 'ip'))
+                    selected = [i for i in selected if ip_codes[i] in matching]
+                if not selected:
+                    continue
+
+                if codes is None:
+                    codes = array('H', self._read(f, block, 'type'))
+                if errors is None:
+                    errors = self._read(f, block, 'is_error')
+                if user_ids is None:
+                    user_ids = array('q', self._read(f, block, 'user_id'))
+                if ips is None:
+                    ips = self._ip_dictionary(f, block)
+                    ip_codes = array('I', self._read(f, block, 'ip'))
+
+                for i in (selected if newer else reversed(selected)):
+                    yield LogRow(
+                        ids[i], ips[ip_codes[i]], types[codes[i]], _from_micros(micros[i]),
+                        bool(errors[i]), None if user_ids[i] < 0 else user_ids[i], None
+                    )
+                    produced += 1
+                    if limit is not None and produced >= limit:
+                        return
+
+
+def list_archives(directory):
+    """
+    Returns:
+        list: ColdArchive presenti in 'directory', dal più recente
+    """
+    if not directory or not os.path.isdir(directory):
+        return []
+    archives = [
+        ColdArchive(os.path.join(directory, name)) for name in os.listdir(directory)
+        if name.endswith(EXTENSION)
+    ]
+    archives = [archive for archive in archives if archive.partition]
+    return sorted(archives, key=lambda archive: archive.start, reverse=True)
+
+
+def archives_for_range(directory, since=None, until=None):
+    """Archivi che possono contenere log in [since, until), dal più recente"""
+    return [
+        archive for archive in list_archives(directory)
+        if (since is None or archive.end > since) and (until is None or archive.start < until)
+    ]
+
+
+class ColdQuery:
+    """
+    Filtri di /logs applicati a un archivio, con gli username uniti alle righe
+
+    Usabile come sorgente di paginate_logs (page_rows) e per i totali
+    (summarize, charts) quando le tabelle di rollup non bastano.
+    """
+
+    def __init__(self, session, archive, filter_type='', filter_ip='', filter_user='',
+                 is_error=None, since=None, until=None):
+        self.session = session
+        self.archive = archive
+        user_ids = None
+        if filter_user:
+            user_ids = set(session.execute(
+                select(User.id).where(User.username.like(f'%{filter_user}%'))
+            ).scalars())
+        self.filter = ColdFilter(
+            type_like=f'%{filter_type}%' if filter_type else None,
+            ip_like=f'%{filter_ip}%' if filter_ip else None,
+            user_ids=user_ids, is_error=is_error, since=since, until=until
+        )
+
+    def page_rows(self, key, newer, limit):
+        """Fino a 'limit' righe oltre il cursore 'key', come le query SQL di paginate_logs"""
+        return self._with_usernames(list(self.archive.scan(self.filter, key, newer, limit)))
+
+    def rows(self, chunk_size=5000):
+        """Tutte le righe filtrate dalla più recente, con gli username uniti a blocchi (export)"""
+        scan = self.archive.scan(self.filter)
+        while True:
+            chunk = list(islice(scan, chunk_size))
+            if not chunk:
+                return
+            yield from self._with_usernames(chunk)
+
+    def _with_usernames(self, rows):
+        user_ids = {row.user_id for row in rows if row.user_id is not None}
+        if not user_ids:
+            return rows
+        usernames = dict(self.session.execute(
+            select(User.id, User.username).where(User.id.in_(user_ids))
+        ).all())
+        return [row._replace(username=usernames.get(row.user_id)) for row in rows]
+
+    def summarize(self):
+        """Stesso formato di summarize_logs"""
+        by_type = {}
+        errors = 0
+        for row in self.archive.scan(self.filter):
+            by_type[row.type] = by_type.get(row.type, 0) + 1
+            errors += row.is_error
+        return {'total': sum(by_type.values()), 'errors': errors, 'by_type': by_type}
+
+    def charts(self, charts):
+        """Stesso formato di log_charts senza limiti (da combinare con merge_charts)"""
+        types, ips, by_hour = {}, {}, [0] * 24
+        for row in self.archive.scan(self.filter):
+            types[row.type] = types.get(row.type, 0) + 1
+            ips[row.ip] = ips.get(row.ip, 0) + 1
+            by_hour[row.timestamp.hour] += 1
+        result = {}
+        if 'types' in charts:
+            result['types'] = sorted(types.items(), key=lambda item: item[1], reverse=True)
+        if 'top_ips' in charts:
+            result['top_ips'] = sorted(ips.items(), key=lambda item: item[1], reverse=True)
+        if 'by_hour' in charts:
+            result['by_hour'] = by_hour
+        return result
+
+
+# -------------------------------
+# Archiviazione
+# -------------------------------
+
+def _pending(connection):
+    try:
+        return connection.info[_PENDING]
+    except KeyError:
+        raise RuntimeError('operazione sui file d\'archivio fuori da ColdArchiver.transaction()') from None
+
+
+def staged_path(path):
+    """Nome temporaneo di un archivio: uno per processo, più worker possono archiviare la stessa partizione"""
+    return f'{path}.{os.getpid()}{STAGED}'
+
+
+def _complete(path):
+    """Vero se il file inizia e finisce con MAGIC (scrittura arrivata in fondo)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return False
+        f.seek(0, os.SEEK_END)
+        if f.tell() < 2 * len(MAGIC) + _FOOTER_LENGTH.size:
+            return False
+        f.seek(-len(MAGIC), os.SEEK_END)
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def recover_staged(connection, directory):
+    """
+    Completa le archiviazioni interrotte tra il commit e la pubblicazione del file
+
+    Un file temporaneo la cui tabella non esiste più è stato scritto da una
+    transazione confermata: viene pubblicato se completo e più recente
+    dell'archivio (altrimenti l'ha già sostituito un passaggio successivo) ed
+    eliminato se no. Quelli con la tabella ancora presente appartengono a transazioni in
+    corso o annullate e restano dove sono.
+
+    Returns:
+        list: nomi degli archivi pubblicati
+    """
+    if not directory or not os.path.isdir(directory):
+        return []
+    tables = {partition.name for partition in list_partitions(connection)}
+    cutoff = log_partitions.retention_cutoff()
+    published = []
+    for name in os.listdir(directory):
+        if not name.endswith(STAGED) or EXTENSION + '.' not in name:
+            continue
+        partition_name = name.split(EXTENSION + '.')[0]
+        partition = parse_partition(partition_name)
+        if partition is None or partition_name in tables:
+            continue
+        staged = os.path.join(directory, name)
+        path = os.path.join(directory, partition_name + EXTENSION)
+        try:
+            # Scritto solo in parte, o di un periodo già eliminato dalla retention: si scarta
+            current = _complete(staged) and (cutoff is None or partition.end > cutoff)
+            if current and (not os.path.exists(path) or os.path.getmtime(staged) > os.path.getmtime(path)):
+                os.replace(staged, path)
+                published.append(partition_name)
+            else:
+                os.remove(staged)
+        except FileNotFoundError:
+            # Pubblicato nel frattempo dal worker che l'ha scritto
+            pass
+    return published
+
+
+def archive_partition(connection, partition, directory):
+    """
+    Riscrive una partizione nel suo file d'archivio ed elimina la tabella
+
+    Se il file esiste già (log arrivati in ritardo e ruotati di nuovo nella
+    stessa partizione) le righe vengono unite a quelle del file. Il file viene
+    pubblicato dopo il commit (vedi ColdArchiver.transaction).
+
+    Returns:
+        int: righe nel file
+    """
+    path = os.path.join(directory, partition.name + EXTENSION)
+    staged = staged_path(path)
+    table = partition.table
+    rows = connection.execute(
+        select(table.c.id, table.c.ip, table.c.type, table.c.timestamp, table.c.is_error, table.c.user_id)
+        .order_by(table.c.timestamp, table.c.id)
+    )
+    if os.path.exists(path):
+        existing = (row[:6] for row in ColdArchive(path).scan(newer=True))
+        rows = _unique(heapq.merge(existing, rows, key=lambda row: (row[3], row[0])))
+    _pending(connection).append((staged, path))
+    count = write_archive(staged, rows)
+    connection.exec_driver_sql(f'DROP TABLE {partition.name}')
+    return count
+
+
+def _unique(rows):
+    # Un'archiviazione interrotta dopo la scrittura del file lascia le righe
+    # sia nel file sia nella tabella: stesso id, quindi adiacenti nell'ordine
+    previous = None
+    for row in rows:
+        if row[0] != previous:
+            yield row
+        previous = row[0]
+
+
+class ColdArchiver:
+    """Passaggio delle partizioni vecchie su file e retention dei file"""
+
+    def __init__(self):
+        self.after_days = 0
+        self.directory = None
+
+    def init_app(self, app):
+        """
+        Config:
+            LOG_COLD_AFTER_DAYS (int): età oltre cui una partizione va su file, 0 = mai
+            LOG_ARCHIVE_DIR (str): cartella dei file d'archivio
+        """
+        self.after_days = app.config.get('LOG_COLD_AFTER_DAYS', self.after_days)
+        self.directory = app.config.get('LOG_ARCHIVE_DIR') or None
+
+    def archives(self, since=None, until=None):
+        """Archivi che possono contenere log in [since, until), dal più recente"""
+        return archives_for_range(self.directory, since, until)
+
+    @contextmanager
+    def transaction(self, engine):
+        """
+        Transazione per maintain e drop: i file scritti vengono pubblicati e
+        quelli da eliminare rimossi solo dopo il commit; se la transazione
+        viene annullata (compresi i DROP TABLE) i file temporanei vengono
+        scartati e gli archivi restano com'erano
+
+        Yields:
+            Connection: da passare a log_partitions e cold_archiver
+        """
+        with engine.connect() as connection:
+            pending = connection.info[_PENDING] = []
+            try:
+                with connection.begin():
+                    if connection.dialect.name == 'sqlite':
+                        # pysqlite apre la transazione solo prima di un INSERT/UPDATE/DELETE:
+                        # senza BEGIN esplicito un DROP TABLE iniziale sarebbe già confermato.
+                        # IMMEDIATE prende subito il lock di scrittura, i worker si mettono in fila
+                        connection.exec_driver_sql('BEGIN IMMEDIATE')
+                    yield connection
+            except BaseException:
+                for staged, _ in pending:
+                    if staged and os.path.exists(staged):
+                        os.remove(staged)
+                raise
+            finally:
+                connection.info.pop(_PENDING, None)
+            for staged, path in pending:
+                try:
+                    if staged:
+                        os.replace(staged, path)
+                    else:
+                        os.remove(path)
+                except FileNotFoundError:
+                    # Già pubblicato da recover_staged in un altro worker, o già eliminato
+                    pass
+
+    def archive(self, connection, now=None):
+        """
+        Archivia le partizioni terminate da più di LOG_COLD_AFTER_DAYS giorni
+
+        Returns:
+            dict: {nome partizione: righe nel file}
+        """
+        if not self.after_days or not self.directory:
+            return {}
+        cutoff = (now or datetime.now()) - timedelta(days=self.after_days)
+        os.makedirs(self.directory, exist_ok=True)
+        return {
+            partition.name: archive_partition(connection, partition, self.directory)
+            for partition in reversed(list_partitions(connection)) if partition.end <= cutoff
+        }
+
+    def drop_expired(self, connection, now=None):
+        """
+        Elimina i file oltre LOG_RETENTION_PERIODS e i loro conteggi di rollup
+
+        Returns:
+            list: nomi degli archivi eliminati
+        """
+        cutoff = log_partitions.retention_cutoff(now)
+        if cutoff is None:
+            return []
+        expired = [archive for archive in list_archives(self.directory) if archive.end <= cutoff]
+        for archive in expired:
+            self.drop(connection, archive)
+        return [archive.name for archive in expired]
+
+    def drop(self, connection, archive):
+        """Toglie i conteggi dell'archivio; il file viene rimosso dopo il commit"""
+        _pending(connection).append((None, archive.path))
+        delete_rollup_range(connection, archive.start, archive.end)
+
+    def maintain(self, connection, now=None):
+        """
+        Da chiamare dopo log_partitions.maintain, dentro transaction()
+
+        Returns:
+            tuple: (righe per archivio creato, archivi eliminati)
+        """
+        recover_staged(connection, self.directory)
+        return self.archive(connection, now), self.drop_expired(connection, now)
+
+
+# Istanza configurata dall'app, usata da db_utils, cold_archive.py e /logs
+cold_archiver = ColdArchiver()
@@ -0,0 +1,367 @@
+"""
+Detector - Contatori a finestra scorrevole in memoria per gli alert in tempo reale
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from .alerts import (ATTACK_TYPES, MALICIOUS_PREFIX, brute_force_alert,
+                     malicious_input_alert, suspicious_ip_alert)
+
+
+class SlidingWindowCounter:
+    """
+    Conteggio degli eventi nella finestra [ora - window, ora] a bucket temporali.
+
+    Ogni bucket copre 'bucket' secondi: un nuovo evento incrementa l'ultimo
+    bucket o ne apre uno nuovo, i bucket usciti dalla finestra vengono scartati
+    dalla testa. Aggiornamento e lettura sono O(1) ammortizzati.
+    """
+
+    __slots__ = ('window', 'bucket', 'buckets', 'total', 'last_seen')
+
+    def __init__(self, window, bucket):
+        self.window = window
+        self.bucket = bucket
+        self.buckets = deque()
+        self.total = 0
+        self.last_seen = None
+
+    def _expire(self, now):
+        oldest = int((now - self.window) // self.bucket)
+        while self.buckets and self.buckets[0][0] <= oldest:
+            self.total -= self.buckets.popleft()[1]
+
+    def add(self, now, amount=1):
+        key = int(now // self.bucket)
+        self._expire(now)
+        if self.buckets and self.buckets[-1][0] == key:
+            self.buckets[-1][1] += amount
+        elif self.buckets and key < self.buckets[-1][0]:
+            # Evento più vecchio dell'ultimo bucket (storico caricato dopo eventi live)
+            self._add_past(key, amount)
+        else:
+            self.buckets.append([key, amount])
+        self.total += amount
+        if self.last_seen is None or now > self.last_seen:
+            self.last_seen = now
+
+    def _add_past(self, key, amount):
+        for position in range(len(self.buckets) - 1, -1, -1):
+            bucket_key = self.buckets[position][0]
+            if bucket_key == key:
+                self.buckets[position][1] += amount
+                return
+            if bucket_key < key:
+                self.buckets.insert(position + 1, [key, amount])
+                return
+        self.buckets.appendleft([key, amount])
+
+    def count(self, now):
+        self._expire(now)
+        return self.total
+
+
+def _crosses(counter, now, threshold):
+    """Aggiunge un evento a 'counter'; vero se il totale passa da sotto a sopra 'threshold'"""
+    before = counter.count(now)
+    counter.add(now)
+    return before < threshold <= counter.total
+
+
+class _IPState:
+    """Contatori di un singolo IP"""
+
+    __slots__ = ('login_failed', 'errors', 'attacks')
+
+    def __init__(self, detector):
+        self.login_failed = SlidingWindowCounter(detector.brute_window, detector.brute_bucket)
+        self.errors = SlidingWindowCounter(detector.error_window, detector.error_bucket)
+        self.attacks = {
+            attack_type: SlidingWindowCounter(detector.malicious_window, detector.error_bucket)
+            for attack_type in ATTACK_TYPES
+        }
+
+    def counters(self):
+        return (self.login_failed, self.errors, *self.attacks.values())
+
+
+class StreamingDetector:
+    """
+    Rilevamento in streaming alimentato direttamente da create_log.
+
+    Tiene per ogni IP i contatori di LOGIN_FAILED, errori e MALICIOUS_INPUT_*
+    nelle stesse finestre di SecurityAnalyzer, e notifica un alert appena un
+    contatore supera la soglia invece che alla prossima apertura di /logs.
+
+    I contatori vivono nel processo: con più worker ognuno vede i propri eventi
+    più lo storico letto dal database al primo utilizzo.
+    """
+
+    def __init__(self, brute_minutes=5, brute_threshold=5, error_hours=24, error_threshold=10,
+                 malicious_hours=24, recent_limit=10):
+        self.configure(brute_minutes, brute_threshold, error_hours, error_threshold, malicious_hours, recent_limit)
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._prime_lock = threading.Lock()
+        self._primed = False
+        self._live_since = None
+        self._listeners = []
+        self.recent_alerts = deque(maxlen=100)
+        self.events = 0
+        self.alerts_raised = 0
+
+    def configure(self, brute_minutes=5, brute_threshold=5, error_hours=24, error_threshold=10,
+                  malicious_hours=24, recent_limit=10):
+        self.brute_minutes = brute_minutes
+        self.brute_threshold = brute_threshold
+        self.error_hours = error_hours
+        self.error_threshold = error_threshold
+        self.malicious_hours = malicious_hours
+        self.recent_limit = recent_limit
+
+        self.brute_window = brute_minutes * 60
+        self.brute_bucket = max(self.brute_window / 60, 1)
+        self.error_window = error_hours * 3600
+        self.malicious_window = malicious_hours * 3600
+        self.error_bucket = max(max(self.error_window, self.malicious_window) / 1440, 1)
+
+        self._ips = {}
+        self._recent = {attack_type: deque(maxlen=recent_limit) for attack_type in ATTACK_TYPES}
+        self._records_since_sweep = 0
+        self._version = 0
+        self._counts_cache = None
+
+    def init_app(self, app):
+        """
+        Attiva il detector con le soglie configurate
+
+        Config:
+            ALERT_BRUTE_MINUTES, ALERT_BRUTE_THRESHOLD, ALERT_ERROR_HOURS,
+            ALERT_ERROR_THRESHOLD, ALERT_MALICIOUS_HOURS
+        """
+        self.configure(
+            app.config.get('ALERT_BRUTE_MINUTES', 5),
+            app.config.get('ALERT_BRUTE_THRESHOLD', 5),
+            app.config.get('ALERT_ERROR_HOURS', 24),
+            app.config.get('ALERT_ERROR_THRESHOLD', 10),
+            app.config.get('ALERT_MALICIOUS_HOURS', 24)
+        )
+        self._primed = False
+        # Gli eventi da qui in poi arrivano da record(); quelli precedenti dal database
+        self._live_since = datetime.now()
+        self.enabled = True
+
+    def matches(self, brute_minutes, error_hours, malicious_hours):
+        """Vero se le finestre richieste coincidono con quelle tenute in memoria"""
+        return (brute_minutes, error_hours, malicious_hours) == \
+            (self.brute_minutes, self.error_hours, self.malicious_hours)
+
+    def subscribe(self, callback):
+        """Registra una funzione chiamata con ogni nuovo alert (dict)"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    # -------------------------------
+    # Aggiornamento
+    # -------------------------------
+
+    def record(self, ip, log_type, is_error, timestamp=None):
+        """Registra un evento di log; notifica gli alert che superano la soglia"""
+        if not self.enabled:
+            return
+        with self._lock:
+            raised = self._record(ip, log_type, is_error, timestamp or datetime.now(), notify=True)
+        for alert in raised:
+            self._raise(alert)
+
+    def record_many(self, events):
+        """Come record per ogni (ip, type, is_error, timestamp), con il lock preso una volta"""
+        if not self.enabled:
+            return
+        raised = []
+        with self._lock:
+            for ip, log_type, is_error, timestamp in events:
+                raised += self._record(ip, log_type, is_error, timestamp, notify=True)
+        for alert in raised:
+            self._raise(alert)
+
+    def _record(self, ip, log_type, is_error, timestamp, notify):
+        is_failed_login = log_type == 'LOGIN_FAILED'
+        attack_type = log_type[len(MALICIOUS_PREFIX):] if log_type.startswith(MALICIOUS_PREFIX) else None
+        if not (is_error or is_failed_login or attack_type in self._recent):
+            return []
+
+        self.events += 1
+        self._version += 1
+        now = timestamp.timestamp()
+        state = self._ips.get(ip)
+        if state is None:
+            state = self._ips[ip] = _IPState(self)
+
+        # Alert quando il conteggio attraversa la soglia, non quando la eguaglia:
+        # record_many può saltarla, e dopo una scadenza può essere riattraversata
+        raised = []
+        if is_failed_login:
+            if _crosses(state.login_failed, now, self.brute_threshold) and notify:
+                raised.append(brute_force_alert(ip, state.login_failed.total, timestamp, self.brute_minutes))
+        if is_error:
+            if _crosses(state.errors, now, self.error_threshold) and notify:
+                raised.append(suspicious_ip_alert(ip, state.errors.total, self.error_hours))
+        if attack_type in self._recent:
+            counter = state.attacks[attack_type]
+            crossed = _crosses(counter, now, 1)
+            if notify:
+                self._recent[attack_type].appendleft({
+                    'ip': ip,
+                    'type': log_type,
+                    'timestamp': timestamp,
+                    'is_error': is_error
+                })
+            if notify and crossed:
+                raised.append(malicious_input_alert(ip, attack_type, counter.total, self.malicious_hours))
+
+        self._records_since_sweep += 1
+        # Lo sweep scorre tutti gli IP: almeno tanti eventi quanti IP tra uno e
+        # l'altro, così il costo per evento resta costante anche con molti IP
+        if self._records_since_sweep >= max(1000, len(self._ips)):
+            self._sweep(time.time())
+        return raised
+
+    def _sweep(self, now):
+        """Elimina gli IP senza eventi nelle finestre (chiamato col lock preso)"""
+        idle = [
+            ip for ip, state in self._ips.items()
+            if not any(counter.count(now) for counter in state.counters())
+        ]
+        for ip in idle:
+            del self._ips[ip]
+        self._records_since_sweep = 0
+
+    def _raise(self, alert):
+        self.alerts_raised += 1
+        self.recent_alerts.append(alert)
+        for callback in list(self._listeners):
+            try:
+                callback(alert)
+            except Exception as e:
+                print(f"Errore listener alert: {e}")
+
+    # -------------------------------
+    # Storico dal database
+    # -------------------------------
+
+    def ensure_primed(self):
+        """Carica dal database gli eventi precedenti all'avvio (una volta sola)"""
+        if self._primed or not self.enabled:
+            return
+        with self._prime_lock:
+            if self._primed:
+                return
+            self._prime_from_db()
+            self._primed = True
+
+    def _prime_from_db(self):
+        from sqlalchemy import or_
+        from .log import Log
+        from .storage import read_session
+
+        since = self._live_since - timedelta(seconds=max(self.brute_window, self.error_window, self.malicious_window))
+        relevant_types = ['LOGIN_FAILED'] + [MALICIOUS_PREFIX + attack_type for attack_type in ATTACK_TYPES]
+        rows = read_session().query(
+            Log.ip, Log.type, Log.is_error, Log.timestamp
+        ).filter(
+            Log.timestamp >= since,
+            Log.timestamp < self._live_since,
+            or_(Log.is_error == True, Log.type.in_(relevant_types))
+        ).order_by(Log.timestamp).all()
+
+        # Ultimi attacchi dello storico, da unire a quelli arrivati nel frattempo
+        primed_recent = {attack_type: deque(maxlen=self.recent_limit) for attack_type in ATTACK_TYPES}
+        for ip, log_type, is_error, timestamp in rows:
+            attack_type = log_type[len(MALICIOUS_PREFIX):]
+            if log_type.startswith(MALICIOUS_PREFIX) and attack_type in primed_recent:
+                primed_recent[attack_type].append({
+                    'ip': ip,
+                    'type': log_type,
+                    'timestamp': timestamp,
+                    'is_error': is_error
+                })
+
+        with self._lock:
+            for ip, log_type, is_error, timestamp in rows:
+                self._record(ip, log_type, is_error, timestamp, notify=False)
+            for attack_type, events in primed_recent.items():
+                merged = sorted(
+                    list(self._recent[attack_type]) + list(events),
+                    key=lambda event: event['timestamp'],
+                    reverse=True
+                )
+                self._recent[attack_type] = deque(merged[:self.recent_limit], maxlen=self.recent_limit)
+
+    # -------------------------------
+    # Letture
+    # -------------------------------
+
+    def counts(self):
+        """
+        Conteggi correnti per IP, nello stesso formato della query aggregata
+        di SecurityAnalyzer.alert_counts_statement
+
+        Returns:
+            list: (ip, tentativi falliti, ultimo tentativo, errori, *conteggi per ATTACK_TYPES)
+        """
+        self.ensure_primed()
+        now = time.time()
+        # Invariati finché non arrivano eventi e nessun bucket scade, in nessuna delle finestre
+        cache_key = (self._version, int(now // self.brute_bucket), int(now // self.error_bucket))
+        cached = self._counts_cache
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        rows = []
+        with self._lock:
+            for ip, state in self._ips.items():
+                brute_attempts = state.login_failed.count(now)
+                last = state.login_failed.last_seen if brute_attempts else None
+                rows.append((
+                    ip,
+                    brute_attempts,
+                    datetime.fromtimestamp(last) if last is not None else None,
+                    state.errors.count(now),
+                    *(state.attacks[attack_type].count(now) for attack_type in ATTACK_TYPES)
+                ))
+        self._counts_cache = (cache_key, rows)
+        return rows
+
+    def recent_malicious(self):
+        """
+        Returns:
+            dict: {attack_type: [evento, ...]} dal più recente, solo nella finestra
+        """
+        self.ensure_primed()
+        since = datetime.now() - timedelta(seconds=self.malicious_window)
+        with self._lock:
+            return {
+                attack_type: [event for event in events if event['timestamp'] >= since]
+                for attack_type, events in self._recent.items()
+            }
+
+    def stats(self):
+        with self._lock:
+            tracked = len(self._ips)
+        return {
+            'enabled': self.enabled,
+            'primed': self._primed,
+            'tracked_ips': tracked,
+            'events': self.events,
+            'alerts_raised': self.alerts_raised
+        }
+
+
+# Istanza usata da create_log e SecurityAnalyzer, attivata da init_app
+detector = StreamingDetector()
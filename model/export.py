@@ -0,0 +1,136 @@
+"""
+Export - Esportazione in streaming dei log filtrati in CSV o NDJSON
+
+Le righe vengono lette a blocchi di EXPORT_CHUNK_ROWS (yield_per) da una
+query forzata sull'indice su timestamp (INDEXED BY): le righe escono già
+nell'ordine di (timestamp, id) e SQLite non le ordina prima in un B-tree
+temporaneo, cosa che con alcuni filtri (tipo, IP) farebbe per tutto il
+risultato prima della prima riga. La memoria usata è la stessa per mille o
+per cinquanta milioni di log.
+L'ordine è quello di /logs (dal più recente), partizioni e archivi compresi.
+Con gzip il flusso viene compresso mentre viene generato.
+"""
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy.dialects.sqlite.base import SQLiteCompiler
+
+from .log import Log
+
+# SQLAlchemy non scrive i with_hint per SQLite: l'unico hint di tabella che
+# SQLite conosce è 'INDEXED BY indice', subito dopo il nome della tabella
+SQLiteCompiler.get_from_hint_text = lambda self, table, text: text
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+COLUMNS = ('id', 'timestamp', 'type', 'ip', 'is_error', 'user_id', 'username')
+
+# Celle che un foglio di calcolo interpreterebbe come formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def iter_log_rows(query, archives=(), chunk_size=5000):
+    """
+    Righe di 'query' e delle partizioni/archivi (vedi apply_log_filters), dalla più recente
+
+    Args:
+        query: query sulle righe di log (log_rows_query)
+        archives: coppie (query, partizione) e (ColdQuery, archivio), dalla più recente
+        chunk_size (int): righe lette dal database per volta
+    """
+    sources = [(query, Log.__table__)] + [
+        (archive_query, getattr(partition, 'table', None)) for archive_query, partition in archives
+    ]
+    for source, table in sources:
+        if table is None:
+            yield from source.rows(chunk_size)
+            continue
+        c = table.c
+        # Senza ORDER BY sul B-tree temporaneo: l'indice su timestamp dà già
+        # l'ordine (timestamp, id), anche con i filtri per tipo, IP o utente
+        yield from (
+            source.with_hint(table, f'INDEXED BY {_timestamp_index(table)}', 'sqlite')
+            .order_by(c.timestamp.desc(), c.id.desc())
+            .yield_per(chunk_size)
+        )
+
+
+def _timestamp_index(table):
+    """Nome dell'indice su timestamp di logs o di una partizione (l'id è il rowid, già in coda)"""
+    return next(
+        index.name for index in table.indexes
+        if [column.name for column in index.columns] == ['timestamp']
+    )
+
+
+def _cell(value):
+    if value and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_chunks(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow((
+            row.id, row.timestamp.isoformat(sep=' '), _cell(row.type), _cell(row.ip),
+            int(row.is_error), row.user_id, _cell(row.username)
+        ))
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows, chunk_size):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({
+            'id': row.id,
+            'timestamp': row.timestamp.isoformat(),
+            'type': row.type,
+            'ip': row.ip,
+            'is_error': bool(row.is_error),
+            'user_id': row.user_id,
+            'username': row.username
+        }, ensure_ascii=False))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _gzip(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_logs(rows, fmt='csv', gzip=False, chunk_size=5000):
+    """
+    Codifica le righe in blocchi di byte pronti da inviare o scrivere
+
+    Args:
+        rows: righe di log (vedi iter_log_rows)
+        fmt (str): 'csv' o 'ndjson'
+        gzip (bool): comprime il flusso in formato gzip
+
+    Yields:
+        bytes: un blocco ogni 'chunk_size' righe
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato di export non valido: {fmt}')
+    encode = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+    chunks = (chunk.encode('utf-8') for chunk in encode(rows, chunk_size))
+    return _gzip(chunks) if gzip else chunks
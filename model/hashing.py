@@ -0,0 +1,134 @@
+"""
+Hashing - Pool dedicato e limitato per hash e verifica bcrypt
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import bcrypt
+
+
+class HashingOverloaded(Exception):
+    """Il pool bcrypt è saturo: la richiesta va rifiutata subito (503)"""
+
+
+class HashingPool:
+    """
+    Esegue bcrypt su un numero fisso di thread invece che sui thread delle richieste.
+
+    bcrypt rilascia il GIL, quindi 'workers' hash girano davvero in parallelo;
+    oltre 'workers + max_pending' richieste in corso le nuove vengono rifiutate
+    subito, e quelle rimaste in coda più di 'queue_timeout' secondi vengono
+    scartate prima di calcolare l'hash. Così una raffica di login non occupa
+    tutti i thread WSGI e le pagine leggere restano servite.
+
+    Senza init_app l'hash viene calcolato nel thread chiamante (script, CLI).
+    """
+
+    def __init__(self):
+        self.workers = 4
+        self.max_pending = 32
+        self.queue_timeout = 0.5
+        self.rounds = None
+        self._executor = None
+        self._slots = None
+
+        # Contatori
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.max_queue_ms = 0.0
+
+    def init_app(self, app):
+        """
+        Config:
+            HASH_WORKERS (int): hash bcrypt in parallelo
+            HASH_MAX_PENDING (int): richieste in attesa oltre a quelle in corso
+            HASH_QUEUE_TIMEOUT_MS (int): attesa massima in coda prima di rinunciare
+            BCRYPT_LOG_ROUNDS (int): costo dei nuovi hash (vedi calibrate_bcrypt.py)
+        """
+        self.workers = app.config.get('HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('HASH_MAX_PENDING', self.max_pending)
+        self.queue_timeout = app.config.get('HASH_QUEUE_TIMEOUT_MS', self.queue_timeout * 1000) / 1000
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+
+    def _run(self, func, args):
+        if self._executor is None:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingOverloaded('Troppe richieste di hashing in corso')
+
+        submitted = time.monotonic()
+        try:
+            future = self._executor.submit(self._execute, func, args, submitted)
+        except BaseException:
+            self._slots.release()
+            raise
+        return future.result()
+
+    def _execute(self, func, args, submitted):
+        try:
+            waited = time.monotonic() - submitted
+            self.max_queue_ms = max(self.max_queue_ms, waited * 1000)
+            if waited > self.queue_timeout:
+                # Il client ha già aspettato troppo: meglio rifiutare che fare lavoro inutile
+                self.expired += 1
+                raise HashingOverloaded(f'Richiesta rimasta in coda {waited * 1000:.0f} ms')
+            result = func(*args)
+            self.completed += 1
+            return result
+        finally:
+            self._slots.release()
+
+    def generate(self, password):
+        """
+        Returns:
+            str: hash bcrypt di 'password'
+        """
+        return self._run(bcrypt.generate_password_hash, (password,)).decode('utf-8')
+
+    def check(self, hashed, password):
+        """
+        Returns:
+            bool: True se 'password' corrisponde a 'hashed'
+        """
+        return self._run(bcrypt.check_password_hash, (hashed, password))
+
+    @staticmethod
+    def hash_rounds(hashed):
+        """
+        Returns:
+            int: costo con cui è stato calcolato 'hashed' ($2b$<costo>$...), None se non è bcrypt
+        """
+        try:
+            return int(hashed.split('$')[2])
+        except (AttributeError, IndexError, ValueError):
+            return None
+
+    def needs_rehash(self, hashed):
+        """Vero se 'hashed' ha un costo diverso da BCRYPT_LOG_ROUNDS"""
+        if self.rounds is None:
+            return False
+        rounds = self.hash_rounds(hashed)
+        return rounds is not None and rounds != self.rounds
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'rounds': self.rounds,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'expired': self.expired,
+            'max_queue_ms': round(self.max_queue_ms, 3)
+        }
+
+
+# Istanza usata da User.check_password e create_user, attivata da init_app
+hashing_pool = HashingPool()
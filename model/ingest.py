@@ -0,0 +1,251 @@
+"""
+Ingest - Eventi di sicurezza da sorgenti esterne (reverse proxy, altri servizi) in blocchi NDJSON
+
+Una riga per evento:
+
+    {"ip": "203.0.113.7", "type": "LOGIN_FAILED", "timestamp": "2026-03-01T10:00:00Z",
+     "is_error": true, "username": "mario"}
+
+Solo ip e type sono obbligatori (timestamp = ora di ricezione, is_error = false).
+I timestamp più vecchi della partizione calda sono rifiutati: logs deve
+contenere solo log più recenti di ogni partizione d'archivio (paginazione di
+/logs, rollup dei periodi già archiviati).
+Il blocco viene validato tutto prima di scrivere: le righe non valide sono
+scartate e segnalate col loro numero, le altre scritte in una sola
+transazione con un executemany. Gli username si risolvono con una sola query
+per blocco; quelli sconosciuti restano sull'evento solo come conteggio
+(user_id NULL). Gli eventi passano poi dal detector e dal live tail come
+quelli di create_log.
+"""
+import hmac
+import ipaddress
+import json
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from . import db
+from .broadcaster import broadcaster
+from .detector import detector
+from .log import Log, _log_event
+from .partitions import log_partitions
+from .rollup import add_rollup_counts, data_version, log_triggers_paused
+from .search import index_logs
+from .user import User
+
+FIELDS = frozenset(('ip', 'type', 'timestamp', 'is_error', 'username'))
+TYPE_PATTERN = re.compile(r'[A-Z][A-Z0-9_]{0,49}')
+MAX_REPORTED_ERRORS = 20
+
+
+class IngestError(Exception):
+    """Blocco rifiutato per intero (più di INGEST_MAX_BATCH eventi)"""
+
+
+def parse_event(data, now, max_skew, oldest=None):
+    """
+    Valida un evento già decodificato dal JSON
+
+    Args:
+        now, max_skew: timestamp oltre now + max_skew sono rifiutati
+        oldest: timestamp precedenti sono rifiutati (inizio della partizione calda)
+
+    Returns:
+        tuple: (ip, type, timestamp, is_error, username)
+
+    Raises:
+        ValueError: con il motivo del rifiuto
+    """
+    if not isinstance(data, dict):
+        raise ValueError('l\'evento deve essere un oggetto JSON')
+    unknown = data.keys() - FIELDS
+    if unknown:
+        raise ValueError(f"campi non previsti: {', '.join(sorted(unknown))}")
+
+    ip = data.get('ip')
+    if not isinstance(ip, str):
+        raise ValueError('ip mancante')
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        raise ValueError(f'ip non valido: {ip[:45]!r}') from None
+
+    log_type = data.get('type')
+    if not isinstance(log_type, str) or not TYPE_PATTERN.fullmatch(log_type):
+        raise ValueError('type mancante o non valido (A-Z, 0-9, _, massimo 50 caratteri)')
+
+    timestamp = data.get('timestamp')
+    if timestamp is None:
+        timestamp = now
+    elif isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            raise ValueError(f'timestamp non ISO 8601: {timestamp[:40]!r}') from None
+    elif isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+        try:
+            timestamp = datetime.fromtimestamp(timestamp)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError('timestamp epoch fuori intervallo') from None
+    else:
+        raise ValueError('timestamp deve essere una stringa ISO 8601 o secondi epoch')
+    if timestamp.tzinfo is not None:
+        # I log sono salvati in ora locale senza fuso, come datetime.now()
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    if timestamp > now + max_skew:
+        raise ValueError('timestamp nel futuro')
+    if oldest is not None and timestamp < oldest:
+        raise ValueError(f'timestamp precedente a {oldest:%Y-%m-%d}: il periodo è già archiviato')
+
+    is_error = data.get('is_error', False)
+    if not isinstance(is_error, bool):
+        raise ValueError('is_error deve essere true o false')
+
+    username = data.get('username')
+    if username is not None and (not isinstance(username, str) or not 0 < len(username) <= 80):
+        raise ValueError('username non valido')
+
+    return ip, log_type, timestamp, is_error, username
+
+
+class LogIngestor:
+    """Validazione e scrittura dei blocchi di eventi"""
+
+    def __init__(self):
+        self.tokens = ()
+        self.max_batch = 10000
+        self.max_skew = timedelta(minutes=5)
+
+        # Contatori
+        self.batches = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        """
+        Config:
+            INGEST_TOKENS (str): token accettati, separati da virgola ('' = endpoint disattivato)
+            INGEST_MAX_BATCH (int): righe massime per blocco
+            INGEST_MAX_SKEW_SECONDS (int): tolleranza per i timestamp nel futuro
+        """
+        tokens = app.config.get('INGEST_TOKENS') or ''
+        self.tokens = tuple(token.strip() for token in tokens.split(',') if token.strip())
+        self.max_batch = app.config.get('INGEST_MAX_BATCH', self.max_batch)
+        self.max_skew = timedelta(seconds=app.config.get('INGEST_MAX_SKEW_SECONDS', self.max_skew.total_seconds()))
+
+    def authorized(self, token):
+        """Confronto a tempo costante con ogni token configurato"""
+        if not token:
+            return False
+        token = token.encode('utf-8')
+        # Niente uscita anticipata: il tempo non dice quale token è quasi giusto
+        return sum(hmac.compare_digest(token, allowed.encode('utf-8')) for allowed in self.tokens) > 0
+
+    def parse_batch(self, lines):
+        """
+        Args:
+            lines: righe NDJSON (str o bytes); le righe vuote sono ignorate
+
+        Returns:
+            tuple: (eventi validi, lista di (numero di riga, errore))
+
+        Raises:
+            IngestError: se il blocco supera INGEST_MAX_BATCH righe
+        """
+        now = datetime.now()
+        oldest = log_partitions.hot_start(now)
+        events, errors = [], []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            if len(events) + len(errors) >= self.max_batch:
+                raise IngestError(f'Blocco troppo grande: massimo {self.max_batch} eventi')
+            try:
+                events.append(parse_event(json.loads(line), now, self.max_skew, oldest))
+            except ValueError as e:
+                # Comprende json.JSONDecodeError e UnicodeDecodeError
+                errors.append((number, str(e)))
+        return events, errors
+
+    def store(self, events, session=None):
+        """
+        Scrive gli eventi validati in una transazione
+
+        Returns:
+            int: eventi con uno username che non corrisponde a nessun utente
+        """
+        if not events:
+            return 0
+        session = session or db.session
+        usernames = {event[4] for event in events if event[4] is not None}
+        user_ids = dict(session.execute(
+            select(User.username, User.id).where(User.username.in_(usernames))
+        ).all()) if usernames else {}
+
+        rows = [{
+            'ip': ip,
+            'type': log_type,
+            'timestamp': timestamp,
+            'is_error': is_error,
+            'user_id': user_ids.get(username)
+        } for ip, log_type, timestamp, is_error, username in events]
+
+        # Insert sulla tabella, non sul modello: l'ORM spezzerebbe il blocco in
+        # un executemany per ogni sequenza di righe con le stesse colonne non NULL
+        statement = insert(Log.__table__)
+        publish = broadcaster.has_subscribers
+        if publish:
+            statement = statement.returning(Log.__table__.c.id, sort_by_parameter_order=True)
+
+        connection = session.connection()
+        if connection.dialect.name == 'sqlite' and data_version(session) is not None:
+            # Rollup e indice di ricerca aggiornati una volta per blocco, non riga per riga dai trigger
+            with log_triggers_paused(connection):
+                result = connection.execute(statement, rows)
+                # Gli id di un executemany in una transazione sono consecutivi
+                last_id = connection.exec_driver_sql('SELECT max(id) FROM logs').scalar()
+                add_rollup_counts(connection, rows)
+                index_logs(connection, last_id - len(rows))
+        else:
+            result = connection.execute(statement, rows)
+        ids = result.scalars().all() if publish else None
+        session.commit()
+
+        detector.record_many((ip, log_type, is_error, timestamp) for ip, log_type, timestamp, is_error, _ in events)
+        if publish:
+            for row, log_id, event in zip(rows, ids, events):
+                broadcaster.publish('log', _log_event(dict(row, id=log_id), event[4] if row['user_id'] else None))
+        return sum(1 for event in events if event[4] is not None and event[4] not in user_ids)
+
+    def ingest(self, lines, session=None):
+        """
+        Valida e scrive un blocco NDJSON
+
+        Returns:
+            dict: accepted, rejected, unknown_users ed errors (le prime MAX_REPORTED_ERRORS righe scartate)
+        """
+        events, errors = self.parse_batch(lines)
+        unknown_users = self.store(events, session)
+        self.batches += 1
+        self.accepted += len(events)
+        self.rejected += len(errors)
+        return {
+            'accepted': len(events),
+            'rejected': len(errors),
+            'unknown_users': unknown_users,
+            'errors': [{'line': number, 'error': error} for number, error in errors[:MAX_REPORTED_ERRORS]]
+        }
+
+    def stats(self):
+        return {
+            'enabled': bool(self.tokens),
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'accepted': self.accepted,
+            'rejected': self.rejected
+        }
+
+
+# Istanza configurata dall'app, usata da /api/logs/ingest e ingest_logs.py
+log_ingestor = LogIngestor()
@@ -1,6 +1,10 @@
 from datetime import datetime
+from sqlalchemy import case, func, tuple_
 from . import db
 from model.user import User
+from model.log_writer import LogWriter
+from model.detector import detector
+from model.broadcaster import broadcaster
 
 
 class Log(db.Model):
@@ -16,23 +20,242 @@ class Log(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     user = db.relationship('User', backref='logs')
 
+    __table_args__ = (
+        # SecurityAnalyzer brute force / malicious inputs: type + time window, ip covered
+        db.Index('ix_logs_type_timestamp_ip', 'type', 'timestamp', 'ip'),
+        # SecurityAnalyzer suspicious IPs and alert aggregation: errors in the
+        # time window, ip and type covered
+        db.Index('ix_logs_is_error_timestamp_ip_type', 'is_error', 'timestamp', 'ip', 'type'),
+        # /logs and get_all_logs: newest first
+        db.Index('ix_logs_timestamp', 'timestamp'),
+        # get_logs_by_user and the username filter
+        db.Index('ix_logs_user_id_timestamp', 'user_id', 'timestamp'),
+        # Ids are never reused, even when rotation empties the table: partitions
+        # keep the old ones and (timestamp, id) must stay unique across them
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f"<Log {self.type} from {self.ip} at {self.timestamp}>"
 
 
+# Background batch writer, started by the app when LOG_WRITER_ASYNC is on
+log_writer = LogWriter(Log)
+
+
+def _log_event(row, username):
+    """Payload pushed to live-tail clients for a persisted log row."""
+    return {
+        'id': row['id'],
+        'ip': row['ip'],
+        'type': row['type'],
+        'timestamp': row['timestamp'],
+        'is_error': row['is_error'],
+        'username': username
+    }
+
+
+def _broadcast_written(rows):
+    """Publish a batch committed by the log writer (one users lookup per batch)."""
+    if not broadcaster.has_subscribers:
+        return
+    user_ids = {row['user_id'] for row in rows if row['user_id'] is not None}
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()
+    ) if user_ids else {}
+    for row in rows:
+        broadcaster.publish('log', _log_event(row, usernames.get(row['user_id'])))
+
+
+log_writer.on_written(_broadcast_written)
+
+
 # -------------------------------
 # CRUD / Helper Functions
 # -------------------------------
 
 def create_log(ip, log_type, user=None, is_error=False):
-    """Create a new log entry. 'user' can be a User object or None."""
+    """Create a new log entry. 'user' can be a User object or None.
+
+    When the background writer is running the entry is only queued (it is
+    written with the next batch) and None is returned instead of the Log.
+    Either way the event is also counted by the in-memory alert detector,
+    and it is pushed to live-tail clients once it has been committed.
+    """
     user_id = user.id if user else None
-    log = Log(ip=ip, type=log_type, user_id=user_id, is_error=is_error)
+    timestamp = datetime.now()
+    detector.record(ip, log_type, is_error, timestamp)
+    if log_writer.running:
+        log_writer.submit({
+            'ip': ip,
+            'type': log_type,
+            'user_id': user_id,
+            'is_error': is_error,
+            'timestamp': timestamp
+        })
+        return None
+
+    log = Log(ip=ip, type=log_type, user_id=user_id, is_error=is_error, timestamp=timestamp)
     db.session.add(log)
     db.session.commit()
+    if broadcaster.has_subscribers:
+        row = {'id': log.id, 'ip': ip, 'type': log_type, 'timestamp': timestamp, 'is_error': is_error}
+        broadcaster.publish('log', _log_event(row, user.username if user else None))
     return log
 
 
+# -------------------------------
+# Projections
+# -------------------------------
+
+# Columns of a log row as rendered by the dashboard and the CLI
+LOG_ROW_COLUMNS = (Log.id, Log.ip, Log.type, Log.timestamp, Log.is_error, Log.user_id, User.username)
+
+
+def log_rows_query(session=None, table=None):
+    """Query logs as plain row tuples with the username joined in.
+
+    Rows expose id, ip, type, timestamp, is_error, user_id and username
+    (None for anonymous events). No Log or User objects are built and no
+    per-row lazy load of Log.user is issued.
+
+    'table' selects the same columns from an archive partition instead of logs
+    (see model.partitions).
+    """
+    session = session or db.session
+    if table is None:
+        return session.query(*LOG_ROW_COLUMNS).outerjoin(User, Log.user_id == User.id)
+    c = table.c
+    return session.query(
+        c.id, c.ip, c.type, c.timestamp, c.is_error, c.user_id, User.username
+    ).outerjoin(User, c.user_id == User.id)
+
+
+def get_recent_log_rows(limit=20, session=None):
+    """Return the newest 'limit' log rows (see log_rows_query)."""
+    return log_rows_query(session).order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit).all()
+
+
+# -------------------------------
+# Pagination / Aggregates
+# -------------------------------
+
+def encode_cursor(log):
+    """Cursor pointing at 'log' (a Log or a log row) in the (timestamp, id) ordering."""
+    return f"{log.timestamp.isoformat()}_{log.id}"
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor, or None if it is not valid."""
+    try:
+        timestamp, log_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _fetch_page(sources, key, newer, limit):
+    """Collect up to 'limit' rows past 'key' from (query, table, partition) sources in order."""
+    rows = []
+    for query, table, partition in sources:
+        if partition is not None and key is not None:
+            # Archive partitions entirely on the wrong side of the cursor are never queried
+            if (newer and partition.end <= key[0]) or (not newer and partition.start > key[0]):
+                continue
+        if table is None:
+            # Cold archive file (see model.cold_archive.ColdQuery)
+            rows += query.page_rows(key, newer, limit - len(rows))
+        else:
+            c = table.c
+            if key is not None:
+                position = tuple_(c.timestamp, c.id)
+                query = query.filter(position > key if newer else position < key)
+            order = (c.timestamp.asc(), c.id.asc()) if newer else (c.timestamp.desc(), c.id.desc())
+            rows += query.order_by(*order).limit(limit - len(rows)).all()
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def paginate_logs(query, after=None, before=None, per_page=200, archives=()):
+    """Return one page of 'query', newest first, using keyset pagination.
+
+    'query' can select Log objects or log rows (see log_rows_query).
+
+    'after' continues towards older logs past that cursor, 'before' goes back
+    towards newer ones. The page starts with an index seek on
+    (timestamp, id) instead of an OFFSET scan, so every page costs the same.
+
+    'archives' are (query, partition) pairs for the archive partitions, newest
+    first; the page continues into them once 'query' runs out, and a
+    partition is only queried when the page actually reaches it. Cold
+    archive files come as (ColdQuery, ColdArchive) pairs in the same list.
+
+    Returns:
+        tuple: (logs, older_cursor, newer_cursor); a cursor is None when
+        there is nothing more in that direction.
+    """
+    sources = [(query, Log.__table__, None)] + [
+        (archive_query, getattr(partition, 'table', None), partition) for archive_query, partition in archives
+    ]
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before and not after_key else None
+
+    if before_key:
+        rows = _fetch_page(sources[::-1], before_key, True, per_page + 1)
+        if not rows:
+            return paginate_logs(query, per_page=per_page, archives=archives)
+        has_newer = len(rows) > per_page
+        logs = rows[:per_page][::-1]
+        has_older = True
+    else:
+        rows = _fetch_page(sources, after_key, False, per_page + 1)
+        has_older = len(rows) > per_page
+        logs = rows[:per_page]
+        has_newer = after_key is not None
+
+    older_cursor = encode_cursor(logs[-1]) if logs and has_older else None
+    newer_cursor = encode_cursor(logs[0]) if logs and has_newer else None
+    return logs, older_cursor, newer_cursor
+
+
+def summarize_logs(query, table=None):
+    """Count the logs matched by 'query' per type, in a single GROUP BY.
+
+    'table' is the archive partition 'query' reads from, if not logs.
+
+    Returns:
+        dict: {'total', 'errors', 'by_type': {type: count}} over the whole
+        filtered set, not just the page being displayed.
+    """
+    c = (table if table is not None else Log.__table__).c
+    rows = query.with_entities(
+        c.type,
+        func.count(c.id),
+        func.sum(case((c.is_error == True, 1), else_=0))
+    ).order_by(None).group_by(c.type).all()
+
+    by_type = {log_type: count for log_type, count, _ in rows}
+    return {
+        'total': sum(by_type.values()),
+        'errors': sum(errors or 0 for _, _, errors in rows),
+        'by_type': by_type
+    }
+
+
+def merge_summaries(summaries):
+    """Add up summarize_logs results computed on different tables."""
+    by_type = {}
+    for summary in summaries:
+        for log_type, count in summary['by_type'].items():
+            by_type[log_type] = by_type.get(log_type, 0) + count
+    return {
+        'total': sum(summary['total'] for summary in summaries),
+        'errors': sum(summary['errors'] for summary in summaries),
+        'by_type': by_type
+    }
+
+
 def get_all_logs():
     """Return all logs, newest first."""
     return Log.query.order_by(Log.timestamp.desc()).all()
@@ -0,0 +1,243 @@
+"""
+Log Writer - Scrittura asincrona e a blocchi degli eventi di log
+"""
+import atexit
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import insert
+
+from . import db
+
+
+class LogWriter:
+    """
+    Coda in memoria + thread in background che scrive i log con insert multipli.
+
+    Gli eventi vengono accodati da create_log e scritti quando la coda raggiunge
+    batch_size oppure quando il più vecchio in attesa ha superato flush_interval.
+    Una sola transazione (e un solo fsync di SQLite) copre tutto il blocco.
+    """
+
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'sample')
+
+    def __init__(self, model):
+        self.model = model
+        self.batch_size = 500
+        self.flush_interval = 0.05
+        self.max_queue = 10000
+        self.overflow = 'block'
+        self.block_timeout = 1.0
+        self.sample_every = 10
+
+        self._app = None
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._overflow_seen = 0
+        self._atexit_registered = False
+        self._listeners = []
+
+        # Contatori
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def init_app(self, app):
+        """Legge la configurazione dall'app Flask"""
+        overflow = app.config.get('LOG_WRITER_OVERFLOW', self.overflow)
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Policy di overflow non valida: {overflow}')
+
+        self._app = app
+        self.batch_size = app.config.get('LOG_WRITER_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('LOG_WRITER_FLUSH_MS', self.flush_interval * 1000) / 1000
+        self.max_queue = app.config.get('LOG_WRITER_MAX_QUEUE', self.max_queue)
+        self.overflow = overflow
+        self.block_timeout = app.config.get('LOG_WRITER_BLOCK_TIMEOUT', self.block_timeout)
+        self.sample_every = app.config.get('LOG_WRITER_SAMPLE_EVERY', self.sample_every)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Avvia il thread di scrittura (flush automatico all'uscita del processo)"""
+        if self._app is None:
+            raise RuntimeError('LogWriter.init_app() non è stato chiamato')
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+
+    def stop(self, timeout=5.0):
+        """Ferma il thread dopo aver scritto tutto quello che è ancora in coda"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Eventi arrivati durante lo stop: ultimo flush sincrono
+        self.flush()
+
+    def on_written(self, callback):
+        """
+        Registra una funzione chiamata dopo ogni commit con le righe scritte
+
+        La funzione riceve la lista dei dict del blocco, con l'id assegnato
+        dal database, e gira nel thread di scrittura dentro l'app context.
+        """
+        self._listeners.append(callback)
+
+    def submit(self, row):
+        """
+        Accoda un evento (dict con le colonne di Log)
+
+        Returns:
+            bool: False se l'evento è stato scartato per overflow
+        """
+        with self._cond:
+            self.submitted += 1
+            if len(self._queue) >= self.max_queue and not self._make_room():
+                self.dropped += 1
+                return False
+
+            self._queue.append(row)
+            if len(self._queue) > self.max_depth:
+                self.max_depth = len(self._queue)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            elif len(self._queue) == 1:
+                # Prima voce in coda: fa partire il timer di flush
+                self._cond.notify_all()
+            return True
+
+    def _make_room(self):
+        """Applica la policy di overflow a coda piena (chiamato col lock preso)"""
+        if self.overflow == 'block':
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._queue) >= self.max_queue:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+        if self.overflow == 'sample':
+            # A coda piena passa solo un evento ogni sample_every
+            self._overflow_seen += 1
+            if self._overflow_seen % self.sample_every:
+                return False
+
+        # drop_oldest, o evento campionato: fa spazio scartando il più vecchio
+        self._queue.popleft()
+        self.dropped += 1
+        return True
+
+    def flush(self):
+        """Scrive subito, nel thread chiamante, tutto quello che è in coda"""
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def _take_batch(self):
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        if batch:
+            # Sveglia i produttori bloccati dalla policy 'block'
+            self._cond.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = None
+                while not self._stopping and len(self._queue) < self.batch_size:
+                    if not self._queue:
+                        deadline = None
+                        self._cond.wait()
+                        continue
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                stopping = self._stopping
+
+            if batch:
+                self._write(batch)
+            elif stopping:
+                return
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        with self._app.app_context():
+            try:
+                statement = insert(self.model)
+                if self._listeners:
+                    statement = statement.returning(self.model.id, sort_by_parameter_order=True)
+                result = db.session.execute(statement, batch)
+                ids = result.scalars().all() if self._listeners else None
+                db.session.commit()
+                self.written += len(batch)
+            except Exception as e:
+                db.session.rollback()
+                self.failed += len(batch)
+                print(f"Errore scrittura log ({len(batch)} eventi persi): {e}")
+            else:
+                if self._listeners:
+                    self._notify(batch, ids)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    def _notify(self, batch, ids):
+        written = [dict(row, id=log_id) for row, log_id in zip(batch, ids)]
+        for callback in self._listeners:
+            try:
+                callback(written)
+            except Exception as e:
+                print(f"Errore listener log writer: {e}")
+
+    def stats(self):
+        """
+        Returns:
+            dict: profondità della coda e contatori di scrittura/latenza
+        """
+        with self._cond:
+            depth = len(self._queue)
+        return {
+            'running': self.running,
+            'queue_depth': depth,
+            'max_queue_depth': self.max_depth,
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'avg_flush_ms': round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 3)
+        }
@@ -0,0 +1,117 @@
+"""
+Maintenance - Rotazione, retention e archivio su file dei log a intervalli regolari
+
+log_partitions.maintain e cold_archiver.maintain vanno eseguiti anche mentre
+il server è in funzione: senza, logs cresce per sempre e LOG_RETENTION_PERIODS
+non elimina niente. Un thread in background li esegue ogni
+LOG_MAINTENANCE_INTERVAL_SECONDS dentro l'app context; con più worker ognuno
+ha il proprio thread, ma un passaggio senza niente da spostare costa una sola
+query su indice e uno in conflitto con un altro worker fallisce senza effetti
+(la transazione viene annullata e i file d'archivio temporanei scartati, vedi
+ColdArchiver.transaction) e riprova al giro successivo.
+"""
+import threading
+import time
+
+from . import db
+from .cold_archive import cold_archiver
+from .partitions import log_partitions
+
+
+class LogMaintenance:
+    """Esecuzione periodica di rotazione, retention e archivio freddo"""
+
+    def __init__(self):
+        self.interval = 3600
+
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+
+        # Contatori
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_ms = 0.0
+
+    def init_app(self, app):
+        """
+        Config:
+            LOG_MAINTENANCE_INTERVAL_SECONDS (int): secondi tra due passaggi (0 = solo manuale)
+        """
+        self._app = app
+        self.interval = app.config.get('LOG_MAINTENANCE_INTERVAL_SECONDS', self.interval)
+
+    def run(self):
+        """
+        Un passaggio completo in una transazione
+
+        Returns:
+            dict: moved, archived (log per partizione o archivio) e dropped (nomi eliminati)
+        """
+        start = time.perf_counter()
+        with self._app.app_context():
+            with cold_archiver.transaction(db.engine) as connection:
+                moved, dropped = log_partitions.maintain(connection)
+                archived, expired = cold_archiver.maintain(connection)
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return {'moved': moved, 'archived': archived, 'dropped': dropped + expired}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Avvia il thread: il primo passaggio arriva dopo un intervallo, quello
+        all'avvio lo fa chi lancia il server. Va chiamato solo dal processo che
+        serve le richieste (app.py), non all'import: gli script che importano
+        app non devono spostare o archiviare partizioni in background
+        """
+        if self._app is None:
+            raise RuntimeError('LogMaintenance.init_app() non è stato chiamato')
+        if self.running or not self.interval:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='log-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.report(self.run())
+            except Exception as e:
+                self.failures += 1
+                print(f"Errore manutenzione log: {e}")
+
+    @staticmethod
+    def report(result):
+        """Stampa l'esito di run()"""
+        for name, count in result['moved'].items():
+            print(f"📦 {count} log spostati in {name}")
+        for name, count in result['archived'].items():
+            print(f"🧊 {name} archiviata su file ({count} log)")
+        for name in result['dropped']:
+            print(f"🗑️  Partizione {name} eliminata (retention)")
+
+    def stats(self):
+        return {
+            'interval_seconds': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_run': self.last_run,
+            'last_ms': round(self.last_ms, 1)
+        }
+
+
+# Istanza configurata e avviata dall'app
+log_maintenance = LogMaintenance()
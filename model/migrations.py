@@ -0,0 +1,90 @@
+"""
+Migrations - Aggiornamento idempotente dello schema su database esistenti
+"""
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+
+from . import db
+from .log import Log
+from .partitions import max_partition_id
+from .rollup import ensure_rollups
+from .search import ensure_search_index
+from .username_filter import ensure_user_version
+
+
+def ensure_log_autoincrement(connection):
+    """
+    Ricrea logs con AUTOINCREMENT se è stata creata senza
+
+    Senza, SQLite assegna max(id) + 1: se la rotazione svuota logs, i nuovi id
+    ripartono da valori già presenti nelle partizioni. La tabella viene copiata
+    (procedura di ALTER TABLE generica di SQLite), indici e trigger ricreati
+    identici e il contatore parte dall'id più alto di logs e delle partizioni.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    schema = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'logs'"
+    ).scalar()
+    if schema is None or 'AUTOINCREMENT' in schema.upper():
+        return
+
+    dependents = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'logs' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).scalars().all()
+    columns = ', '.join(column.name for column in Log.__table__.columns)
+    create = str(CreateTable(Log.__table__).compile(dialect=connection.dialect))
+    connection.exec_driver_sql(create.replace('CREATE TABLE logs (', 'CREATE TABLE logs_rebuild (', 1))
+    connection.exec_driver_sql(f'INSERT INTO logs_rebuild ({columns}) SELECT {columns} FROM logs')
+    # DROP TABLE non esegue i trigger di delete: rollup e indice di ricerca restano validi
+    connection.exec_driver_sql('DROP TABLE logs')
+    connection.exec_driver_sql('ALTER TABLE logs_rebuild RENAME TO logs')
+    for statement in dependents:
+        connection.exec_driver_sql(statement)
+
+    floor = max(connection.exec_driver_sql('SELECT max(id) FROM logs').scalar() or 0, max_partition_id(connection))
+    connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'logs'")
+    connection.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('logs', ?)", (floor,))
+
+
+def ensure_log_indexes(connection):
+    """Crea gli indici di Log mancanti (db.create_all non tocca tabelle esistenti)"""
+    for index in Log.__table__.indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def drop_obsolete_indexes(connection):
+    """Elimina gli indici sostituiti da versioni più complete"""
+    for name in OBSOLETE_INDEXES:
+        connection.exec_driver_sql(f'DROP INDEX IF EXISTS {name}')
+
+
+# Indici non più definiti sui modelli
+OBSOLETE_INDEXES = [
+    'ix_logs_is_error_timestamp_ip',  # sostituito da ix_logs_is_error_timestamp_ip_type
+]
+
+# Passi applicati in ordine a ogni avvio: ognuno deve poter girare più volte
+MIGRATIONS = [
+    ensure_log_autoincrement,
+    ensure_log_indexes,
+    drop_obsolete_indexes,
+    ensure_search_index,
+    ensure_rollups,
+    ensure_user_version,
+]
+
+
+def upgrade(app):
+    """
+    Porta lo schema del database all'ultima versione
+
+    Da chiamare dopo db.create_all(), dentro o fuori da un app context.
+    """
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for migration in MIGRATIONS:
+                migration(connection)
+            if connection.dialect.name == 'sqlite':
+                # Aggiorna le statistiche del planner solo dove servono
+                connection.execute(text('PRAGMA optimize'))
@@ -0,0 +1,263 @@
+"""
+Partitions - Archivio dei log in tabelle per giorno o per mese, con retention a costo costante
+
+La tabella logs resta la partizione "calda": riceve tutte le scritture e
+contiene gli ultimi LOG_HOT_PERIODS periodi (almeno uno completo, quindi più
+delle 24 ore guardate da SecurityAnalyzer, che continua a leggere solo logs).
+rotate() sposta i periodi più vecchi in tabelle logs_pAAAAMM (o logs_pAAAAMMGG)
+con le stesse colonne; drop_expired() elimina le partizioni oltre
+LOG_RETENTION_PERIODS con un DROP TABLE, senza cancellare riga per riga.
+
+Gli spostamenti non toccano i conteggi di rollup (log_triggers_paused); vengono
+tolti solo i bucket delle partizioni eliminate. L'indice di ricerca FTS copre
+solo logs: sulle partizioni i filtri usano LIKE. Le partizioni più vecchie
+possono passare su file colonnari (vedi model.cold_archive).
+
+/logs scorre le partizioni dalla più recente e interroga solo quelle che
+servono alla pagina richiesta (vedi paginate_logs) e al filtro per data.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, MetaData, String, Table, text
+
+from .rollup import clear_rollups, delete_rollup_range, log_triggers_paused
+from .search import SEARCH_TABLE, search_available
+
+PERIODS = ('day', 'month')
+PREFIX = 'logs_p'
+_NAME_FORMATS = {'month': '%Y%m', 'day': '%Y%m%d'}
+_NAME_PATTERN = re.compile(rf'^{PREFIX}(\d{{6}}|\d{{8}})$')
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+_COLUMNS = 'id, ip, type, timestamp, is_error, user_id'
+
+_metadata = MetaData()
+_tables = {}
+
+
+class Partition(namedtuple('Partition', 'name start end')):
+    """Tabella d'archivio con i log in [start, end)"""
+
+    @property
+    def table(self):
+        return partition_table(self.name)
+
+
+def period_start(moment, period):
+    if period == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start, period):
+    if period == 'day':
+        return start + timedelta(days=1)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def previous_period(start, period):
+    if period == 'day':
+        return start - timedelta(days=1)
+    return (start - timedelta(days=1)).replace(day=1)
+
+
+def partition_for(start, period):
+    return Partition(f'{PREFIX}{start.strftime(_NAME_FORMATS[period])}', start, next_period(start, period))
+
+
+def parse_partition(name):
+    """Partition dal nome della tabella, None se non è una partizione"""
+    match = _NAME_PATTERN.match(name)
+    if not match:
+        return None
+    digits = match.group(1)
+    period = 'day' if len(digits) == 8 else 'month'
+    return partition_for(datetime.strptime(digits, _NAME_FORMATS[period]), period)
+
+
+def partition_table(name):
+    """Table SQLAlchemy della partizione 'name' (stesse colonne di logs)"""
+    if name not in _tables:
+        _tables[name] = Table(
+            name, _metadata,
+            Column('id', Integer, primary_key=True),
+            Column('ip', String(45), nullable=False),
+            Column('type', String(50), nullable=False),
+            Column('timestamp', DateTime, nullable=False),
+            Column('is_error', Boolean, nullable=False),
+            Column('user_id', Integer, nullable=True),
+            # Listato newest first e filtri per data; l'id è incluso implicitamente
+            Index(f'ix_{name}_timestamp', 'timestamp'),
+        )
+    return _tables[name]
+
+
+def list_partitions(bind):
+    """
+    Args:
+        bind: Connection o Session
+
+    Returns:
+        list: Partition esistenti, dalla più recente
+    """
+    dialect = bind.get_bind().dialect if hasattr(bind, 'get_bind') else bind.dialect
+    if dialect.name != 'sqlite':
+        return []
+    names = bind.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB :pattern"
+    ), {'pattern': f'{PREFIX}[0-9]*'}).scalars()
+    partitions = [partition for partition in map(parse_partition, names) if partition]
+    return sorted(partitions, key=lambda partition: partition.start, reverse=True)
+
+
+def max_partition_id(bind):
+    """Id più alto nelle partizioni d'archivio (0 se non ce ne sono)"""
+    return max((
+        bind.execute(text(f'SELECT max(id) FROM {partition.name}')).scalar() or 0
+        for partition in list_partitions(bind)
+    ), default=0)
+
+
+def partitions_for_range(bind, since=None, until=None):
+    """Partizioni che possono contenere log in [since, until), dalla più recente"""
+    return [
+        partition for partition in list_partitions(bind)
+        if (since is None or partition.end > since) and (until is None or partition.start < until)
+    ]
+
+
+class LogPartitions:
+    """Rotazione della partizione calda e retention delle partizioni d'archivio"""
+
+    def __init__(self):
+        self.period = 'month'
+        self.hot_periods = 2
+        self.retention_periods = 0
+
+    def init_app(self, app):
+        """
+        Config:
+            LOG_PARTITION_PERIOD (str): 'day' o 'month'
+            LOG_HOT_PERIODS (int): periodi tenuti in logs (minimo 2)
+            LOG_RETENTION_PERIODS (int): periodi conservati in totale, 0 = tutti
+        """
+        period = app.config.get('LOG_PARTITION_PERIOD', self.period)
+        if period not in PERIODS:
+            raise ValueError(f'Periodo di partizione non valido: {period}')
+        hot_periods = app.config.get('LOG_HOT_PERIODS', self.hot_periods)
+        retention_periods = app.config.get('LOG_RETENTION_PERIODS', self.retention_periods)
+        if hot_periods < 2:
+            raise ValueError('LOG_HOT_PERIODS deve essere almeno 2 (un periodo completo più quello in corso)')
+        if retention_periods and retention_periods < hot_periods:
+            raise ValueError('LOG_RETENTION_PERIODS non può essere minore di LOG_HOT_PERIODS')
+        self.period = period
+        self.hot_periods = hot_periods
+        self.retention_periods = retention_periods
+
+    def hot_start(self, now=None):
+        """Inizio della partizione calda: i log precedenti vanno in archivio"""
+        start = period_start(now or datetime.now(), self.period)
+        for _ in range(self.hot_periods - 1):
+            start = previous_period(start, self.period)
+        return start
+
+    def rotate(self, connection, now=None):
+        """
+        Sposta da logs alle partizioni i log più vecchi della partizione calda
+
+        Returns:
+            dict: {nome partizione: log spostati}
+        """
+        if connection.dialect.name != 'sqlite':
+            return {}
+        hot_start = self.hot_start(now).strftime(_TIMESTAMP_FORMAT)
+        moved = {}
+        with log_triggers_paused(connection):
+            while True:
+                # Solo i periodi che hanno log: nessuna partizione vuota per i buchi nello storico
+                oldest = connection.exec_driver_sql(
+                    'SELECT min(timestamp) FROM logs WHERE timestamp < ?', (hot_start,)
+                ).scalar()
+                if oldest is None:
+                    break
+                partition = partition_for(period_start(datetime.fromisoformat(oldest), self.period), self.period)
+                bounds = (partition.start.strftime(_TIMESTAMP_FORMAT), partition.end.strftime(_TIMESTAMP_FORMAT))
+                partition.table.create(bind=connection, checkfirst=True)
+                connection.exec_driver_sql(
+                    f'INSERT INTO {partition.name} ({_COLUMNS}) SELECT {_COLUMNS} FROM logs '
+                    'WHERE timestamp >= ? AND timestamp < ?', bounds
+                )
+                moved[partition.name] = connection.exec_driver_sql(
+                    'DELETE FROM logs WHERE timestamp >= ? AND timestamp < ?', bounds
+                ).rowcount
+        return moved
+
+    def retention_cutoff(self, now=None):
+        """Inizio del periodo più vecchio conservato, None senza retention"""
+        if not self.retention_periods:
+            return None
+        cutoff = period_start(now or datetime.now(), self.period)
+        for _ in range(self.retention_periods - 1):
+            cutoff = previous_period(cutoff, self.period)
+        return cutoff
+
+    def drop_expired(self, connection, now=None):
+        """
+        Elimina le partizioni oltre LOG_RETENTION_PERIODS (DROP TABLE, non DELETE)
+
+        Returns:
+            list: nomi delle partizioni eliminate
+        """
+        cutoff = self.retention_cutoff(now)
+        if cutoff is None:
+            return []
+        expired = [partition for partition in list_partitions(connection) if partition.end <= cutoff]
+        for partition in expired:
+            self.drop(connection, partition)
+        return [partition.name for partition in expired]
+
+    def drop(self, connection, partition):
+        """Elimina una partizione e i suoi conteggi di rollup"""
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS {partition.name}')
+        delete_rollup_range(connection, partition.start, partition.end)
+
+    def clear(self, connection):
+        """
+        Elimina tutti i log in tabella: partizioni d'archivio, logs, indice di
+        ricerca e conteggi di rollup, nella transazione del chiamante
+
+        SQLite svuota una tabella senza visitarne le righe solo se non ha
+        trigger: quelli di logs (rollup e ricerca) vengono tolti e ricreati con
+        la stessa definizione, invece di aggiornare conteggi e indice riga per riga.
+
+        Returns:
+            int: log eliminati da logs
+        """
+        for partition in list_partitions(connection):
+            connection.exec_driver_sql(f'DROP TABLE {partition.name}')
+        triggers = connection.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'logs'"
+        ).all() if connection.dialect.name == 'sqlite' else []
+        for name, _ in triggers:
+            connection.exec_driver_sql(f'DROP TRIGGER {name}')
+        count = connection.exec_driver_sql('DELETE FROM logs').rowcount
+        if search_available(connection):
+            connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('delete-all')")
+        clear_rollups(connection)
+        for _, statement in triggers:
+            connection.exec_driver_sql(statement)
+        return count
+
+    def maintain(self, connection, now=None):
+        """
+        Rotazione + retention, eseguite all'avvio e periodicamente da model.maintenance
+
+        Returns:
+            tuple: (log spostati per partizione, partizioni eliminate)
+        """
+        return self.rotate(connection, now), self.drop_expired(connection, now)
+
+
+# Istanza configurata dall'app, usata da db_utils e dall'avvio del server
+log_partitions = LogPartitions()
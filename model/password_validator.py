@@ -3,6 +3,8 @@ Password Validator - Controllo forza password
 """
 import re
 
+from .breached_passwords import breached_passwords
+
 class PasswordValidator:
     """
     Classe per validare la forza delle password
@@ -51,6 +53,10 @@ class PasswordValidator:
         if username and username.lower() in password.lower():
             errors.append('La password non deve contenere il tuo username')
         
+        # Elenco locale di password compromesse (vedi build_password_index.py)
+        if breached_passwords.contains(password):
+            errors.append('Questa password compare in elenchi di password compromesse, scegline un\'altra')
+        
         return {
             'is_strong': len(errors) == 0,
             'errors': errors
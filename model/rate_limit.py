@@ -0,0 +1,268 @@
+"""
+Rate Limit - Limite dei tentativi di login per IP e per username (GCRA)
+
+Ogni chiave ha un solo valore salvato, il TAT (theoretical arrival time): il
+momento in cui la chiave tornerebbe "a riposo" se non arrivassero altri
+tentativi. Con 'limit' tentativi per 'period' secondi ogni tentativo sposta il
+TAT avanti di period/limit; un tentativo è rifiutato se il TAT supera 'now' di
+più di period - period/limit (cioè se il burst di 'limit' tentativi è esaurito).
+
+Lo storage è intercambiabile:
+- MemoryStorage: dizionario nel processo (default, un solo worker)
+- SQLiteStorage: file SQLite condiviso tra più worker/processi
+"""
+import sqlite3
+import threading
+import time
+
+from .cache import TTLCache
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    Converte '5/minute' (o '5/60') in (tentativi, secondi)
+
+    Returns:
+        tuple: (limit, period)
+    """
+    try:
+        count, period = rate.split('/')
+        limit = int(count)
+        seconds = PERIODS[period.strip()] if period.strip() in PERIODS else float(period)
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f'Rate non valido: {rate!r} (atteso es. "5/minute")') from e
+    if limit <= 0 or seconds <= 0:
+        raise ValueError(f'Rate non valido: {rate!r}')
+    return limit, seconds
+
+
+class MemoryStorage:
+    """TAT per chiave in un dizionario del processo"""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+        self._updates = 0
+
+    def update(self, key, now, step):
+        """
+        Applica atomicamente 'step' al TAT della chiave
+
+        'step(tat)' riceve il TAT salvato (None se assente) e restituisce
+        (nuovo TAT o None per lasciarlo invariato, risultato).
+        """
+        with self._lock:
+            new_tat, result = step(self._tats.get(key))
+            if new_tat is not None:
+                self._tats[key] = new_tat
+                self._updates += 1
+                if self._updates % self.SWEEP_EVERY == 0:
+                    self._sweep(now)
+            return result
+
+    def _sweep(self, now):
+        # Le chiavi col TAT passato equivalgono a chiavi assenti
+        for key in [key for key, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class SQLiteStorage:
+    """
+    TAT per chiave in un file SQLite, condiviso da tutti i processi che lo aprono
+
+    Ogni update è una transazione BEGIN IMMEDIATE (lettura + scrittura
+    serializzate tra i processi). Una connessione per thread.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._updates = 0
+        connection = self._connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # isolation_level=None: le transazioni sono gestite esplicitamente
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def update(self, key, now, step):
+        """Come MemoryStorage.update, in una transazione sul file condiviso"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            new_tat, result = step(row[0] if row else None)
+            if new_tat is not None:
+                connection.execute(
+                    'INSERT INTO rate_limits (key, tat) VALUES (?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET tat = excluded.tat',
+                    (key, new_tat)
+                )
+                self._updates += 1
+                if self._updates % self.SWEEP_EVERY == 0:
+                    connection.execute('DELETE FROM rate_limits WHERE tat <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+
+def create_storage(url):
+    """
+    Args:
+        url (str): 'memory' oppure 'sqlite:///percorso/file.db'
+    """
+    if url == 'memory':
+        return MemoryStorage()
+    if url.startswith('sqlite:///'):
+        return SQLiteStorage(url[len('sqlite:///'):])
+    raise ValueError(f'Storage del rate limiter non supportato: {url}')
+
+
+class GCRALimit:
+    """Limite 'limit' tentativi ogni 'period' secondi su uno storage condiviso"""
+
+    def __init__(self, storage, name, limit, period):
+        self.storage = storage
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.interval = period / limit
+        self.tolerance = period - self.interval
+        self.allowed = 0
+        self.rejected = 0
+
+    def _key(self, key):
+        return f'{self.name}:{key}'
+
+    def hit(self, key):
+        """
+        Registra un tentativo per 'key' se c'è ancora spazio
+
+        Returns:
+            float: 0 se consentito, altrimenti secondi da attendere (il tentativo non viene contato)
+        """
+        now = time.time()
+
+        def step(tat):
+            tat = max(tat or now, now)
+            wait = tat - now - self.tolerance
+            if wait > 0:
+                return None, wait
+            return tat + self.interval, 0.0
+
+        retry_after = self.storage.update(self._key(key), now, step)
+        if retry_after:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def refund(self, key):
+        """Restituisce un tentativo registrato da hit (es. login riuscito)"""
+        now = time.time()
+
+        def step(tat):
+            if tat is None or tat <= now:
+                return None, None
+            return max(tat - self.interval, now), None
+
+        self.storage.update(self._key(key), now, step)
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'period': self.period,
+            'allowed': self.allowed,
+            'rejected': self.rejected
+        }
+
+
+class LoginRateLimiter:
+    """
+    Limiti del path di login, controllati prima di validazione, query e bcrypt.
+
+    - per IP: ogni tentativo consuma un gettone
+    - per username: anche qui il gettone si prenota nello stesso update
+      atomico del controllo, così N tentativi in parallelo sullo stesso
+      username non passano tutti prima che il primo fallisca; un login
+      riuscito lo restituisce (record_success) e non avvicina l'utente al blocco
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.by_ip = None
+        self.by_username = None
+        self._reported = None
+
+    def init_app(self, app):
+        """
+        Config:
+            LOGIN_RATE_LIMIT (bool): attiva il limiter
+            LOGIN_RATE_LIMIT_IP (str): tentativi per IP, es. '20/minute'
+            LOGIN_RATE_LIMIT_USERNAME (str): tentativi falliti per username, es. '5/minute'
+            RATE_LIMIT_STORAGE (str): 'memory' o 'sqlite:///percorso' per più worker
+        """
+        self.enabled = app.config.get('LOGIN_RATE_LIMIT', True)
+        if not self.enabled:
+            return
+        storage = create_storage(app.config.get('RATE_LIMIT_STORAGE', 'memory'))
+        ip_limit, ip_period = parse_rate(app.config.get('LOGIN_RATE_LIMIT_IP', '20/minute'))
+        user_limit, user_period = parse_rate(app.config.get('LOGIN_RATE_LIMIT_USERNAME', '5/minute'))
+        self.by_ip = GCRALimit(storage, 'ip', ip_limit, ip_period)
+        self.by_username = GCRALimit(storage, 'user', user_limit, user_period)
+        self._reported = TTLCache(max_entries=10000, ttl=max(ip_period, user_period))
+
+    def check_attempt(self, ip, username):
+        """
+        Returns:
+            tuple: (secondi da attendere, 0 se il tentativo può procedere;
+                    True se è il primo rifiuto della chiave nel periodo, da loggare)
+        """
+        if not self.enabled:
+            return 0.0, False
+        blocked = ('ip', ip)
+        retry_after = self.by_ip.hit(ip or '')
+        if not retry_after and username:
+            blocked = ('user', username[:80])
+            retry_after = self.by_username.hit(username[:80])
+        if not retry_after:
+            return 0.0, False
+        # Un solo evento di log per chiave bloccata e periodo, non uno per tentativo
+        report = not self._reported.get(blocked)
+        if report:
+            self._reported.set(blocked, True)
+        return retry_after, report
+
+    def record_success(self, username):
+        """Restituisce il tentativo prenotato da check_attempt per un login riuscito"""
+        if self.enabled and username:
+            self.by_username.refund(username[:80])
+
+    def stats(self):
+        if not self.enabled:
+            return None
+        return {'ip': self.by_ip.stats(), 'username': self.by_username.stats()}
+
+
+# Istanza usata dalla route /login, configurata da init_app
+login_limiter = LoginRateLimiter()
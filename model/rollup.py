@@ -0,0 +1,428 @@
+"""
+Rollup - Conteggi dei log per minuto e per ora, aggiornati a ogni inserimento
+
+Le tabelle log_counts_minute e log_counts_hour contengono il numero di eventi
+per (bucket, type, ip, is_error); log_counts_hour_totals lo stesso per ora
+senza l'IP. Trigger SQLite su logs le tengono allineate a ogni
+insert/update/delete, qualunque sia il percorso di scrittura (create_log,
+batch del log writer, script).
+
+Grafici e statistiche leggono queste tabelle invece di logs. I totali orari
+crescono solo con ore e tipi; le tabelle con l'IP anche con gli IP attivi in
+ogni ora, e si usano quando serve l'IP (filtro o top IP).
+
+La tabella per minuto serve per le finestre recenti e va compattata con
+prune_minute_counts; quelle per ora coprono tutto lo storico.
+
+Le righe spostate da logs alle partizioni d'archivio (model.partitions) restano
+contate: lo spostamento avviene dentro log_triggers_paused, e i conteggi vengono
+tolti solo quando la partizione viene eliminata (delete_rollup_range).
+Anche gli insert a blocchi (model.ingest) sospendono i trigger e aggiornano i
+conteggi una volta per blocco con add_rollup_counts.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, case, cast, func
+from sqlalchemy.exc import OperationalError
+
+from . import db
+
+# Ore di dettaglio per minuto ricostruite dallo storico e mantenute da prune_minute_counts
+MINUTE_RETENTION_HOURS = 48
+
+# Stesso formato con cui SQLAlchemy salva i DateTime su SQLite, così i confronti
+# tra bucket e datetime passati come parametri restano coerenti
+_BUCKET_FORMATS = {
+    'log_counts_minute': '%Y-%m-%d %H:%M:00.000000',
+    'log_counts_hour': '%Y-%m-%d %H:00:00.000000',
+    'log_counts_hour_totals': '%Y-%m-%d %H:00:00.000000',
+}
+
+# Colonne di raggruppamento oltre al bucket
+_KEYS = {
+    'log_counts_minute': ('type', 'ip', 'is_error'),
+    'log_counts_hour': ('type', 'ip', 'is_error'),
+    'log_counts_hour_totals': ('type', 'is_error'),
+}
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class LogCountMinute(db.Model):
+    __tablename__ = 'log_counts_minute'
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    type = db.Column(db.String(50), primary_key=True)
+    ip = db.Column(db.String(45), primary_key=True)
+    is_error = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LogCountHour(db.Model):
+    __tablename__ = 'log_counts_hour'
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    type = db.Column(db.String(50), primary_key=True)
+    ip = db.Column(db.String(45), primary_key=True)
+    is_error = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LogCountHourTotal(db.Model):
+    __tablename__ = 'log_counts_hour_totals'
+    __table_args__ = (
+        # Tipi distinti per i filtri di /logs (search.matching_types)
+        db.Index('ix_log_counts_hour_totals_type', 'type'),
+    )
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    type = db.Column(db.String(50), primary_key=True)
+    is_error = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LogDataVersion(db.Model):
+    """Riga unica incrementata dai trigger a ogni modifica di logs (ETag delle API)"""
+    __tablename__ = 'log_data_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+ROLLUP_MODELS = (LogCountMinute, LogCountHour, LogCountHourTotal, LogDataVersion)
+
+_BUMP_VERSION = 'UPDATE log_data_version SET version = version + 1 WHERE id = 1;'
+
+# Riga unica: 1 mentre i log vengono spostati in archivio o inseriti a blocchi
+# (vedi log_triggers_paused)
+_PAUSE_DDL = 'CREATE TABLE IF NOT EXISTS log_rollup_pause (id INTEGER PRIMARY KEY, paused INTEGER NOT NULL)'
+_NOT_PAUSED = 'WHEN (SELECT paused FROM log_rollup_pause WHERE id = 1) = 0'
+
+
+def _increment(table, row):
+    keys = _KEYS[table]
+    return f"""INSERT INTO {table} (bucket, {', '.join(keys)}, count)
+        VALUES (strftime('{_BUCKET_FORMATS[table]}', {row}.timestamp), {', '.join(f'{row}.{k}' for k in keys)}, 1)
+        ON CONFLICT (bucket, {', '.join(keys)}) DO UPDATE SET count = count + 1;"""
+
+
+def _decrement(table, row):
+    key = ' AND '.join(
+        [f"bucket = strftime('{_BUCKET_FORMATS[table]}', {row}.timestamp)"] +
+        [f'{k} = {row}.{k}' for k in _KEYS[table]]
+    )
+    return f"""UPDATE {table} SET count = count - 1 WHERE {key};
+        DELETE FROM {table} WHERE {key} AND count <= 0;"""
+
+
+def _trigger_ddl():
+    """
+    Returns:
+        dict: {nome trigger: CREATE TRIGGER} nella forma salvata in sqlite_master
+    """
+    tables = list(_BUCKET_FORMATS)
+    inserted = '\n'.join(_increment(table, 'new') for table in tables)
+    deleted = '\n'.join(_decrement(table, 'old') for table in tables)
+    return {
+        'log_counts_ai': f"""CREATE TRIGGER log_counts_ai AFTER INSERT ON logs {_NOT_PAUSED}
+            BEGIN {inserted} {_BUMP_VERSION} END""",
+        'log_counts_ad': f"""CREATE TRIGGER log_counts_ad AFTER DELETE ON logs {_NOT_PAUSED}
+            BEGIN {deleted} {_BUMP_VERSION} END""",
+        'log_counts_au': f"""CREATE TRIGGER log_counts_au AFTER UPDATE OF timestamp, type, ip, is_error ON logs
+            BEGIN {deleted} {inserted} {_BUMP_VERSION} END""",
+    }
+
+
+def rebuild_rollups(connection, minute_hours=MINUTE_RETENTION_HOURS):
+    """Ricalcola le tabelle di rollup dai log (per ora tutto, per minuto le ultime ore)"""
+    minute_since = (datetime.now() - timedelta(hours=minute_hours)).strftime(_TIMESTAMP_FORMAT)
+    for table in _BUCKET_FORMATS:
+        since = minute_since if table == 'log_counts_minute' else None
+        keys = ', '.join(_KEYS[table])
+        connection.exec_driver_sql(f'DELETE FROM {table}')
+        connection.exec_driver_sql(
+            f"""INSERT INTO {table} (bucket, {keys}, count)
+                SELECT strftime('{_BUCKET_FORMATS[table]}', timestamp), {keys}, count(*)
+                FROM logs {'WHERE timestamp >= ?' if since else ''}
+                GROUP BY 1, {keys}""",
+            (since,) if since else ()
+        )
+
+
+def ensure_rollups(connection):
+    """
+    Crea tabelle e trigger di rollup se mancano, ricalcolando dallo storico
+
+    I trigger la cui definizione è cambiata vengono ricreati.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    for model in ROLLUP_MODELS:
+        model.__table__.create(bind=connection, checkfirst=True)
+        for index in model.__table__.indexes:
+            index.create(bind=connection, checkfirst=True)
+    connection.exec_driver_sql('INSERT OR IGNORE INTO log_data_version (id, version) VALUES (1, 0)')
+    connection.exec_driver_sql(_PAUSE_DDL)
+    connection.exec_driver_sql('INSERT OR IGNORE INTO log_rollup_pause (id, paused) VALUES (1, 0)')
+
+    existing = dict(connection.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'log_counts_%'"
+    ).all())
+    for name, statement in _trigger_ddl().items():
+        if existing.get(name) == statement:
+            continue
+        if name in existing:
+            connection.exec_driver_sql(f'DROP TRIGGER {name}')
+        connection.exec_driver_sql(statement)
+    if 'log_counts_ai' not in existing:
+        rebuild_rollups(connection)
+
+
+def prune_minute_counts(connection, hours=MINUTE_RETENTION_HOURS):
+    """
+    Compatta la tabella per minuto eliminando i bucket più vecchi di 'hours'
+
+    Returns:
+        int: righe eliminate
+    """
+    since = (datetime.now() - timedelta(hours=hours)).strftime(_TIMESTAMP_FORMAT)
+    result = connection.exec_driver_sql('DELETE FROM log_counts_minute WHERE bucket < ?', (since,))
+    return result.rowcount
+
+
+@contextmanager
+def log_triggers_paused(connection):
+    """
+    Sospende i trigger derivati su logs: le righe cancellate dentro il blocco
+    restano nei conteggi, quelle inserite non vengono contate né indicizzate
+    (chi inserisce usa add_rollup_counts e search.index_logs)
+
+    Da usare nella stessa transazione dello spostamento o dell'insert: gli altri
+    processi non vedono mai il flag acceso.
+    """
+    connection.exec_driver_sql('UPDATE log_rollup_pause SET paused = 1 WHERE id = 1')
+    try:
+        yield
+    finally:
+        connection.exec_driver_sql('UPDATE log_rollup_pause SET paused = 0 WHERE id = 1')
+
+
+def add_rollup_counts(connection, rows):
+    """
+    Conta nei rollup le righe inserite dentro log_triggers_paused: un upsert per
+    bucket e chiave invece dei tre per riga dei trigger
+
+    Args:
+        rows: dict con timestamp, type, ip e is_error
+    """
+    # Un solo strftime per riga: i bucket orari sono un prefisso di quelli per minuto
+    minutes = [row['timestamp'].strftime('%Y-%m-%d %H:%M') for row in rows]
+    for table, keys in _KEYS.items():
+        suffix = ':00.000000' if table == 'log_counts_minute' else ':00:00.000000'
+        length = 16 if table == 'log_counts_minute' else 13
+        counts = {}
+        for minute, row in zip(minutes, rows):
+            key = (minute[:length] + suffix,) + tuple(row[k] for k in keys)
+            counts[key] = counts.get(key, 0) + 1
+        connection.exec_driver_sql(
+            f"""INSERT INTO {table} (bucket, {', '.join(keys)}, count) VALUES (?, {', '.join('?' for _ in keys)}, ?)
+                ON CONFLICT (bucket, {', '.join(keys)}) DO UPDATE SET count = count + excluded.count""",
+            [key + (count,) for key, count in counts.items()]
+        )
+    connection.exec_driver_sql(_BUMP_VERSION)
+
+
+def delete_rollup_range(connection, since, until):
+    """
+    Toglie dai conteggi i bucket in [since, until), es. di una partizione eliminata
+
+    Returns:
+        int: righe di rollup eliminate
+    """
+    bounds = (since.strftime(_TIMESTAMP_FORMAT), until.strftime(_TIMESTAMP_FORMAT))
+    removed = 0
+    for table in _BUCKET_FORMATS:
+        result = connection.exec_driver_sql(f'DELETE FROM {table} WHERE bucket >= ? AND bucket < ?', bounds)
+        removed += result.rowcount
+    connection.exec_driver_sql(_BUMP_VERSION)
+    return removed
+
+
+def clear_rollups(connection):
+    """Azzera tutti i conteggi (tutti i log eliminati, vedi LogPartitions.clear)"""
+    for table in _BUCKET_FORMATS:
+        connection.exec_driver_sql(f'DELETE FROM {table}')
+    connection.exec_driver_sql(_BUMP_VERSION)
+
+
+# -------------------------------
+# Letture
+# -------------------------------
+
+def data_version(session):
+    """
+    Contatore delle modifiche a logs, o None se le tabelle di rollup mancano
+
+    Cambia a ogni insert/update/delete: due letture con la stessa versione
+    vedono gli stessi log.
+    """
+    try:
+        return session.query(LogDataVersion.version).filter(LogDataVersion.id == 1).scalar()
+    except OperationalError:
+        session.rollback()
+        return None
+
+
+def _hourly(ip_like=None, **filters):
+    """Tabella oraria più piccola che risponde ai filtri: i totali se non serve l'IP"""
+    return LogCountHour if ip_like else LogCountHourTotal
+
+
+def _filtered(query, model, types=None, ip_like=None, is_error=None, since=None, until=None):
+    if types is not None:
+        query = query.filter(model.type.in_(types))
+    if ip_like:
+        query = query.filter(model.ip.like(ip_like))
+    if is_error is not None:
+        query = query.filter(model.is_error == is_error)
+    if since is not None:
+        query = query.filter(model.bucket >= since)
+    if until is not None:
+        query = query.filter(model.bucket < until)
+    return query
+
+
+def rollup_summary(session, **filters):
+    """
+    Totali per tipo dalle tabelle orarie, stesso formato di summarize_logs
+
+    Args:
+        filters: types (lista di tipi), ip_like (pattern LIKE), is_error,
+            since/until (limiti allineati all'ora)
+    """
+    model = _hourly(**filters)
+    rows = _filtered(session.query(
+        model.type,
+        func.sum(model.count),
+        func.sum(case((model.is_error == True, model.count), else_=0))
+    ), model, **filters).group_by(model.type).all()
+
+    by_type = {log_type: count for log_type, count, _ in rows}
+    return {
+        'total': sum(by_type.values()),
+        'errors': sum(errors or 0 for _, _, errors in rows),
+        'by_type': by_type
+    }
+
+
+CHARTS = ('types', 'top_ips', 'by_hour')
+
+
+def rollup_charts(session, charts=CHARTS, top_types=8, top_ips=10, **filters):
+    """
+    Dati dei grafici della dashboard dalle tabelle orarie
+
+    Args:
+        charts: grafici da calcolare, sottoinsieme di CHARTS
+
+    Returns:
+        dict: types [(tipo, n)], top_ips [(ip, n)], by_hour [n per ora del giorno 0-23]
+    """
+    model = _hourly(**filters)
+    total = func.sum(model.count)
+    result = {}
+
+    if 'types' in charts:
+        types = _filtered(session.query(model.type, total), model, **filters) \
+            .group_by(model.type).order_by(total.desc()).limit(top_types).all()
+        result['types'] = [(log_type, count) for log_type, count in types]
+
+    if 'top_ips' in charts:
+        ip_total = func.sum(LogCountHour.count)
+        ips = _filtered(session.query(LogCountHour.ip, ip_total), LogCountHour, **filters) \
+            .group_by(LogCountHour.ip).order_by(ip_total.desc()).limit(top_ips).all()
+        result['top_ips'] = [(ip, count) for ip, count in ips]
+
+    if 'by_hour' in charts:
+        hour_of_day = cast(func.strftime('%H', model.bucket), Integer)
+        by_hour = [0] * 24
+        for hour, count in _filtered(session.query(hour_of_day, total), model, **filters) \
+                .group_by(hour_of_day).all():
+            by_hour[hour] = count
+        result['by_hour'] = by_hour
+
+    return result
+
+
+def timeline(session, since, resolution='minute', **filters):
+    """
+    Eventi per bucket a partire da 'since'
+
+    Args:
+        resolution: 'minute' (ultime MINUTE_RETENTION_HOURS ore) o 'hour'
+
+    Returns:
+        list: [(bucket, eventi, errori)] in ordine cronologico
+    """
+    model = LogCountMinute if resolution == 'minute' else _hourly(**filters)
+    return [tuple(row) for row in _filtered(session.query(
+        model.bucket,
+        func.sum(model.count),
+        func.sum(case((model.is_error == True, model.count), else_=0))
+    ), model, since=since, **filters).group_by(model.bucket).order_by(model.bucket).all()]
+
+
+def log_charts(query, charts=CHARTS, top_types=8, top_ips=10, table=None):
+    """
+    Stessi dati di rollup_charts calcolati sui log di 'query'
+
+    Per i filtri che le tabelle di rollup non coprono (es. username).
+    'table' è la tabella interrogata da 'query' se non è logs (partizioni);
+    top_types/top_ips a None restituiscono tutti i gruppi (vedi merge_charts).
+    """
+    from .log import Log
+
+    columns = (table if table is not None else Log.__table__).c
+    query = query.order_by(None)
+    total = func.count(columns.id)
+    result = {}
+
+    if 'types' in charts:
+        types = query.with_entities(columns.type, total).group_by(columns.type) \
+            .order_by(total.desc()).limit(top_types).all()
+        result['types'] = [(log_type, count) for log_type, count in types]
+
+    if 'top_ips' in charts:
+        ips = query.with_entities(columns.ip, total).group_by(columns.ip) \
+            .order_by(total.desc()).limit(top_ips).all()
+        result['top_ips'] = [(ip, count) for ip, count in ips]
+
+    if 'by_hour' in charts:
+        hour_of_day = cast(func.strftime('%H', columns.timestamp), Integer)
+        by_hour = [0] * 24
+        for hour, count in query.with_entities(hour_of_day, total).group_by(hour_of_day).all():
+            by_hour[hour] = count
+        result['by_hour'] = by_hour
+
+    return result
+
+
+def merge_charts(results, top_types=8, top_ips=10):
+    """
+    Somma i risultati di log_charts (senza limiti) calcolati su più tabelle
+
+    Returns:
+        dict: stesso formato di log_charts, con i primi top_types/top_ips gruppi
+    """
+    merged = {}
+    for name, top in (('types', top_types), ('top_ips', top_ips)):
+        if not any(name in result for result in results):
+            continue
+        totals = {}
+        for result in results:
+            for key, count in result.get(name, ()):
+                totals[key] = totals.get(key, 0) + count
+        merged[name] = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    if any('by_hour' in result for result in results):
+        merged['by_hour'] = [sum(hours) for hours in zip(*(result['by_hour'] for result in results if 'by_hour' in result))]
+    return merged
@@ -0,0 +1,174 @@
+"""
+Search - Ricerca per sottostringa nei filtri dei log senza scansioni complete
+
+I filtri di /logs usano LIKE '%valore%', che non può sfruttare un indice B-tree.
+Qui ogni filtro viene risolto con la struttura adatta alla colonna:
+
+- ip: indice FTS5 trigram 'logs_search' (contenuto esterno su logs, tenuto
+  allineato da trigger su insert/update/delete), che risponde allo stesso LIKE
+  leggendo solo le righe che contengono i trigrammi cercati. Gli insert a
+  blocchi sospendono il trigger e indicizzano tutto insieme (index_logs)
+- type: i tipi distinti sono pochi e si leggono dai conteggi orari, che
+  coprono logs, partizioni e archivi su file, saltando da un tipo al
+  successivo nell'indice su type (una ricerca per tipo, senza statistiche del
+  planner); il LIKE si applica a quella lista e la query usa IN
+- username: il LIKE gira sulla tabella users, i log si filtrano per user_id
+
+Senza FTS5 (o su altri database) ip torna al LIKE sulla tabella logs.
+"""
+import re
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from .log import Log
+from .user import User
+
+SEARCH_TABLE = 'logs_search'
+
+# Il trigram indicizza sequenze di 3 caratteri: sotto questa lunghezza FTS5
+# scorrerebbe tutto l'indice, tanto vale il LIKE sulla tabella
+MIN_TRIGRAM_LENGTH = 3
+
+logs_search = table(SEARCH_TABLE, column('rowid'), column('ip'), column('type'))
+
+# Scansione a salti: ogni passo cerca il tipo successivo nell'indice invece di
+# leggere tutte le ore (SELECT DISTINCT salta solo con le statistiche di ANALYZE)
+DISTINCT_TYPES = text("""WITH RECURSIVE types(type) AS (
+        SELECT min(type) FROM log_counts_hour_totals
+        UNION ALL
+        SELECT (SELECT min(type) FROM log_counts_hour_totals WHERE type > types.type)
+        FROM types WHERE types.type IS NOT NULL
+    )
+    SELECT type FROM types WHERE type IS NOT NULL""")
+
+# Sospeso da rollup.log_triggers_paused durante gli insert a blocchi
+_INSERT_TRIGGER = f"""CREATE TRIGGER {SEARCH_TABLE}_ai AFTER INSERT ON logs
+        WHEN (SELECT paused FROM log_rollup_pause WHERE id = 1) = 0 BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, ip, type) VALUES (new.id, new.ip, new.type);
+    END"""
+
+_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        ip, type, content='logs', content_rowid='id', tokenize='trigram'
+    )""",
+    _INSERT_TRIGGER,
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON logs BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, ip, type) VALUES ('delete', old.id, old.ip, old.type);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF ip, type ON logs BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, ip, type) VALUES ('delete', old.id, old.ip, old.type);
+        INSERT INTO {SEARCH_TABLE}(rowid, ip, type) VALUES (new.id, new.ip, new.type);
+    END""",
+]
+
+# Disponibilità dell'indice per engine (l'URL identifica il file)
+_available = {}
+
+
+def ensure_search_index(connection):
+    """Crea l'indice FTS5 e i trigger se mancano, indicizzando i log esistenti"""
+    if connection.dialect.name != 'sqlite':
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).first()
+    if exists:
+        # Trigger di insert creato prima che esistesse la sospensione
+        current = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f'{SEARCH_TABLE}_ai',)
+        ).scalar()
+        if current != _INSERT_TRIGGER:
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_ai')
+            connection.exec_driver_sql(_INSERT_TRIGGER)
+        return
+    try:
+        for statement in _SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+    except OperationalError as e:
+        # SQLite compilato senza FTS5 o senza tokenizer trigram (< 3.34)
+        print(f"⚠️  Indice di ricerca non disponibile, filtri con LIKE: {e}")
+        return
+    connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    _available.clear()
+
+
+def index_logs(connection, after_id):
+    """Indicizza i log con id > after_id inseriti a trigger sospesi (un solo INSERT ... SELECT)"""
+    if not search_available(connection):
+        return
+    connection.exec_driver_sql(
+        f'INSERT INTO {SEARCH_TABLE}(rowid, ip, type) SELECT id, ip, type FROM logs WHERE id > ?', (after_id,)
+    )
+
+
+def search_available(session):
+    """Vero se il database della sessione (o connessione) ha l'indice 'logs_search'"""
+    engine = session.get_bind() if hasattr(session, 'get_bind') else session.engine
+    key = str(engine.url)
+    if key not in _available:
+        if engine.dialect.name != 'sqlite':
+            _available[key] = False
+        else:
+            _available[key] = session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': SEARCH_TABLE}
+            ).first() is not None
+    return _available[key]
+
+
+def _like_regex(pattern):
+    """Espressione regolare equivalente al LIKE di SQLite (% _ e maiuscole ASCII)"""
+    parts = ['.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern]
+    return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def matching_types(session, value):
+    """
+    Tipi di log presenti che soddisfano type LIKE '%value%'
+
+    I tipi vengono dai conteggi orari, che coprono logs, partizioni e archivi
+    su file: un tipo rimasto solo nei periodi archiviati resta filtrabile.
+    """
+    regex = _like_regex(f'%{value}%')
+    return [log_type for (log_type,) in session.execute(DISTINCT_TYPES) if regex.fullmatch(log_type)]
+
+
+def filter_logs(query, session, filter_type='', filter_ip='', filter_user='', table=None):
+    """
+    Applica i filtri per sottostringa di /logs con la stessa semantica di LIKE '%valore%'
+
+    Args:
+        query: query su Log o righe di log (log_rows_query)
+        session: sessione su cui gira la query
+        filter_type, filter_ip, filter_user: valori dei filtri ('' = nessun filtro)
+        table: partizione d'archivio interrogata da 'query' (None = logs); le
+            partizioni non hanno indice trigram e usano LIKE
+
+    Returns:
+        La query filtrata
+    """
+    columns = (table if table is not None else Log.__table__).c
+
+    if filter_type:
+        if table is None:
+            query = query.filter(columns.type.in_(matching_types(session, filter_type)))
+        else:
+            # I tipi distinti si leggono da logs: nell'archivio possono essercene altri
+            query = query.filter(columns.type.like(f'%{filter_type}%'))
+
+    if filter_ip:
+        pattern = f'%{filter_ip}%'
+        if table is None and len(filter_ip) >= MIN_TRIGRAM_LENGTH and search_available(session):
+            query = query.filter(columns.id.in_(
+                select(logs_search.c.rowid).where(logs_search.c.ip.like(pattern))
+            ))
+        else:
+            query = query.filter(columns.ip.like(pattern))
+
+    if filter_user:
+        query = query.filter(columns.user_id.in_(
+            select(User.id).where(User.username.like(f'%{filter_user}%'))
+        ))
+
+    return query
@@ -0,0 +1,103 @@
+"""
+Storage - Profili di tuning SQLite e pool di sola lettura per la dashboard
+"""
+import sqlite3
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from . import db
+
+# Profili selezionabili con SQLITE_PROFILE; SQLITE_PRAGMAS sovrascrive le singole voci
+SQLITE_PROFILES = {
+    # Impostazioni di fabbrica di SQLite (journal rollback, fsync a ogni commit)
+    'default': {},
+    # Lettori e scrittore non si bloccano a vicenda, un fsync per checkpoint
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,         # ms di attesa su lock invece di errore immediato
+        'cache_size': -20000,         # valore negativo = KiB (circa 20 MB)
+        'mmap_size': 268435456,       # 256 MB di file mappati in memoria
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Pragma che riguardano il file e non la connessione: non si applicano in sola lettura
+_FILE_PRAGMAS = {'journal_mode'}
+
+_readonly_engine = None
+_readonly_session = None
+
+
+def _pragma_hook(pragmas):
+    """Crea il listener 'connect' che applica i pragma a ogni nuova connessione"""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def init_storage(app):
+    """
+    Applica il profilo SQLite configurato e, se richiesto, apre il pool di sola lettura
+
+    Config:
+        SQLITE_PROFILE (str): nome del profilo in SQLITE_PROFILES
+        SQLITE_PRAGMAS (dict): pragma aggiuntivi o da sovrascrivere
+        SQLITE_READONLY_POOL (bool): pool separato per dashboard e analyzer
+        SQLITE_READONLY_POOL_SIZE (int): connessioni del pool di sola lettura
+    """
+    global _readonly_engine, _readonly_session
+
+    profile = app.config.get('SQLITE_PROFILE', 'default')
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f'Profilo SQLite sconosciuto: {profile}')
+    pragmas = dict(SQLITE_PROFILES[profile])
+    pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    event.listen(engine, 'connect', _pragma_hook(pragmas))
+
+    database = engine.url.database
+    if not app.config.get('SQLITE_READONLY_POOL') or not database or database == ':memory:':
+        return
+
+    readonly_pragmas = {k: v for k, v in pragmas.items() if k not in _FILE_PRAGMAS}
+    readonly_pragmas['query_only'] = 'ON'
+
+    def connect_readonly():
+        return sqlite3.connect(f'file:{database}?mode=ro', uri=True, check_same_thread=False)
+
+    _readonly_engine = create_engine(
+        'sqlite://',
+        creator=connect_readonly,
+        poolclass=QueuePool,
+        pool_size=app.config.get('SQLITE_READONLY_POOL_SIZE', 5),
+        max_overflow=app.config.get('SQLITE_READONLY_POOL_SIZE', 5)
+    )
+    event.listen(_readonly_engine, 'connect', _pragma_hook(readonly_pragmas))
+    _readonly_session = scoped_session(sessionmaker(bind=_readonly_engine))
+
+    @app.teardown_appcontext
+    def remove_readonly_session(exception=None):
+        _readonly_session.remove()
+
+
+def read_session():
+    """
+    Sessione per le query di sola lettura (dashboard, analyzer)
+
+    Returns:
+        Session: sessione sul pool di sola lettura se attivo, altrimenti db.session
+    """
+    if _readonly_session is not None:
+        return _readonly_session
+    return db.session
@@ -1,6 +1,9 @@
 from datetime import datetime
 from flask_login import UserMixin
-from . import db, bcrypt
+from . import db
+from .cache import TTLCache
+from .hashing import HashingOverloaded, hashing_pool
+from .username_filter import username_filter
 
 
 class User(UserMixin, db.Model):
@@ -17,7 +20,96 @@ class User(UserMixin, db.Model):
 
     # Optional helper method
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password, password)
+        # Runs on the bounded bcrypt pool; raises HashingOverloaded when it is saturated
+        if not hashing_pool.check(self.password, password):
+            return False
+        if hashing_pool.needs_rehash(self.password):
+            self.rehash_password(password)
+        return True
+
+    def rehash_password(self, password):
+        """Re-hash with the configured cost after the plaintext was verified."""
+        try:
+            self.password = hashing_pool.generate(password)
+            db.session.commit()
+        except HashingOverloaded:
+            # Best effort: the old hash stays valid, retry at the next login
+            pass
+        except Exception:
+            db.session.rollback()
+
+
+class UserIdentity(UserMixin):
+    """Detached, read-only view of a user used as Flask-Login's current_user.
+
+    Carries only what requests read on every hit; code that needs the password
+    or wants to modify the user must load the ORM object with get_user_by_id.
+    """
+
+    __slots__ = ('id', 'username', 'is_admin', 'created_at')
+
+    def __init__(self, id, username, is_admin, created_at):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f'<UserIdentity {self.username}>'
+
+
+# -----------------------
+# Identity cache (per process, disabled by default: see enable_identity_cache)
+# -----------------------
+
+_identity_cache = None
+
+
+def enable_identity_cache(ttl=60, max_entries=10000):
+    """Cache user identities for 'ttl' seconds so load_identity skips the DB.
+
+    Invalidation is local to the process: with several workers a change made
+    elsewhere becomes visible here within 'ttl' seconds.
+    """
+    global _identity_cache
+    _identity_cache = TTLCache(max_entries, ttl)
+
+
+def disable_identity_cache():
+    global _identity_cache
+    _identity_cache = None
+
+
+def identity_cache_stats():
+    """Return hit/miss counters, or None when the cache is disabled."""
+    return _identity_cache.stats() if _identity_cache is not None else None
+
+
+def invalidate_identity(user_id):
+    """Drop a cached identity after the user was modified or deleted."""
+    if _identity_cache is not None:
+        _identity_cache.delete(int(user_id))
+
+
+def load_identity(user_id):
+    """Return the UserIdentity for user_id (cached when enabled), or None."""
+    user_id = int(user_id)
+    cache = _identity_cache
+    if cache is not None:
+        identity = cache.get(user_id)
+        if identity is not None:
+            return identity
+
+    row = db.session.execute(
+        db.select(User.id, User.username, User.is_admin, User.created_at).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+
+    identity = UserIdentity(*row)
+    if cache is not None:
+        cache.set(user_id, identity)
+    return identity
 
 
 # -----------------------
@@ -26,16 +118,21 @@ class User(UserMixin, db.Model):
 
 def create_user(username, password, is_admin=False):
     """Create a new user with a hashed password."""
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = hashing_pool.generate(password)
     new_user = User(username=username, password=hashed_password, is_admin=is_admin)
     db.session.add(new_user)
     db.session.commit()
+    username_filter.add(username)
     return new_user
 
 
 def get_user_by_username(username):
-    """Retrieve a user by username."""
-    return User.query.filter_by(username=username).first()
+    """Retrieve a user by username (definite misses are answered by the username filter)."""
+    if not username_filter.might_exist(username):
+        return None
+    user = User.query.filter_by(username=username).first()
+    username_filter.record_lookup(user is not None)
+    return user
 
 
 def get_user_by_id(user_id):
@@ -54,6 +151,7 @@ def update_user(user_id, **kwargs):
             setattr(user, key, value)
 
     db.session.commit()
+    invalidate_identity(user_id)
     return user
 
 
@@ -63,5 +161,7 @@ def delete_user(user_id):
     if user:
         db.session.delete(user)
         db.session.commit()
+        invalidate_identity(user_id)
+        username_filter.discard(user.username)
         return True
     return False
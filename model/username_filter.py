@@ -0,0 +1,264 @@
+"""
+Username Filter - Filtro di Bloom sugli username per evitare query sicuramente inutili
+
+Login con username inesistenti (credential stuffing) e controllo duplicati in
+registrazione chiedono al database righe che non ci sono. Il filtro risponde
+"sicuramente assente" senza query; "forse presente" passa comunque dal
+database, quindi un falso positivo costa solo la query che si faceva già.
+
+Il filtro è in memoria per processo. Le modifiche fatte da altri processi
+arrivano tramite 'user_data_version', una riga incrementata da trigger a ogni
+insert o cambio di username: prima di confermare un "assente" il filtro
+rilegge la versione (una lettura per chiave primaria, molto meno della query
+su users) e aggiunge gli utenti nuovi. Le letture usano una connessione
+propria, così vedono i commit degli altri processi e un errore non annulla
+il lavoro in corso della sessione della richiesta.
+
+Le eliminazioni lasciano i bit accesi (il filtro resta corretto, sale solo il
+tasso di falsi positivi): rebuild() li azzera.
+"""
+import hashlib
+import math
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from . import db
+
+VERSION_TABLE = 'user_data_version'
+
+_BUMP_VERSION = f'UPDATE {VERSION_TABLE} SET version = version + 1 WHERE id = 1;'
+
+_VERSION_DDL = {
+    'users_version_ai': f"CREATE TRIGGER users_version_ai AFTER INSERT ON users BEGIN {_BUMP_VERSION} END",
+    'users_version_au': f"CREATE TRIGGER users_version_au AFTER UPDATE OF username ON users BEGIN {_BUMP_VERSION} END",
+}
+
+
+def ensure_user_version(connection):
+    """Crea la tabella 'user_data_version' e i trigger su users se mancano"""
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.exec_driver_sql(
+        f'CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)'
+    )
+    connection.exec_driver_sql(f'INSERT OR IGNORE INTO {VERSION_TABLE} (id, version) VALUES (1, 0)')
+    existing = {name for (name,) in connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'users_version_%'"
+    )}
+    for name, statement in _VERSION_DDL.items():
+        if name not in existing:
+            connection.exec_driver_sql(statement)
+
+
+class BloomFilter:
+    """
+    Filtro di Bloom con 'hashes' posizioni per elemento (double hashing su blake2b)
+
+    Dimensionato per 'capacity' elementi con probabilità di falso positivo 'error_rate'.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def expected_error_rate(self):
+        """Probabilità teorica di falso positivo con gli elementi inseriti"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class UsernameFilter:
+    """
+    Filtro degli username esistenti, costruito alla prima richiesta dalla tabella users.
+
+    Senza 'user_data_version' (database non SQLite o schema non aggiornato)
+    non può accorgersi delle modifiche altrui e risponde sempre "forse presente".
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.capacity = 100000
+        self.error_rate = 0.01
+        self._bloom = None
+        self._version = None
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+        # Contatori
+        self.lookups = 0
+        self.definite_misses = 0
+        self.positives = 0
+        self.false_positives = 0
+        self.stale = 0
+        self.syncs = 0
+        self.rebuilds = 0
+
+    def init_app(self, app):
+        """
+        Config:
+            USERNAME_FILTER (bool): attiva il filtro
+            USERNAME_FILTER_CAPACITY (int): username previsti (minimo, cresce col database)
+            USERNAME_FILTER_ERROR_RATE (float): tasso di falsi positivi a piena capacità
+        """
+        self.enabled = app.config.get('USERNAME_FILTER', True)
+        self.capacity = app.config.get('USERNAME_FILTER_CAPACITY', self.capacity)
+        self.error_rate = app.config.get('USERNAME_FILTER_ERROR_RATE', self.error_rate)
+        with self._lock:
+            self._bloom = None
+
+    def _read(self, session, after_id=None):
+        """
+        Versione e, se after_id non è None, utenti con id > after_id letti
+        nella stessa transazione, fuori dalla sessione della richiesta
+
+        Returns:
+            tuple: (versione o None se la tabella manca, righe (id, username))
+        """
+        try:
+            with session.get_bind().connect() as connection:
+                version = connection.execute(text(f'SELECT version FROM {VERSION_TABLE} WHERE id = 1')).scalar()
+                if version is None or after_id is None:
+                    return version, []
+                rows = connection.execute(
+                    text('SELECT id, username FROM users WHERE id > :after_id ORDER BY id'), {'after_id': after_id}
+                ).all()
+                return version, rows
+        except OperationalError:
+            return None, []
+
+    def rebuild(self, session=None):
+        """
+        Ricostruisce il filtro da zero (azzera i bit degli utenti eliminati)
+
+        Returns:
+            dict: statistiche del nuovo filtro
+        """
+        session = session or db.session
+        with self._lock:
+            self._rebuild(session)
+        return self.stats()
+
+    def _rebuild(self, session):
+        version, rows = self._read(session, after_id=0)
+        if version is None:
+            self._bloom = None
+            self._version = None
+            return
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for _, username in rows:
+            bloom.add(username)
+        self._bloom = bloom
+        self._version = version
+        self._last_id = rows[-1][0] if rows else 0
+        self.stale = 0
+        self.rebuilds += 1
+
+    def _sync(self, session):
+        """Aggiunge gli username inseriti altrove dall'ultima versione letta"""
+        self.syncs += 1
+        version, rows = self._read(session, self._last_id)
+        if version is None or version == self._version:
+            return
+        if len(rows) != version - self._version or self._bloom.count + len(rows) > self._bloom.capacity:
+            # Username rinominati, id riusati o filtro pieno: si riparte da capo
+            self._rebuild(session)
+            return
+        for _, username in rows:
+            self._bloom.add(username)
+        self._version = version
+        if rows:
+            self._last_id = rows[-1][0]
+
+    def might_exist(self, username, session=None):
+        """
+        Returns:
+            bool: False solo se lo username sicuramente non esiste
+        """
+        if not self.enabled or not username:
+            return True
+        session = session or db.session
+        self.lookups += 1
+
+        with self._lock:
+            if self._bloom is None:
+                self._rebuild(session)
+            if self._bloom is None:
+                return True
+            if username in self._bloom:
+                self.positives += 1
+                return True
+
+        # Un "assente" vale solo se nessun altro processo ha aggiunto utenti
+        version, _ = self._read(session)
+        with self._lock:
+            if version is None or self._bloom is None:
+                return True
+            if version != self._version:
+                self._sync(session)
+                if self._bloom is None or username in self._bloom:
+                    self.positives += 1
+                    return True
+
+        self.definite_misses += 1
+        return False
+
+    def record_lookup(self, found):
+        """Da chiamare dopo la query per un "forse presente": conta i falsi positivi"""
+        if self.enabled and not found:
+            self.false_positives += 1
+
+    def add(self, username):
+        """Username appena creato in questo processo"""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(username)
+
+    def discard(self, username):
+        """Username eliminato: i bit restano, conta solo per le statistiche"""
+        if self._bloom is not None:
+            self.stale += 1
+
+    def stats(self):
+        bloom = self._bloom
+        negatives = self.false_positives + self.definite_misses
+        return {
+            'enabled': self.enabled,
+            'built': bloom is not None,
+            'items': bloom.count if bloom else 0,
+            'stale_items': self.stale,
+            'capacity': bloom.capacity if bloom else 0,
+            'bits': bloom.size if bloom else 0,
+            'hashes': bloom.hashes if bloom else 0,
+            'expected_fp_rate': round(bloom.expected_error_rate(), 6) if bloom else None,
+            'observed_fp_rate': round(self.false_positives / negatives, 6) if negatives else None,
+            'lookups': self.lookups,
+            'definite_misses': self.definite_misses,
+            'positives': self.positives,
+            'false_positives': self.false_positives,
+            'syncs': self.syncs,
+            'rebuilds': self.rebuilds
+        }
+
+
+# Istanza usata da get_user_by_username, configurata da init_app
+username_filter = UsernameFilter()
@@ -1,8 +1,88 @@
 """
 Input Validator - Rilevamento attacchi SQL Injection, XSS, Command Injection, Path Traversal
 """
+import hashlib
 import re
 
+from .cache import LRUCache
+
+
+def _fold_literals(pattern):
+    """
+    Porta in minuscolo le lettere letterali di un pattern, lasciando intatti
+    gli escape (\\b, \\s, \\w, \\d, ...) che cambiano significato col maiuscolo
+    """
+    folded = []
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            folded.append(pattern[i:i + 2])
+            i += 2
+        else:
+            folded.append(pattern[i].lower())
+            i += 1
+    return ''.join(folded)
+
+
+class _PatternFamily:
+    """
+    Famiglia di pattern precompilata.
+    
+    Per input ASCII (quasi tutto il traffico) i pattern girano case-sensitive
+    sulla copia minuscola dell'input: senza re.IGNORECASE il motore di re può
+    saltare direttamente al prefisso letterale invece di provare ogni posizione.
+    Prima ancora delle regex, un prefiltro cerca i frammenti letterali
+    obbligatori di ogni pattern: un input pulito si ferma qui.
+    Gli input non ASCII usano i pattern originali con re.IGNORECASE, così il
+    verdetto resta identico al vecchio controllo pattern per pattern.
+    """
+    
+    def __init__(self, attack_type, patterns, literals=None, uppercase=False):
+        self.attack_type = attack_type
+        self.patterns = tuple(patterns)
+        # SQL storicamente confronta la copia uppercase dell'input
+        self.uppercase = uppercase
+        self.compiled = tuple(re.compile(p, re.IGNORECASE) for p in self.patterns)
+        self.compiled_folded = tuple(re.compile(_fold_literals(p)) for p in self.patterns)
+        
+        literals = literals or {}
+        self.required = tuple(frozenset(literals.get(p, ())) for p in self.patterns)
+        # Frammenti distinti da cercare una volta sola per input
+        self.prefilter = tuple(sorted(frozenset().union(*self.required)))
+        self._scan_table = tuple(zip(self.patterns, self.compiled_folded, self.required))
+        # Con un pattern senza frammenti il prefiltro non può escludere nulla
+        self.always_scan = any(not lits for lits in self.required)
+    
+    def search_folded(self, folded_text):
+        """
+        Cerca la famiglia in un input ASCII già convertito in minuscolo
+        
+        Returns:
+            str | None: primo pattern (in ordine di lista) che corrisponde
+        """
+        # Ricerca multi-letterale: str.__contains__ lavora a velocità C
+        present = {lit for lit in self.prefilter if lit in folded_text}
+        if not present and not self.always_scan:
+            return None
+        
+        for pattern, compiled, required in self._scan_table:
+            if required.issubset(present) and compiled.search(folded_text):
+                return pattern
+        return None
+    
+    def search(self, text):
+        """
+        Cerca la famiglia in un input qualsiasi (percorso generale, re.IGNORECASE)
+        
+        Returns:
+            str | None: primo pattern (in ordine di lista) che corrisponde
+        """
+        for pattern, compiled in zip(self.patterns, self.compiled):
+            if compiled.search(text):
+                return pattern
+        return None
+
+
 class InputValidator:
     """
     Classe per validare input utente e rilevare pattern malevoli
@@ -72,6 +152,181 @@ class InputValidator:
         r"c:/windows/system32",                                    # Windows system
     ]
     
+    # Prefiltro: frammenti letterali (minuscoli) che OGNI match del pattern
+    # contiene per forza. Se l'input ASCII non li contiene tutti, il pattern
+    # non può corrispondere e la regex non viene nemmeno eseguita.
+    # Un pattern assente da questa tabella viene sempre eseguito.
+    PREFILTER_LITERALS = {
+        # SQL Injection
+        r"(\bOR\b|\bAND\b)\s+['\"]?\d+['\"]?\s*=\s*['\"]?\d+['\"]?": ('=',),
+        r"UNION\s+SELECT": ('union', 'select'),
+        r"DROP\s+(TABLE|DATABASE|SCHEMA)": ('drop',),
+        r"INSERT\s+INTO": ('insert', 'into'),
+        r"DELETE\s+FROM": ('delete', 'from'),
+        r"UPDATE\s+\w+\s+SET": ('update', 'set'),
+        r"--": ('--',),
+        r";\s*DROP": (';', 'drop'),
+        r"';\s*--": ("';", '--'),
+        r"'\s*OR\s*'": ("'", 'or'),
+        r"admin'\s*--": ("admin'", '--'),
+        r"'\s*=\s*'": ("'", '='),
+        r"1'\s*=\s*'1": ("1'", "'1", '='),
+        # XSS
+        r"<script[^>]*>": ('<script', '>'),
+        r"</script>": ('</script>',),
+        r"javascript:": ('javascript:',),
+        r"on\w+\s*=": ('on', '='),
+        r"<iframe[^>]*>": ('<iframe', '>'),
+        r"<embed[^>]*>": ('<embed', '>'),
+        r"<object[^>]*>": ('<object', '>'),
+        r"<img[^>]*onerror": ('<img', 'onerror'),
+        r"<svg[^>]*onload": ('<svg', 'onload'),
+        r"alert\s*\(": ('alert', '('),
+        r"eval\s*\(": ('eval', '('),
+        r"document\.cookie": ('document.cookie',),
+        r"window\.location": ('window.location',),
+        # Command Injection
+        r";\s*rm\s+-rf": (';', 'rm', '-rf'),
+        r";\s*cat\s+": (';', 'cat'),
+        r"\|\s*cat\s+": ('|', 'cat'),
+        r"&&\s*(rm|del|format)": ('&&',),
+        r"`.*`": ('`',),
+        r"\$\(.*\)": ('$(', ')'),
+        r">\s*/dev/null": ('>', '/dev/null'),
+        r";\s*curl\s+": (';', 'curl'),
+        r";\s*wget\s+": (';', 'wget'),
+        r"\|\s*nc\s+": ('|', 'nc'),
+        r";\s*bash": (';', 'bash'),
+        r";\s*sh\s+": (';', 'sh'),
+        # Path Traversal
+        r"\.\./": ('../',),
+        r"\.\./\.\./": ('../../',),
+        r"\.\.\\": ('..\\',),
+        r"%2e%2e%2f": ('%2e%2e%2f',),
+        r"%2e%2e/": ('%2e%2e/',),
+        r"\.\.%2f": ('..%2f',),
+        r"/etc/passwd": ('/etc/passwd',),
+        r"/etc/shadow": ('/etc/shadow',),
+        r"c:\\windows\\system32": ('c:\\windows\\system32',),
+        r"c:/windows/system32": ('c:/windows/system32',),
+    }
+    
+    # Motore compilato: pattern precompilati una volta sola all'import.
+    # L'ordine delle famiglie è quello storico del controllo sequenziale.
+    SQL_ENGINE = _PatternFamily('SQL_INJECTION', SQL_PATTERNS, PREFILTER_LITERALS, uppercase=True)
+    XSS_ENGINE = _PatternFamily('XSS', XSS_PATTERNS, PREFILTER_LITERALS)
+    COMMAND_ENGINE = _PatternFamily('COMMAND_INJECTION', COMMAND_PATTERNS, PREFILTER_LITERALS)
+    PATH_ENGINE = _PatternFamily('PATH_TRAVERSAL', PATH_PATTERNS, PREFILTER_LITERALS)
+    ALL_ENGINES = (SQL_ENGINE, XSS_ENGINE, COMMAND_ENGINE, PATH_ENGINE)
+    
+    @staticmethod
+    def _safe_result(field_name):
+        return {
+            'is_safe': True,
+            'attack_type': None,
+            'pattern_matched': None,
+            'field': field_name
+        }
+    
+    # Cache opzionale dei verdetti, disattivata di default (vedi enable_cache)
+    _cache = None
+    _cache_max_input_length = 0
+    
+    @staticmethod
+    def enable_cache(max_entries=10000, max_input_length=1024):
+        """
+        Attiva la cache LRU dei verdetti per input ripetuti (es. credential stuffing)
+        
+        Args:
+            max_entries (int): Numero massimo di verdetti in memoria
+            max_input_length (int): Input più lunghi non vengono mai messi in cache
+        """
+        InputValidator._cache_max_input_length = max_input_length
+        InputValidator._cache = LRUCache(max_entries)
+    
+    @staticmethod
+    def disable_cache():
+        """Disattiva e svuota la cache dei verdetti"""
+        InputValidator._cache = None
+    
+    @staticmethod
+    def cache_stats():
+        """
+        Returns:
+            dict | None: contatori hit/miss/eviction, None se la cache è spenta
+        """
+        cache = InputValidator._cache
+        return cache.stats() if cache is not None else None
+    
+    @staticmethod
+    def _match(input_string, engines):
+        """
+        Esegue le famiglie di pattern indicate, nell'ordine dato
+        
+        Returns:
+            tuple: (attack_type, pattern_matched), (None, None) se l'input è pulito
+        """
+        # Input ASCII: un'unica copia minuscola serve tutte le famiglie
+        folded = input_string.lower() if input_string.isascii() else None
+        input_upper = None
+        
+        for engine in engines:
+            if folded is not None:
+                pattern = engine.search_folded(folded)
+            elif engine.uppercase:
+                if input_upper is None:
+                    input_upper = input_string.upper()
+                pattern = engine.search(input_upper)
+            else:
+                pattern = engine.search(input_string)
+            
+            if pattern is not None:
+                return engine.attack_type, pattern
+        
+        return None, None
+    
+    @staticmethod
+    def _scan(input_string, field_name, engines, mode):
+        """
+        Valida una stringa con le famiglie indicate, passando dalla cache se attiva
+        
+        Args:
+            input_string (str): Stringa da validare
+            field_name (str): Nome del campo (per logging)
+            engines (tuple): Famiglie compilate da controllare
+            mode (str): Modalità di validazione, parte della chiave di cache
+        
+        Returns:
+            dict: stesso formato di validate()
+        """
+        if not input_string or not isinstance(input_string, str):
+            return InputValidator._safe_result(field_name)
+        
+        cache = InputValidator._cache
+        if cache is not None and len(input_string) <= InputValidator._cache_max_input_length:
+            # In cache finiscono solo digest a lunghezza fissa, mai l'input
+            digest = hashlib.blake2b(input_string.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+            key = (mode, digest)
+            verdict = cache.get(key)
+            if verdict is None:
+                verdict = InputValidator._match(input_string, engines)
+                cache.set(key, verdict)
+        else:
+            verdict = InputValidator._match(input_string, engines)
+        
+        attack_type, pattern = verdict
+        if attack_type is None:
+            # Nessun pattern malevolo trovato
+            return InputValidator._safe_result(field_name)
+        
+        return {
+            'is_safe': False,
+            'attack_type': attack_type,
+            'pattern_matched': pattern,
+            'field': field_name,
+            'input_sample': input_string[:100]  # primi 100 caratteri
+        }
+    
     @staticmethod
     def validate(input_string, field_name="input"):
         """
@@ -89,68 +344,7 @@ class InputValidator:
                 'field': str
             }
         """
-        if not input_string or not isinstance(input_string, str):
-            return {
-                'is_safe': True,
-                'attack_type': None,
-                'pattern_matched': None,
-                'field': field_name
-            }
-        
-        # Converti in uppercase per case-insensitive matching
-        input_upper = input_string.upper()
-        
-        # Check SQL Injection
-        for pattern in InputValidator.SQL_PATTERNS:
-            if re.search(pattern, input_upper, re.IGNORECASE):
-                return {
-                    'is_safe': False,
-                    'attack_type': 'SQL_INJECTION',
-                    'pattern_matched': pattern,
-                    'field': field_name,
-                    'input_sample': input_string[:100]  # primi 100 caratteri
-                }
-        
-        # Check XSS
-        for pattern in InputValidator.XSS_PATTERNS:
-            if re.search(pattern, input_string, re.IGNORECASE):
-                return {
-                    'is_safe': False,
-                    'attack_type': 'XSS',
-                    'pattern_matched': pattern,
-                    'field': field_name,
-                    'input_sample': input_string[:100]
-                }
-        
-        # Check Command Injection
-        for pattern in InputValidator.COMMAND_PATTERNS:
-            if re.search(pattern, input_string, re.IGNORECASE):
-                return {
-                    'is_safe': False,
-                    'attack_type': 'COMMAND_INJECTION',
-                    'pattern_matched': pattern,
-                    'field': field_name,
-                    'input_sample': input_string[:100]
-                }
-        
-        # Check Path Traversal
-        for pattern in InputValidator.PATH_PATTERNS:
-            if re.search(pattern, input_string, re.IGNORECASE):
-                return {
-                    'is_safe': False,
-                    'attack_type': 'PATH_TRAVERSAL',
-                    'pattern_matched': pattern,
-                    'field': field_name,
-                    'input_sample': input_string[:100]
-                }
-        
-        # Nessun pattern malevolo trovato
-        return {
-            'is_safe': True,
-            'attack_type': None,
-            'pattern_matched': None,
-            'field': field_name
-        }
+        return InputValidator._scan(input_string, field_name, InputValidator.ALL_ENGINES, 'all')
     
     @staticmethod
     def validate_sql_only(input_string, field_name="input"):
@@ -169,35 +363,7 @@ class InputValidator:
                 'field': str
             }
         """
-        if not input_string or not isinstance(input_string, str):
-            return {
-                'is_safe': True,
-                'attack_type': None,
-                'pattern_matched': None,
-                'field': field_name
-            }
-        
-        # Converti in uppercase per case-insensitive matching
-        input_upper = input_string.upper()
-        
-        # Check SOLO SQL Injection
-        for pattern in InputValidator.SQL_PATTERNS:
-            if re.search(pattern, input_upper, re.IGNORECASE):
-                return {
-                    'is_safe': False,
-                    'attack_type': 'SQL_INJECTION',
-                    'pattern_matched': pattern,
-                    'field': field_name,
-                    'input_sample': input_string[:100]
-                }
-        
-        # Nessun pattern SQL Injection trovato
-        return {
-            'is_safe': True,
-            'attack_type': None,
-            'pattern_matched': None,
-            'field': field_name
-        }
+        return InputValidator._scan(input_string, field_name, (InputValidator.SQL_ENGINE,), 'sql')
     
     @staticmethod
     def validate_multiple(fields_dict):
@@ -1,6 +1,7 @@
 """Script per ricreare il database con tabelle User e Log"""
 import os
 from app import app, db
+from model.migrations import upgrade
 
 # Percorso del database
 db_path = 'instance/users.db'
@@ -15,6 +16,7 @@ else:
 # Crea il nuovo database con la struttura aggiornata
 with app.app_context():
     db.create_all()
+    upgrade(app)
     print("✅ Nuovo database creato con successo!")
     print("\n📋 Struttura tabella User:")
     print("   - id (Integer, Primary Key)")
@@ -29,6 +31,14 @@ with app.app_context():
     print("   - timestamp (DateTime)")
     print("   - is_error (Boolean)")
     print("   - user_id (Integer, Foreign Key)")
+    print("\n📋 Indici tabella Log:")
+    print("   - (type, timestamp, ip)      → brute force / input malevoli")
+    print("   - (is_error, timestamp, ip, type) → IP sospetti / alert aggregati")
+    print("   - (timestamp)                → dashboard /logs")
+    print("   - (user_id, timestamp)       → log per utente")
+    print("   - logs_search (FTS5 trigram) → filtri per sottostringa su ip")
+    print("\n📋 Rollup (aggiornati da trigger):")
+    print("   - log_counts_minute / log_counts_hour / log_counts_hour_totals → grafici e statistiche")
     
     print("\n🎉 Database pronto!")
     print("\n� Per creare l'utente admin, esegui:")